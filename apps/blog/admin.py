@@ -1,9 +1,19 @@
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.contrib.admin.helpers import ActionForm
+from django.contrib.admin.views.main import ChangeList
+from django.db.models import Q
 from .models import Article, Category, Tag
+from . import bulk
+from .counters import pending_views
+from .pagination import EstimatedCountPaginator
+from .search import search as search_articles
 from django.conf import settings
 from django import forms
 from mdeditor.widgets import MDEditorWidget
 
+# 文章列表页只查询列表显示需要的字段，正文等大字段不加载
+LIST_FIELDS = ('id', 'title', 'category', 'category__name', 'created_time', 'pub_time', 'status', 'views')
+
 @admin.register(Category)
 class CategoryAdmin(admin.ModelAdmin):
     class Media:
@@ -28,13 +38,36 @@ class ArticleAdminForm(forms.ModelForm):
         }
 
 
+class ArticleActionForm(ActionForm):
+    """批量操作下拉框旁边的分类和标签选择，供"修改分类"和"添加标签"操作使用"""
+    category = forms.ModelChoiceField(Category.objects.all(), required=False, label='分类')
+    tag = forms.ModelChoiceField(Tag.objects.all(), required=False, label='标签')
+
+
+class ArticleChangeList(ChangeList):
+    def get_queryset(self, request, exclude_parameters=None):
+        return super().get_queryset(request, exclude_parameters).only(*LIST_FIELDS)
+
+    def get_results(self, request):
+        super().get_results(request)
+        # 一次读取整页文章的缓冲浏览量，避免每行查询一次缓存
+        pending = pending_views([obj.id for obj in self.result_list])
+        for obj in self.result_list:
+            obj.pending_views = pending.get(obj.id, 0)
+
+
 @admin.register(Article)
 class ArticleAdmin(admin.ModelAdmin):
     form = ArticleAdminForm
-    list_display = ('title', 'category', 'created_time', 'pub_time', 'status')  # 列表显示的字段
+    list_display = ('title', 'category', 'created_time', 'pub_time', 'status', 'current_views')  # 列表显示的字段
+    list_select_related = ('category',)  # 分类随文章一起JOIN查询
     list_filter = ('category', 'status')  # 过滤器
-    search_fields = ('title', 'content')  # 搜索字段
+    search_fields = ('title',)  # 搜索字段，正文通过全文检索索引搜索，见 get_search_results
     date_hierarchy = 'created_time'  # 日期筛选
+    paginator = EstimatedCountPaginator  # 大表上使用估计行数
+    show_full_result_count = False  # 不再额外统计未过滤的总数
+    action_form = ArticleActionForm
+    actions = ('publish_selected', 'unpublish_selected', 'set_category_selected', 'add_tag_selected')
     
     # 在管理界面显示的字段顺序
     fields = (
@@ -46,6 +79,49 @@ class ArticleAdmin(admin.ModelAdmin):
         'pub_time',
     )
     
+    @admin.display(description='浏览量', ordering='views')
+    def current_views(self, obj):
+        """包含尚未写回数据库的缓冲浏览量"""
+        pending = getattr(obj, 'pending_views', None)
+        if pending is None:
+            pending = pending_views([obj.id]).get(obj.id, 0)
+        return obj.views + pending
+
+    def get_changelist(self, request, **kwargs):
+        return ArticleChangeList
+
+    def get_search_results(self, request, queryset, search_term):
+        """标题按子串匹配，正文通过全文检索索引匹配（包括草稿），不再对正文做 LIKE 全表扫描"""
+        search_term = search_term.strip()
+        if not search_term:
+            return queryset, False
+        ids = [pk for pk, _ in search_articles(search_term, published_only=False)]
+        return queryset.filter(Q(title__icontains=search_term) | Q(pk__in=ids)), False
+
+    @admin.action(description='发表所选文章')
+    def publish_selected(self, request, queryset):
+        self.message_user(request, f'已发表 {bulk.publish(queryset)} 篇文章')
+
+    @admin.action(description='撤回所选文章为草稿')
+    def unpublish_selected(self, request, queryset):
+        self.message_user(request, f'已撤回 {bulk.unpublish(queryset)} 篇文章')
+
+    @admin.action(description='把所选文章移到选择的分类')
+    def set_category_selected(self, request, queryset):
+        category = Category.objects.filter(pk=request.POST.get('category') or None).first()
+        if category is None:
+            self.message_user(request, '请先在操作旁边选择分类', level=messages.WARNING)
+            return
+        self.message_user(request, f'已修改 {bulk.set_category(queryset, category)} 篇文章的分类')
+
+    @admin.action(description='为所选文章添加选择的标签')
+    def add_tag_selected(self, request, queryset):
+        tag = Tag.objects.filter(pk=request.POST.get('tag') or None).first()
+        if tag is None:
+            self.message_user(request, '请先在操作旁边选择标签', level=messages.WARNING)
+            return
+        self.message_user(request, f'已为 {bulk.add_tag(queryset, tag)} 篇文章添加标签“{tag}”')
+
     class Media:
         js = ('js/mdeditor-enhance.js', 'js/article_admin_setup.js',)
         css = {
@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class BlogConfig(AppConfig):
     name = 'apps.blog'
+
+    def ready(self):
+        from apps.blog import metrics, signals, tasks  # noqa: F401  注册信号处理函数、后台任务和SQL计时
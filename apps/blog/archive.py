@@ -0,0 +1,82 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from apps.blog.models import Archive, Article
+
+
+def archive_index_enabled():
+    """是否启用物化的归档统计表"""
+    return getattr(settings, 'BLOG_ARCHIVE_INDEX', False)
+
+
+def month_of(article):
+    """返回文章所属的归档月份（当前时区下的每月1日），未发表的文章返回None"""
+    if article.status != 'p' or not article.pub_time:
+        return None
+    return timezone.localtime(article.pub_time).date().replace(day=1)
+
+
+def _archive_item(date, count):
+    return {
+        'date': date,
+        'count': count,
+        'year': date.year,
+        'month': date.month
+    }
+
+
+def get_archive_data():
+    """获取归档数据，包含每月文章数量"""
+    if archive_index_enabled():
+        return [
+            _archive_item(row.month, row.count)
+            for row in Archive.objects.filter(count__gt=0)
+        ]
+
+    return [_archive_item(row['month'], row['count']) for row in _monthly_counts()]
+
+
+def _monthly_counts():
+    """一次分组查询同时得到月份和数量"""
+    return Article.published.annotate(
+        month=TruncMonth('pub_time')
+    ).values('month').annotate(
+        count=Count('id')
+    ).order_by('-month')
+
+
+def adjust_month(month, delta):
+    """增量更新某个月份的文章数量"""
+    if month is None or not delta:
+        return
+    updated = Archive.objects.filter(month=month).update(count=F('count') + delta)
+    if not updated and delta > 0:
+        _, created = Archive.objects.get_or_create(month=month, defaults={'count': delta})
+        if not created:
+            Archive.objects.filter(month=month).update(count=F('count') + delta)
+    Archive.objects.filter(month=month, count__lte=0).delete()
+
+
+def recount_months(months):
+    """重新统计指定月份（每月1日）的文章数量，用于批量修改之后"""
+    for month in {month for month in months if month is not None}:
+        count = Article.published.in_month(month.year, month.month).count()
+        if count:
+            Archive.objects.update_or_create(month=month, defaults={'count': count})
+        else:
+            Archive.objects.filter(month=month).delete()
+
+
+def rebuild_archive_index():
+    """根据文章表全量重建归档统计表，返回月份数量"""
+    rows = [
+        Archive(month=timezone.localtime(row['month']).date(), count=row['count'])
+        for row in _monthly_counts()
+    ]
+    with transaction.atomic():
+        Archive.objects.all().delete()
+        Archive.objects.bulk_create(rows)
+    return len(rows)
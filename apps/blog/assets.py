@@ -0,0 +1,194 @@
+"""静态资源打包
+
+collectstatic 时把 BLOG_ASSET_BUNDLES 中的CSS/JS合并压缩为少量的包，经 ManifestStaticFilesStorage
+生成带内容哈希的文件名，并为文本类文件生成 .gz/.br 预压缩版本（.br 需要安装 brotli）。
+StaticAssetMiddleware 直接从 STATIC_ROOT 提供这些文件：带哈希的文件名使用一年的 immutable 缓存头，
+并按 Accept-Encoding 选择预压缩版本。
+"""
+import gzip
+import mimetypes
+import os
+import re
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+from django.http import FileResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
+
+try:
+    import brotli
+except ImportError:  # brotli 为可选依赖，未安装时只生成 .gz
+    brotli = None
+
+DEFAULT_BUNDLES = {
+    'css/site.css': [
+        'css/pure-min.css',
+        'css/grids-responsive-min.css',
+        'css/blog.css',
+        'css/pygments.css',
+        'css/font-awesome.min.css',
+    ],
+    'js/site.js': [
+        'js/tagcloud-d3.js',
+        'js/infinite_scroll.js',
+        'js/copy_code.js',
+        'js/back_to_top.js',
+        'js/ajax_navigation.js',
+        'js/wechat_modal.js',
+        'js/mobile_nav.js',
+    ],
+}
+
+COMPRESSIBLE_EXTENSIONS = ('.css', '.js', '.svg', '.json', '.txt', '.xml', '.ttf', '.eot', '.map')
+HASHED_NAME_RE = re.compile(r'\.[0-9a-f]{12}\.[^./]+$')
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+
+def get_bundles():
+    return getattr(settings, 'BLOG_ASSET_BUNDLES', DEFAULT_BUNDLES)
+
+
+def _is_minified(name):
+    return bool(re.search(r'[.-]min\.(css|js)$', name))
+
+
+def minify_css(text):
+    """去掉注释和多余空白（保留 /*! 开头的版权注释）"""
+    text = re.sub(r'/\*(?!!).*?\*/', '', text, flags=re.S)
+    text = re.sub(r'\s+', ' ', text)
+    text = re.sub(r'\s*([{};,])\s*', r'\1', text)
+    text = re.sub(r':\s+', ':', text)
+    return text.replace(';}', '}').strip()
+
+
+def minify_js(text):
+    """保守的逐行压缩：去掉缩进、空行和整行注释，多行模板字符串内部保持原样"""
+    lines, in_template, in_comment = [], False, False
+    for line in text.splitlines():
+        if in_template:
+            lines.append(line)
+        else:
+            line = line.strip()
+            if in_comment:
+                end = line.find('*/')
+                if end < 0:
+                    continue
+                in_comment = False
+                line = line[end + 2:].lstrip()
+            # 只去掉行首的注释本身，注释结束后同一行的代码保留
+            while line.startswith('/*') and not line.startswith('/*!'):
+                end = line.find('*/', 2)
+                if end < 0:
+                    in_comment, line = True, ''
+                    break
+                line = line[end + 2:].lstrip()
+            if not line or line.startswith('//'):
+                continue
+            lines.append(line)
+        # 未转义的反引号为奇数个时，进入或离开多行模板字符串
+        if len(re.findall(r'(?<!\\)`', line)) % 2:
+            in_template = not in_template
+    return '\n'.join(lines)
+
+
+def build_bundle(storage, name, sources):
+    """读取已收集的源文件，合并压缩后写入 storage"""
+    is_js = name.endswith('.js')
+    parts = []
+    for source in sources:
+        with storage.open(source) as f:
+            text = f.read().decode('utf-8')
+        if not _is_minified(source):
+            text = minify_js(text) if is_js else minify_css(text)
+        parts.append(text)
+    # JS 文件之间用分号隔开，避免前一个文件没有以分号结尾
+    content = ('\n;\n' if is_js else '\n').join(parts) + '\n'
+    if storage.exists(name):
+        storage.delete(name)
+    storage._save(name, ContentFile(content.encode('utf-8')))
+
+
+def compress_file(path):
+    """为文件生成 .gz/.br 预压缩版本，压缩后没有变小则不生成"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    variants = [('.gz', gzip.compress(data, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        variants.append(('.br', brotli.compress(data)))
+    for suffix, compressed in variants:
+        if len(compressed) < len(data):
+            with open(path + suffix, 'wb') as f:
+                f.write(compressed)
+
+
+class BundledManifestStorage(ManifestStaticFilesStorage):
+    """collectstatic 时先生成资源包，再统一计算哈希文件名，最后生成预压缩版本"""
+
+    def post_process(self, paths, dry_run=False, **options):
+        if not dry_run:
+            for name, sources in get_bundles().items():
+                build_bundle(self, name, sources)
+                paths[name] = (self, name)
+
+        yield from super().post_process(paths, dry_run, **options)
+
+        if not dry_run:
+            for hashed_name in set(self.hashed_files.values()):
+                if hashed_name.endswith(COMPRESSIBLE_EXTENSIONS) and self.exists(hashed_name):
+                    compress_file(self.path(hashed_name))
+
+
+def bundles_enabled():
+    """只在使用打包存储且关闭 DEBUG 时引用资源包；开发环境仍逐个引用源文件"""
+    from django.contrib.staticfiles.storage import staticfiles_storage
+
+    return not settings.DEBUG and isinstance(staticfiles_storage, BundledManifestStorage)
+
+
+class StaticAssetMiddleware:
+    """从 STATIC_ROOT 提供 collectstatic 生成的文件
+
+    带内容哈希的文件名使用一年的 immutable 缓存，其余文件短期缓存；客户端支持时返回 .br/.gz 版本。
+    DEBUG 模式下 runserver 自行处理静态文件，请求不会到达这里。
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self._serve(request)
+        return response if response is not None else self.get_response(request)
+
+    def _serve(self, request):
+        if request.method not in ('GET', 'HEAD') or not request.path.startswith(settings.STATIC_URL) \
+                or not settings.STATIC_ROOT:
+            return None
+        root = os.path.abspath(settings.STATIC_ROOT)
+        path = os.path.abspath(os.path.join(root, request.path[len(settings.STATIC_URL):]))
+        if not path.startswith(root + os.sep) or not os.path.isfile(path):
+            return None
+
+        stat = os.stat(path)
+        response = get_conditional_response(request, last_modified=int(stat.st_mtime))
+        if response is None:
+            content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+            accepted = request.headers.get('Accept-Encoding', '')
+            serve_path, encoding = path, None
+            for name, suffix in ENCODINGS:
+                if name in accepted and os.path.isfile(path + suffix):
+                    serve_path, encoding = path + suffix, name
+                    break
+            response = FileResponse(open(serve_path, 'rb'), content_type=content_type)
+            del response['Content-Disposition']
+            if encoding:
+                response['Content-Encoding'] = encoding
+            if path.endswith(COMPRESSIBLE_EXTENSIONS):
+                patch_vary_headers(response, ('Accept-Encoding',))
+        response['Last-Modified'] = http_date(stat.st_mtime)
+        if HASHED_NAME_RE.search(path):
+            response['Cache-Control'] = 'public, max-age=31536000, immutable'
+        else:
+            response['Cache-Control'] = f'public, max-age={getattr(settings, "BLOG_STATIC_MAX_AGE", 300)}'
+        return response
@@ -0,0 +1,116 @@
+"""异步版本的前台视图，供ASGI部署使用
+
+与 views.py 中的同步视图行为一致。每个页面的查询（侧边栏、文章列表、标签、上下篇等）合并在一次
+sync_to_async 调用中执行，使用该请求的同步线程和其中复用的数据库连接（遵循 CONN_MAX_AGE），
+不为每个查询单独建立连接；等待客户端时不占用工作线程。
+同步视图保持不变，两种模式可以分别压测对比。
+"""
+from asgiref.sync import sync_to_async
+from django.http import Http404, HttpResponse, JsonResponse
+from django.shortcuts import redirect, render
+
+from apps.blog.cache import get_or_build
+from apps.blog.models import Article, Category, Tag
+from apps.blog.postings import get_tag_posts
+from apps.blog.related import related_ids
+from apps.blog.views import (
+    _build_tag_cloud,
+    _get_common_context,
+    _handle_pagination,
+    _paginate_postings,
+)
+
+_render = sync_to_async(render)
+
+
+def _listing_context(request, posts_or_postings, extra):
+    """取当前页文章和侧边栏；AJAX请求页码超出范围时返回空响应"""
+    if isinstance(posts_or_postings, list):
+        post_list = _paginate_postings(request, posts_or_postings)
+    else:
+        post_list = _handle_pagination(request, posts_or_postings)
+    if isinstance(post_list, HttpResponse):
+        return post_list
+    context = _get_common_context()
+    context.update(extra)
+    context['post_list'] = post_list
+    return context
+
+
+async def _listing(request, template, extra, posts_or_postings):
+    context = await sync_to_async(_listing_context)(request, posts_or_postings, extra)
+    if isinstance(context, HttpResponse):
+        return context
+    if request.headers.get('x-requested-with') == 'XMLHttpRequest' \
+            and request.headers.get('x-infinite-scroll') == 'true':
+        return await _render(request, 'post_list_partial.html', context)
+    return await _render(request, template, context)
+
+
+async def home(request):
+    posts = Article.published.all()
+    if request.headers.get('x-requested-with') == 'XMLHttpRequest':
+        # AJAX请求，只返回文章列表部分
+        post_list = await sync_to_async(_handle_pagination)(request, posts)
+        if isinstance(post_list, HttpResponse):
+            return post_list
+        return await _render(request, 'post_list_partial.html', {'post_list': post_list})
+    return await _listing(request, 'home.html', {}, posts)
+
+
+def _detail_context(request, post):
+    if not getattr(request, 'skip_view_count', False):
+        post.viewed()
+    related = related_ids(post)
+    neighbour_ids = [pk for pk in (post.prev_post_id, post.next_post_id) if pk] + related
+    neighbours = Article.published.only('id', 'title').in_bulk(neighbour_ids) if neighbour_ids else {}
+    context = _get_common_context()
+    context.update({
+        'post': post,
+        'tags': list(post.tags.all()),
+        'next_post': neighbours.get(post.next_post_id),
+        'prev_post': neighbours.get(post.prev_post_id),
+        'related_posts': [neighbours[pk] for pk in related if pk in neighbours],
+    })
+    return context
+
+
+async def detail(request, id):
+    try:
+        post = await Article.objects.select_related('category').aget(id=id)
+    except Article.DoesNotExist:
+        raise Http404
+    context = await sync_to_async(_detail_context)(request, post)
+    return await _render(request, 'post.html', context)
+
+
+async def search_category(request, id):
+    try:
+        category = await Category.objects.aget(id=id)
+    except Category.DoesNotExist:
+        raise Http404("Category not found")
+    posts = Article.published.filter(category_id=id)
+    return await _listing(request, 'category.html', {'category': category}, posts)
+
+
+async def search_tag(request, slug):
+    tag = await Tag.objects.filter(slug=slug).afirst()
+    if tag is None:
+        # 兼容旧的按标签名访问的链接
+        tag = await Tag.objects.filter(name=slug).afirst()
+        if tag is None:
+            raise Http404("Tag not found")
+        return redirect('async_search_tag', slug=tag.slug, permanent=True)
+    postings = await sync_to_async(get_tag_posts)(tag.id)
+    return await _listing(request, 'tag.html', {'tag': tag}, postings)
+
+
+async def archives(request, year, month):
+    posts = Article.published.in_month(year, month)
+    return await _listing(request, 'archive.html', {'year': year, 'month': month}, posts)
+
+
+async def tag_cloud_json(request):
+    """为D3.js标签云提供JSON格式数据"""
+    tags = await sync_to_async(get_or_build)('tag_cloud', _build_tag_cloud)
+    return JsonResponse({'tags': tags})
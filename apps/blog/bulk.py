@@ -0,0 +1,124 @@
+"""文章的批量修改
+
+以集合方式的 UPDATE 和中间表批量插入修改文章，不逐篇调用 save()；保持 save() 的语义（发表时补发布时间，
+撤回时清空发布时间，修改时间更新为当前时间）。批量写入不触发信号，派生数据和缓存由后台任务调用 refresh_derived
+只针对修改的文章统一刷新一次，连续的批量修改会合并为一次刷新。
+"""
+from datetime import date
+
+from django.db import transaction
+from django.db.models import DateTimeField, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from apps.blog.archive import archive_index_enabled, month_of, rebuild_archive_index, recount_months
+from apps.blog.cache import bump_content_version
+from apps.blog.counts import recount
+from apps.blog.jobs import enqueue
+from apps.blog.models import Article
+from apps.blog.postings import invalidate_tag_posts
+from apps.blog.related import rebuild_related, update_related
+from apps.blog.timeline import rebuild_timeline, relink_articles
+
+
+def refresh_derived(tag_ids=(), publish_changed=False, tags_changed=False, article_ids=None, category_ids=(),
+                    months=()):
+    """批量修改后更新派生数据，最后递增一次内容版本号
+
+    发表状态变化影响时间轴、归档统计和相关文章，标签关联变化影响相关文章；两者都会改变已发表文章数量。
+    article_ids 为修改的文章时只更新它们涉及的部分：这些文章及其新旧位置两侧的上下篇、所属的分类和标签
+    （加上 category_ids、tag_ids 中的，如原来的分类）、所在的月份（加上 months 中的，如撤回前的月份）
+    以及它们在相关文章中的行和列；为 None 时（如批量导入）全量重建。
+    """
+    if article_ids is None:
+        if publish_changed:
+            rebuild_timeline()
+            if archive_index_enabled():
+                rebuild_archive_index()
+        recount()
+        if publish_changed or tags_changed:
+            rebuild_related()
+        invalidate_tag_posts(tag_ids)
+        bump_content_version()
+        return
+
+    tag_ids, category_ids = set(tag_ids), set(category_ids)
+    if publish_changed:
+        articles = list(Article.objects.filter(pk__in=article_ids).only('id', 'status', 'pub_time', 'category'))
+        tag_ids |= _tag_ids(article_ids)
+        category_ids.update(article.category_id for article in articles if article.category_id)
+        relink_articles(article_ids)
+        if archive_index_enabled():
+            recount_months([date.fromisoformat(month) for month in months] + [month_of(a) for a in articles])
+    recount(category_ids, tag_ids)
+    if publish_changed or tags_changed:
+        update_related(*article_ids)
+    invalidate_tag_posts(tag_ids)
+    bump_content_version()
+
+
+def _schedule_refresh(article_ids, tag_ids=(), category_ids=(), months=(), publish_changed=False,
+                      tags_changed=False):
+    enqueue('refresh_derived', article_ids=sorted(article_ids), tag_ids=sorted(tag_ids),
+            category_ids=sorted(category_ids), months=sorted(months), publish_changed=publish_changed,
+            tags_changed=tags_changed)
+
+
+def _tag_ids(article_ids):
+    return set(Article.tags.through.objects.filter(
+        article_id__in=article_ids
+    ).values_list('tag_id', flat=True))
+
+
+@transaction.atomic
+def publish(queryset):
+    """发表所选的草稿，返回发表的文章数量"""
+    ids = list(queryset.filter(status='d').values_list('id', flat=True))
+    if not ids:
+        return 0
+    now = timezone.now()
+    Article.objects.filter(pk__in=ids).update(
+        status='p', pub_time=Coalesce('pub_time', Value(now, output_field=DateTimeField())), last_mod_time=now
+    )
+    _schedule_refresh(ids, publish_changed=True)
+    return len(ids)
+
+
+@transaction.atomic
+def unpublish(queryset):
+    """把所选的已发表文章撤回为草稿，返回撤回的文章数量"""
+    ids = list(queryset.filter(status='p').values_list('id', flat=True))
+    if not ids:
+        return 0
+    # 撤回后发布时间被清空，原来的月份在修改前记下
+    articles = Article.objects.filter(pk__in=ids).only('status', 'pub_time')
+    months = {month_of(article).isoformat() for article in articles}
+    Article.objects.filter(pk__in=ids).update(status='d', pub_time=None, last_mod_time=timezone.now())
+    _schedule_refresh(ids, months=months, publish_changed=True)
+    return len(ids)
+
+
+@transaction.atomic
+def set_category(queryset, category):
+    """把所选文章移到指定分类，返回有变化的文章数量"""
+    ids = list(queryset.exclude(category=category).values_list('id', flat=True))
+    if not ids:
+        return 0
+    old_categories = set(Article.objects.filter(pk__in=ids, category__isnull=False).values_list(
+        'category_id', flat=True))
+    Article.objects.filter(pk__in=ids).update(category=category, last_mod_time=timezone.now())
+    _schedule_refresh(ids, category_ids=old_categories | {category.pk})
+    return len(ids)
+
+
+@transaction.atomic
+def add_tag(queryset, tag):
+    """为所选文章添加标签，返回新增关联的文章数量"""
+    ids = list(queryset.exclude(tags=tag).values_list('id', flat=True))
+    if not ids:
+        return 0
+    Through = Article.tags.through
+    Through.objects.bulk_create([Through(article_id=pk, tag_id=tag.pk) for pk in ids], ignore_conflicts=True)
+    Article.objects.filter(pk__in=ids).update(last_mod_time=timezone.now())
+    _schedule_refresh(ids, tag_ids=[tag.pk], tags_changed=True)
+    return len(ids)
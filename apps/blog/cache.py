@@ -0,0 +1,61 @@
+import time
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.core.cache import cache
+
+# 全局内容版本号，文章、标签、分类有变化时递增，所有派生缓存都以它为键的一部分
+VERSION_KEY = 'blog:content_version'
+# 最近一次内容变化的时间戳，用于生成 Last-Modified
+CHANGED_AT_KEY = 'blog:content_changed_at'
+
+
+def get_content_version():
+    """获取当前内容版本号"""
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # 以时间戳作为初始值，避免版本键被淘汰后与旧缓存重名
+        cache.add(VERSION_KEY, int(time.time() * 1000), None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def bump_content_version():
+    """内容发生变化，使所有依赖版本号的缓存失效"""
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, int(time.time() * 1000), None)
+    cache.set(CHANGED_AT_KEY, time.time(), None)
+
+
+def versioned_key(name):
+    return f'blog:{name}:{get_content_version()}'
+
+
+def get_or_build(name, builder, timeout=None):
+    """按内容版本缓存 builder() 的结果"""
+    if timeout is None:
+        timeout = getattr(settings, 'BLOG_SIDEBAR_CACHE_TIMEOUT', 300)
+    key = versioned_key(name)
+    value = cache.get(key)
+    if value is None:
+        value = builder()
+        cache.set(key, value, timeout)
+    return value
+
+
+def content_last_modified():
+    """站点内容的最后修改时间：文章的最大 last_mod_time 与最近一次内容变化时间中较晚者"""
+    from django.db.models import Max
+    from apps.blog.models import Article
+
+    def build():
+        latest = Article.objects.aggregate(latest=Max('last_mod_time'))['latest']
+        changed_at = cache.get(CHANGED_AT_KEY)
+        if changed_at is not None:
+            changed_at = datetime.fromtimestamp(changed_at, tz=timezone.utc)
+            latest = max(latest, changed_at) if latest else changed_at
+        return latest or datetime.fromtimestamp(0, tz=timezone.utc)
+
+    return get_or_build('last_modified', build)
@@ -0,0 +1,62 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+
+from apps.blog.pagination import time_key
+from apps.blog.rendering import render_contents
+
+# 列表查询只需取出这些字段即可生成卡片缓存键，未命中的卡片再按主键补全
+CARD_FIELDS = ('id', 'pub_time', 'last_mod_time', 'views')
+CARD_TIMEOUT = 60 * 60 * 24
+
+
+def card_key(post):
+    """卡片缓存键：文章id、修改时间和浏览量分段，浏览量变化不大时复用缓存"""
+    bucket = post.views // getattr(settings, 'BLOG_CARD_VIEWS_BUCKET', 10)
+    return f'blog:card:{post.id}:{time_key(post.last_mod_time)}:{bucket}'
+
+
+def _render(post):
+    return render_to_string('post_card.html', {'post': post})
+
+
+def _fill_summaries(articles):
+    """尚未回填预渲染结果的文章，一次取出正文批量生成摘要（只用于展示，不写回数据库）"""
+    if not articles:
+        return
+    from apps.blog.models import Article
+
+    contents = dict(Article.objects.filter(id__in=[a.id for a in articles]).values_list('id', 'content'))
+    texts = [contents.get(article.id, '') for article in articles]
+    for article, (digest, _, summary) in zip(articles, render_contents(texts)):
+        article.content_hash, article.summary = digest, summary
+
+
+def render_cards(posts):
+    """渲染一页文章卡片，一次批量读取缓存，只渲染未命中的卡片"""
+    from apps.blog.models import Article
+
+    posts = list(posts)
+    # 检索结果的高亮摘要与检索词相关，不做缓存
+    if any(hasattr(post, 'search_snippet') for post in posts):
+        return [_render(post) for post in posts]
+
+    keys = [card_key(post) for post in posts]
+    cards = cache.get_many(keys)
+    misses = [(key, post) for key, post in zip(keys, posts) if key not in cards]
+    if misses:
+        full = Article.objects.for_list().in_bulk(
+            [post.id for _, post in misses]
+        )
+        _fill_summaries([article for article in full.values() if not article.content_hash])
+        rendered = {}
+        for key, post in misses:
+            article = full.get(post.id)
+            if article is None:  # 文章已被删除
+                cards[key] = ''
+                continue
+            article.views = post.views  # 保留已叠加缓冲浏览量的数字
+            rendered[key] = _render(article)
+        cache.set_many(rendered, CARD_TIMEOUT)
+        cards.update(rendered)
+    return [cards[key] for key in keys]
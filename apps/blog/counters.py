@@ -0,0 +1,95 @@
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Case, F, IntegerField, Value, When
+
+# 每篇文章待写回的浏览量保存在缓存中，通过原子的 incr/decr 维护
+VIEW_KEY = 'blog:views:{}'
+
+_lock = threading.Lock()
+_dirty = set()  # 本进程记录过浏览量、尚未写回的文章id
+_hits = 0
+_last_flush = time.monotonic()
+
+
+def _key(article_id):
+    return VIEW_KEY.format(article_id)
+
+
+def record_view(article_id):
+    """记录一次浏览，返回该文章当前待写回的浏览量；达到数量或时间阈值时批量写回数据库"""
+    global _hits
+    key = _key(article_id)
+    try:
+        pending = cache.incr(key)
+    except ValueError:
+        if cache.add(key, 1, None):
+            pending = 1
+        else:
+            pending = cache.incr(key)
+
+    with _lock:
+        _dirty.add(article_id)
+        _hits += 1
+        due = (
+            _hits >= getattr(settings, 'BLOG_VIEWS_FLUSH_THRESHOLD', 100)
+            or time.monotonic() - _last_flush >= getattr(settings, 'BLOG_VIEWS_FLUSH_INTERVAL', 60)
+        )
+    if due:
+        flush_views()
+    return pending
+
+
+def pending_views(article_ids):
+    """批量获取待写回的浏览量，返回 {文章id: 数量}"""
+    keys = {_key(article_id): article_id for article_id in article_ids}
+    return {keys[key]: count for key, count in cache.get_many(keys).items() if count}
+
+
+def apply_pending_views(articles):
+    """把缓冲区中的浏览量加到文章对象上，使页面显示接近实时的数字"""
+    articles = list(articles)
+    pending = pending_views(article.id for article in articles)
+    for article in articles:
+        article.views += pending.get(article.id, 0)
+    return articles
+
+
+def flush_views(article_ids=None):
+    """把缓冲的浏览量用一条 UPDATE ... SET views = views + n 写回数据库，返回写回的总数
+
+    不指定 article_ids 时写回本进程记录过的文章。
+    """
+    global _hits, _last_flush
+    from apps.blog.models import Article
+
+    with _lock:
+        if article_ids is None:
+            article_ids = list(_dirty)
+            _dirty.clear()
+        _hits = 0
+        _last_flush = time.monotonic()
+
+    counts = pending_views(article_ids)
+    if not counts:
+        return 0
+
+    # 先从缓冲区扣减，期间新增的浏览量会留在缓冲区等待下次写回
+    for article_id, count in list(counts.items()):
+        try:
+            cache.decr(_key(article_id), count)
+        except ValueError:  # 缓存键已被淘汰，这部分浏览量无法可靠写回
+            del counts[article_id]
+    try:
+        Article.objects.filter(id__in=counts).update(views=F('views') + Case(
+            *[When(id=article_id, then=Value(count)) for article_id, count in counts.items()],
+            default=Value(0),
+            output_field=IntegerField(),
+        ))
+    except Exception:
+        for article_id, count in counts.items():
+            cache.incr(_key(article_id), count)
+        raise
+    return sum(counts.values())
@@ -0,0 +1,91 @@
+from django.db import transaction
+from django.db.models import Count, F
+
+from apps.blog.models import Article, Category, Tag
+
+
+def is_published(article):
+    return article is not None and article.status == 'p' and article.pub_time is not None
+
+
+def adjust_category(category_id, delta):
+    """增量更新分类的已发表文章数量"""
+    if category_id is None or not delta:
+        return
+    rows = Category.objects.filter(pk=category_id)
+    if delta < 0:  # 计数已经偏差时不减到负数，留给 recount 修正
+        rows = rows.filter(published_count__gte=-delta)
+    rows.update(published_count=F('published_count') + delta)
+
+
+def adjust_tags(tag_ids, delta):
+    """增量更新一组标签的已发表文章数量"""
+    tag_ids = list(tag_ids)
+    if not tag_ids or not delta:
+        return
+    rows = Tag.objects.filter(pk__in=tag_ids)
+    if delta < 0:
+        rows = rows.filter(published_count__gte=-delta)
+    rows.update(published_count=F('published_count') + delta)
+
+
+def update_article_counts(instance, previous, tag_ids=None):
+    """文章保存后根据发表状态和分类的变化调整计数
+
+    previous 为保存前的文章（新建时为 None）；发表状态变化时标签计数一并调整，
+    tag_ids 未给出时从中间表读取。
+    """
+    was, now = is_published(previous), is_published(instance)
+    old_category = previous.category_id if previous is not None else None
+    if was and (not now or old_category != instance.category_id):
+        adjust_category(old_category, -1)
+    if now and (not was or old_category != instance.category_id):
+        adjust_category(instance.category_id, 1)
+
+    if was != now and previous is not None:
+        if tag_ids is None:
+            tag_ids = instance.tags.values_list('id', flat=True)
+        adjust_tags(tag_ids, 1 if now else -1)
+
+
+def published_tag_links(**filters):
+    """已发表文章与标签的关联"""
+    return Article.tags.through.objects.filter(
+        article__status='p', article__pub_time__isnull=False, **filters
+    )
+
+
+def recount(category_ids=None, tag_ids=None):
+    """根据文章表重新统计分类和标签的已发表文章数量，返回修正的记录数
+
+    给出 category_ids 或 tag_ids 时只统计其中的分类或标签（批量修改后），为 None 时统计全部。
+    """
+    categories = Article.published.filter(category__isnull=False)
+    links = published_tag_links()
+    if category_ids is not None:
+        categories = categories.filter(category_id__in=category_ids)
+    if tag_ids is not None:
+        links = links.filter(tag_id__in=tag_ids)
+    category_counts = dict(categories.values_list('category_id').annotate(count=Count('id')).order_by())
+    tag_counts = dict(links.values_list('tag_id').annotate(count=Count('id')).order_by())
+
+    fixed = 0
+    with transaction.atomic():
+        for model, ids, counts in ((Category, category_ids, category_counts), (Tag, tag_ids, tag_counts)):
+            rows = model.objects.only('id', 'published_count')
+            if ids is not None:
+                rows = rows.filter(pk__in=ids)
+            drifted = []
+            for obj in rows.iterator():
+                count = counts.get(obj.pk, 0)
+                if obj.published_count != count:
+                    obj.published_count = count
+                    drifted.append(obj)
+            model.objects.bulk_update(drifted, ['published_count'], batch_size=500)
+            fixed += len(drifted)
+    return fixed
+
+
+def recount_tag(tag_id):
+    """从标签一侧修改关联后重新统计该标签"""
+    Tag.objects.filter(pk=tag_id).update(published_count=published_tag_links(tag_id=tag_id).count())
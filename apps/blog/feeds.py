@@ -0,0 +1,238 @@
+"""RSS/Atom 订阅和站点地图
+
+只用 values() 查询需要的字段，以 StreamingHttpResponse 边生成边输出；生成结果按内容版本缓存。
+ETag/Last-Modified 取自订阅范围内文章的最大 last_mod_time 和文章数，内容没有变化时直接返回304。
+"""
+import hashlib
+from datetime import datetime, timezone as dt_timezone
+from xml.sax.saxutils import escape, quoteattr
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Max
+from django.http import Http404, StreamingHttpResponse
+from django.urls import reverse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+from apps.blog.cache import get_or_build, versioned_key
+from apps.blog.models import Article, Category, Tag
+
+SITE_TITLE = '金笔头博客'
+EPOCH = datetime.fromtimestamp(0, tz=dt_timezone.utc)
+
+
+def _published(**filters):
+    return Article.published.filter(**filters)
+
+
+def _feed_meta(kind, value):
+    """解析订阅范围，返回标题、过滤条件和校验信息；不存在时返回 None"""
+    def build():
+        if kind == 'site':
+            title, filters = SITE_TITLE, {}
+        elif kind == 'category':
+            name = Category.objects.filter(id=value).values_list('name', flat=True).first()
+            if name is None:
+                return False
+            title, filters = f'{SITE_TITLE} - {name}', {'category_id': value}
+        else:
+            row = Tag.objects.filter(slug=value).values_list('id', 'name').first()
+            if row is None:
+                return False
+            title, filters = f'{SITE_TITLE} - {row[1]}', {'tags__id': row[0]}
+        stats = _published(**filters).aggregate(latest=Max('last_mod_time'), count=Count('id'))
+        return {'title': title, 'filters': filters, 'latest': stats['latest'] or EPOCH, 'count': stats['count']}
+
+    # 不存在的分类/标签缓存为 False，避免反复查询
+    meta = get_or_build(f'feed-meta:{kind}:{value}', build)
+    return meta or None
+
+
+def _stream(request, name, validators, content_type, generate):
+    """条件请求直接返回304；否则输出缓存内容，或边生成边输出并在结束后写入缓存"""
+    latest, extra = validators
+    digest = hashlib.md5(f'{name}|{latest.timestamp()}|{extra}'.encode('utf-8')).hexdigest()
+    etag = f'"{digest}"'
+    last_modified = int(latest.timestamp())
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        key = versioned_key(f'feed:{request.get_host()}:{name}')
+        cached = cache.get(key)
+        response = StreamingHttpResponse(
+            [cached] if cached is not None else _caching(key, generate()),
+            content_type=content_type,
+        )
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    return response
+
+
+def _caching(key, chunks):
+    parts = []
+    for chunk in chunks:
+        parts.append(chunk)
+        yield chunk
+    cache.set(key, ''.join(parts), getattr(settings, 'BLOG_FEED_CACHE_TIMEOUT', 3600))
+
+
+def _feed_rows(filters):
+    return _published(**filters).order_by('-pub_time', '-id').values(
+        'id', 'title', 'summary', 'pub_time', 'last_mod_time', 'category__name'
+    )[:getattr(settings, 'BLOG_FEED_ITEMS', 20)]
+
+
+def _rss(request, meta, self_url):
+    home = request.build_absolute_uri(reverse('home'))
+    yield '<?xml version="1.0" encoding="utf-8"?>\n'
+    yield '<rss version="2.0" xmlns:atom="http://www.w3.org/2005/Atom"><channel>'
+    yield f'<title>{escape(meta["title"])}</title><link>{escape(home)}</link>'
+    yield f'<description>{escape(meta["title"])}</description><language>zh-cn</language>'
+    yield f'<lastBuildDate>{http_date(meta["latest"].timestamp())}</lastBuildDate>'
+    yield f'<atom:link href={quoteattr(self_url)} rel="self" type="application/rss+xml"/>'
+    for row in _feed_rows(meta['filters']).iterator():
+        link = escape(request.build_absolute_uri(reverse('detail', args=[row['id']])))
+        category = f'<category>{escape(row["category__name"])}</category>' if row['category__name'] else ''
+        yield (
+            f'<item><title>{escape(row["title"])}</title><link>{link}</link>'
+            f'<guid isPermaLink="true">{link}</guid>'
+            f'<pubDate>{http_date(row["pub_time"].timestamp())}</pubDate>{category}'
+            f'<description>{escape(row["summary"])}</description></item>'
+        )
+    yield '</channel></rss>\n'
+
+
+def _atom(request, meta, self_url):
+    home = request.build_absolute_uri(reverse('home'))
+    yield '<?xml version="1.0" encoding="utf-8"?>\n'
+    yield '<feed xmlns="http://www.w3.org/2005/Atom" xml:lang="zh-cn">'
+    yield f'<title>{escape(meta["title"])}</title><id>{escape(self_url)}</id>'
+    yield f'<link href={quoteattr(home)} rel="alternate"/><link href={quoteattr(self_url)} rel="self"/>'
+    yield f'<updated>{meta["latest"].isoformat()}</updated><author><name>{escape(SITE_TITLE)}</name></author>'
+    for row in _feed_rows(meta['filters']).iterator():
+        link = request.build_absolute_uri(reverse('detail', args=[row['id']]))
+        category = f'<category term={quoteattr(row["category__name"])}/>' if row['category__name'] else ''
+        yield (
+            f'<entry><title>{escape(row["title"])}</title><link href={quoteattr(link)} rel="alternate"/>'
+            f'<id>{escape(link)}</id><published>{row["pub_time"].isoformat()}</published>'
+            f'<updated>{row["last_mod_time"].isoformat()}</updated>{category}'
+            f'<summary>{escape(row["summary"])}</summary></entry>'
+        )
+    yield '</feed>\n'
+
+
+FEED_FORMATS = {
+    'rss': (_rss, 'application/rss+xml; charset=utf-8'),
+    'atom': (_atom, 'application/atom+xml; charset=utf-8'),
+}
+
+
+def _feed(request, kind, value, fmt):
+    meta = _feed_meta(kind, value)
+    if meta is None:
+        raise Http404
+    generate, content_type = FEED_FORMATS[fmt]
+    self_url = request.build_absolute_uri()
+    return _stream(
+        request, f'{fmt}:{kind}:{value}', (meta['latest'], meta['count']), content_type,
+        lambda: generate(request, meta, self_url),
+    )
+
+
+def site_feed(request, fmt='rss'):
+    """全站订阅"""
+    return _feed(request, 'site', '', fmt)
+
+
+def category_feed(request, id, fmt='rss'):
+    """分类订阅"""
+    return _feed(request, 'category', id, fmt)
+
+
+def tag_feed(request, slug, fmt='rss'):
+    """标签订阅"""
+    return _feed(request, 'tag', slug, fmt)
+
+
+# ---- 站点地图 ----
+
+def _chunk_size():
+    return getattr(settings, 'BLOG_SITEMAP_CHUNK_SIZE', 1000)
+
+
+def _sitemap_chunks():
+    """按文章id顺序分块，返回每块的 (最后修改时间, 最大id)，按内容版本缓存"""
+    def build():
+        size = _chunk_size()
+        chunks = []
+        rows = _published().order_by('id').values_list('last_mod_time', 'id')
+        for index, (last_mod, pk) in enumerate(rows.iterator(chunk_size=size)):
+            if index % size == 0:
+                chunks.append((last_mod, pk))
+            else:
+                chunks[-1] = (max(chunks[-1][0], last_mod), pk)
+        return chunks
+
+    return get_or_build('sitemap-chunks', build)
+
+
+def _url(loc, lastmod=None):
+    lastmod = f'<lastmod>{lastmod.isoformat()}</lastmod>' if lastmod else ''
+    return f'<url><loc>{escape(loc)}</loc>{lastmod}</url>'
+
+
+def sitemap_index(request):
+    """站点地图索引：一个分类/标签页面的子地图，加上按文章分块的子地图"""
+    chunks = _sitemap_chunks()
+    latest = max((last_mod for last_mod, _ in chunks), default=EPOCH)
+
+    def generate():
+        yield '<?xml version="1.0" encoding="utf-8"?>\n'
+        yield '<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+        loc = request.build_absolute_uri(reverse('sitemap_sections'))
+        yield f'<sitemap><loc>{escape(loc)}</loc><lastmod>{latest.isoformat()}</lastmod></sitemap>'
+        for page, (last_mod, _) in enumerate(chunks, start=1):
+            loc = request.build_absolute_uri(reverse('sitemap_articles', args=[page]))
+            yield f'<sitemap><loc>{escape(loc)}</loc><lastmod>{last_mod.isoformat()}</lastmod></sitemap>'
+        yield '</sitemapindex>\n'
+
+    return _stream(request, 'sitemap', (latest, chunks[-1][1] if chunks else 0), 'application/xml; charset=utf-8', generate)
+
+
+def sitemap_sections(request):
+    """首页、分类和标签页面"""
+    chunks = _sitemap_chunks()
+    latest = max((last_mod for last_mod, _ in chunks), default=EPOCH)
+    counts = get_or_build('sitemap-sections', lambda: (Category.objects.count(), Tag.objects.count()))
+
+    def generate():
+        yield '<?xml version="1.0" encoding="utf-8"?>\n'
+        yield '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+        yield _url(request.build_absolute_uri(reverse('home')), latest)
+        for pk in Category.objects.order_by('id').values_list('id', flat=True).iterator():
+            yield _url(request.build_absolute_uri(reverse('category_menu', args=[pk])))
+        for slug in Tag.objects.order_by('id').values_list('slug', flat=True).iterator():
+            yield _url(request.build_absolute_uri(reverse('search_tag', args=[slug])))
+        yield '</urlset>\n'
+
+    return _stream(request, 'sitemap-sections', (latest, counts), 'application/xml; charset=utf-8', generate)
+
+
+def sitemap_articles(request, page):
+    """一块文章页面"""
+    chunks = _sitemap_chunks()
+    if not 1 <= page <= len(chunks):
+        raise Http404
+    size = _chunk_size()
+
+    def generate():
+        yield '<?xml version="1.0" encoding="utf-8"?>\n'
+        yield '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+        rows = _published().order_by('id').values_list('id', 'last_mod_time')[(page - 1) * size:page * size]
+        for pk, last_mod in rows.iterator():
+            yield _url(request.build_absolute_uri(reverse('detail', args=[pk])), last_mod)
+        yield '</urlset>\n'
+
+    # 块内有文章撤回或删除时，块的最大id或后续块的边界会变化
+    return _stream(request, f'sitemap-{page}', (chunks[page - 1][0], chunks[page - 1][1]),
+                   'application/xml; charset=utf-8', generate)
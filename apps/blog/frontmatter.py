@@ -0,0 +1,75 @@
+"""带前置元数据（front matter）的Markdown文件读写，供文章批量导入导出使用
+
+只支持导入导出用到的简单格式，不依赖 YAML 库：
+
+    ---
+    title: 文章标题
+    category: Python
+    tags: ["django", "性能"]
+    status: p
+    pub_time: 2025-01-01T10:00:00+08:00
+    ---
+
+    正文
+"""
+import json
+
+DELIMITER = '---'
+
+
+def _parse_value(raw):
+    raw = raw.strip()
+    if raw[:1] in ('[', '"'):
+        try:
+            return json.loads(raw)
+        except ValueError:
+            pass
+    if raw.startswith('[') and raw.endswith(']'):
+        return [item.strip().strip('\'"') for item in raw[1:-1].split(',') if item.strip()]
+    if len(raw) >= 2 and raw[0] == raw[-1] == "'":
+        return raw[1:-1]
+    return raw
+
+
+def parse(text):
+    """解析文本，返回 (元数据字典, 正文)；没有前置元数据时元数据为空"""
+    text = text.lstrip('﻿').replace('\r\n', '\n')
+    lines = text.split('\n')
+    if not lines or lines[0].strip() != DELIMITER:
+        return {}, text
+    try:
+        end = next(i for i in range(1, len(lines)) if lines[i].strip() == DELIMITER)
+    except StopIteration:
+        return {}, text
+
+    meta, key = {}, None
+    for line in lines[1:end]:
+        stripped = line.strip()
+        if not stripped or stripped.startswith('#'):
+            continue
+        if stripped.startswith('- ') and key is not None:  # 块状列表 "  - 值"
+            if not isinstance(meta.get(key), list):
+                meta[key] = []
+            meta[key].append(_parse_value(stripped[2:]))
+            continue
+        key, _, value = line.partition(':')
+        key = key.strip()
+        meta[key] = _parse_value(value) if value.strip() else []
+    return meta, '\n'.join(lines[end + 1:]).lstrip('\n')
+
+
+def _dump_value(value):
+    if isinstance(value, (list, tuple)):
+        return json.dumps(list(value), ensure_ascii=False)
+    value = str(value)
+    if value != value.strip() or value[:1] in ('[', '"', "'", '#', '-') or ':' in value:
+        return json.dumps(value, ensure_ascii=False)
+    return value
+
+
+def dump(meta, body):
+    """生成带前置元数据的Markdown文本，值为 None 的字段省略"""
+    lines = [DELIMITER]
+    lines += [f'{key}: {_dump_value(value)}' for key, value in meta.items() if value is not None]
+    lines.append(DELIMITER)
+    return '\n'.join(lines) + '\n\n' + (body or '').replace('\r\n', '\n')
@@ -0,0 +1,241 @@
+"""编辑器上传图片的优化处理
+
+上传后由后台任务生成多种宽度的 WebP/JPEG 版本和缩略图，按文件内容哈希存放，相同图片只处理一次。
+渲染Markdown时把已处理的站内图片改写为 <picture>/srcset，并补充宽高和 loading="lazy"；
+尚未处理的图片只输出原图。保存文章时为其中尚未处理的图片提交后台任务，处理完成后重新渲染引用该图片的文章；
+页面请求中的渲染不写数据库。
+未安装 Pillow 时只补充 loading="lazy"。
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from urllib.parse import unquote
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.html import escape
+from mdeditor.views import UploadView
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow 为可选依赖
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp')
+THUMBNAIL_SIZE = (320, 320)
+IMG_RE = re.compile(r'<img\b([^>]*?)\s*/?>', re.IGNORECASE)
+ATTR_RE = re.compile(r'''([\w-]+)=(?:"([^"]*)"|'([^']*)')''')
+
+# 渲染中遇到未处理的图片时：INLINE 直接处理（后台任务和命令中），SCHEDULE 提交后台任务（保存文章时），
+# 默认只输出原图（页面请求中）
+INLINE, SCHEDULE = 'inline', 'schedule'
+_missing_images = ContextVar('blog_missing_images', default=None)
+
+def _widths():
+    return getattr(settings, 'BLOG_IMAGE_WIDTHS', (480, 960, 1600))
+
+
+def variant_dir():
+    return getattr(settings, 'BLOG_IMAGE_VARIANT_DIR', 'editor/variants/')
+
+
+def file_digest(path):
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 16), b''):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def local_path(url):
+    """站内媒体文件URL对应的本地路径，不是媒体目录下的文件时返回 None"""
+    if not url.startswith(settings.MEDIA_URL):
+        return None
+    root = os.path.abspath(settings.MEDIA_ROOT)
+    path = os.path.abspath(os.path.join(root, unquote(url[len(settings.MEDIA_URL):])))
+    if not path.startswith(root + os.sep) or not os.path.isfile(path):
+        return None
+    return path
+
+
+def _target_widths(width):
+    """比原图小的预设宽度，再加上不超过最大预设宽度的原图宽度"""
+    widths = [w for w in _widths() if w < width]
+    widths.append(min(width, max(_widths())))
+    return sorted(set(widths))
+
+
+def _save(image, path, fmt, **params):
+    # 先写临时文件再替换，上传后台处理和渲染时补处理可能同时进行
+    tmp = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    image.save(tmp, fmt, **params)
+    os.replace(tmp, path)
+
+
+def _to_rgb(image):
+    if image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    return image.convert('RGB')
+
+
+def process_image(path):
+    """生成图片的各尺寸版本和缩略图，返回图片信息；已处理过的相同内容直接读取结果"""
+    digest = file_digest(path)
+    rel_folder = f'{variant_dir()}{digest[:2]}/{digest}/'
+    folder = os.path.join(settings.MEDIA_ROOT, rel_folder)
+    meta_path = os.path.join(folder, 'meta.json')
+    if os.path.exists(meta_path):
+        with open(meta_path, encoding='utf-8') as f:
+            return json.load(f)
+
+    os.makedirs(folder, exist_ok=True)
+    with Image.open(path) as source:
+        animated = getattr(source, 'is_animated', False)
+        image = source if animated else ImageOps.exif_transpose(source)
+        width, height = image.size
+        widths = []
+        if not animated:  # 动图保留原文件
+            for w in _target_widths(width):
+                resized = image if w == width else image.resize((w, max(1, round(height * w / width))), Image.LANCZOS)
+                _save(resized, os.path.join(folder, f'{w}.webp'), 'WEBP', quality=80, method=4)
+                _save(_to_rgb(resized), os.path.join(folder, f'{w}.jpg'), 'JPEG', quality=82,
+                      optimize=True, progressive=True)
+                widths.append(w)
+            thumbnail = _to_rgb(image)
+            thumbnail.thumbnail(THUMBNAIL_SIZE, Image.LANCZOS)
+            _save(thumbnail, os.path.join(folder, 'thumb.jpg'), 'JPEG', quality=80, optimize=True)
+
+    meta = {'hash': digest, 'folder': rel_folder, 'width': width, 'height': height, 'widths': widths}
+    tmp = f'{meta_path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(meta, f)
+    os.replace(tmp, meta_path)
+    return meta
+
+
+def _info_key(path):
+    stat = os.stat(path)
+    return 'blog:image:' + hashlib.md5(f'{path}|{stat.st_size}|{stat.st_mtime_ns}'.encode('utf-8')).hexdigest()
+
+
+def cache_image_info(path):
+    """处理图片并按文件路径、大小和修改时间缓存结果，无法处理的图片缓存为 False；返回处理结果"""
+    try:
+        info = process_image(path)
+    except Exception:
+        logger.exception('图片处理失败：%s', path)
+        info = False
+    cache.set(_info_key(path), info, None)
+    return info or None
+
+
+@contextmanager
+def _handling_missing_images(mode):
+    token = _missing_images.set(mode)
+    try:
+        yield
+    finally:
+        _missing_images.reset(token)
+
+
+def inline_processing():
+    """在其中渲染时直接处理尚未处理的图片，只用于后台任务和管理命令"""
+    return _handling_missing_images(INLINE)
+
+
+def scheduled_processing():
+    """在其中渲染时为尚未处理的图片提交后台任务，用于保存文章；已在直接处理时保持不变"""
+    return _handling_missing_images(_missing_images.get() or SCHEDULE)
+
+
+def image_info(url):
+    """站内图片的处理结果；尚未处理或无法处理时返回 None"""
+    if Image is None:
+        return None
+    path = local_path(url)
+    if path is None:
+        return None
+    info = cache.get(_info_key(path))
+    if info is None:
+        mode = _missing_images.get()
+        if mode == INLINE:
+            return cache_image_info(path)
+        if mode == SCHEDULE:
+            schedule(url)
+    return info or None
+
+
+def _variant_url(info, name):
+    return f'{settings.MEDIA_URL}{info["folder"]}{name}'
+
+
+def _img_tag(attrs):
+    return '<img ' + ' '.join(f'{name}="{value}"' for name, value in attrs.items()) + ' />'
+
+
+def _parse_attrs(text):
+    """解析双引号或单引号的属性；单引号的值改用双引号输出，其中的双引号需要转义"""
+    return {
+        match.group(1): match.group(2) if match.group(2) is not None else match.group(3).replace('"', '&quot;')
+        for match in ATTR_RE.finditer(text)
+    }
+
+
+def _rewrite(match):
+    attrs = _parse_attrs(match.group(1))
+    attrs.setdefault('loading', 'lazy')
+    attrs.setdefault('decoding', 'async')
+    info = image_info(attrs.get('src', '').replace('&amp;', '&'))
+    if info is None:
+        return _img_tag(attrs)
+
+    attrs.setdefault('width', str(info['width']))
+    attrs.setdefault('height', str(info['height']))
+    if not info['widths']:
+        return _img_tag(attrs)
+
+    sizes = escape(getattr(settings, 'BLOG_IMAGE_SIZES', '(max-width: 768px) 100vw, 768px'))
+    largest = info['widths'][-1]
+    attrs['src'] = escape(_variant_url(info, f'{largest}.jpg'))
+    attrs['srcset'] = escape(', '.join(f'{_variant_url(info, f"{w}.jpg")} {w}w' for w in info['widths']))
+    attrs['sizes'] = sizes
+    webp = escape(', '.join(f'{_variant_url(info, f"{w}.webp")} {w}w' for w in info['widths']))
+    return f'<picture><source type="image/webp" srcset="{webp}" sizes="{sizes}" />{_img_tag(attrs)}</picture>'
+
+
+def rewrite_images(html):
+    """为渲染结果中的图片补充响应式版本、宽高和延迟加载"""
+    if '<img' not in html:
+        return html
+    return IMG_RE.sub(_rewrite, html)
+
+
+def schedule(url):
+    """提交处理刚上传的图片的后台任务"""
+    from apps.blog.jobs import enqueue
+
+    path = local_path(url)
+    if Image is None or path is None or not path.lower().endswith(IMAGE_EXTENSIONS):
+        return
+    enqueue('process_image', key=hashlib.md5(url.encode('utf-8')).hexdigest(), url=url)
+
+
+class OptimizedUploadView(UploadView):
+    """mdeditor 图片上传，保存后安排后台生成优化版本"""
+
+    def post(self, request, *args, **kwargs):
+        response = super().post(request, *args, **kwargs)
+        result = json.loads(response.content)
+        if result.get('success') == 1:
+            schedule(result['url'])
+        return response
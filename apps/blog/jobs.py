@@ -0,0 +1,255 @@
+"""数据库表实现的后台任务队列
+
+保存文章等请求中只提交任务（与业务数据在同一事务中写入 job 表），派生数据的计算在请求之外执行：
+- BLOG_JOB_MODE = 'thread'：在Web进程的线程池中执行，适合单容器部署（管理命令等其他进程只入队）；
+- BLOG_JOB_MODE = 'worker'：只入队，由 python manage.py run_jobs 执行；
+- BLOG_JOB_MODE = 'immediate'：事务提交后在当前线程立即执行，便于开发调试。
+同一个去重键最多只有一个等待中的任务，重复提交时按任务定义的 merge 函数合并参数。
+失败的任务按指数退避重试，超过次数后标记为失败并保留错误信息。
+"""
+import logging
+import os
+import socket
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.signals import request_started
+from django.db import IntegrityError, close_old_connections, transaction
+from django.db.models import Count, F
+from django.utils import timezone
+
+from apps.blog.models import Job
+
+logger = logging.getLogger(__name__)
+
+_tasks = {}
+
+
+class Task:
+    def __init__(self, name, func, merge=None, max_attempts=None):
+        self.name = name
+        self.func = func
+        self.merge = merge
+        self.max_attempts = max_attempts
+
+
+def task(name, merge=None, max_attempts=None):
+    """注册任务函数；merge(旧参数, 新参数) 返回合并后的参数，未指定时使用新参数"""
+    def decorator(func):
+        _tasks[name] = Task(name, func, merge, max_attempts)
+        return func
+    return decorator
+
+
+_mode_override = None
+
+
+def _mode():
+    return _mode_override or getattr(settings, 'BLOG_JOB_MODE', 'thread')
+
+
+@contextmanager
+def job_mode(mode):
+    """批量处理命令中临时指定任务的执行方式（对整个进程生效）"""
+    global _mode_override
+    previous, _mode_override = _mode_override, mode
+    try:
+        yield
+    finally:
+        _mode_override = previous
+
+
+def _max_attempts(job_task):
+    return job_task.max_attempts or getattr(settings, 'BLOG_JOB_MAX_ATTEMPTS', 3)
+
+
+def enqueue(name, key=None, delay=0, **payload):
+    """提交任务；已有相同去重键的等待中任务时合并参数，执行时间取两者中较早的"""
+    job_task = _tasks[name]
+    key = f'{name}:{key}' if key is not None else name
+    run_at = timezone.now() + timedelta(seconds=delay)
+    with transaction.atomic():
+        existing = Job.objects.select_for_update().filter(key=key, status=Job.PENDING).first()
+        if existing is None:
+            try:
+                with transaction.atomic():
+                    Job.objects.create(name=name, key=key, payload=payload, run_at=run_at)
+            except IntegrityError:  # 并发提交了相同的任务
+                existing = Job.objects.select_for_update().get(key=key, status=Job.PENDING)
+        if existing is not None:
+            existing.payload = _merge(job_task, existing.payload, payload)
+            existing.run_at = min(existing.run_at, run_at)
+            existing.save(update_fields=['payload', 'run_at'])
+    transaction.on_commit(_wake)
+
+
+def _merge(job_task, old, new):
+    return job_task.merge(old, new) if job_task is not None and job_task.merge else new
+
+
+def _worker_id():
+    return f'{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}'
+
+
+def claim(limit):
+    """领取到期的任务并标记为执行中；超时未完成的任务（执行者异常退出）重新变为等待"""
+    now = timezone.now()
+    timeout = timedelta(seconds=getattr(settings, 'BLOG_JOB_TIMEOUT', 600))
+    for job in Job.objects.filter(status=Job.RUNNING, locked_at__lt=now - timeout):
+        _requeue(job)
+
+    candidates = list(Job.objects.filter(status=Job.PENDING, run_at__lte=now).order_by(
+        'run_at', 'id').values_list('id', flat=True)[:limit])
+    claimed, worker = [], _worker_id()
+    for pk in candidates:
+        # 条件更新保证多个执行者不会领取同一个任务
+        if Job.objects.filter(pk=pk, status=Job.PENDING).update(
+                status=Job.RUNNING, locked_by=worker, locked_at=now, attempts=F('attempts') + 1):
+            claimed.append(pk)
+    return list(Job.objects.filter(pk__in=claimed).order_by('run_at', 'id'))
+
+
+def _requeue(job, run_at=None, error=''):
+    """把任务改回等待状态；已有相同去重键的等待中任务时把参数合并到该任务后删除本任务"""
+    fields = {'status': Job.PENDING, 'locked_by': '', 'locked_at': None}
+    if run_at is not None:
+        fields['run_at'] = run_at
+    if error:
+        fields['last_error'] = error
+    while True:
+        with transaction.atomic():
+            try:
+                with transaction.atomic():
+                    Job.objects.filter(pk=job.pk).update(**fields)
+                return
+            except IntegrityError:
+                pass
+            existing = Job.objects.select_for_update().filter(key=job.key, status=Job.PENDING).first()
+            if existing is not None:
+                # 等待中的任务是较晚提交的，本任务的参数作为较早的一方合并
+                existing.payload = _merge(_tasks.get(job.name), job.payload, existing.payload)
+                existing.save(update_fields=['payload'])
+                Job.objects.filter(pk=job.pk).delete()
+                return
+        # 等待中的任务恰好被领取，重新尝试改回等待
+
+
+def execute(job):
+    """执行一个已领取的任务：成功后删除，失败时按指数退避重试或标记为失败"""
+    job_task = _tasks.get(job.name)
+    try:
+        if job_task is None:
+            raise LookupError(f'未注册的任务：{job.name}')
+        job_task.func(**job.payload)
+    except Exception:
+        error = traceback.format_exc()
+        logger.exception('后台任务执行失败：%s（第 %s 次）', job.key, job.attempts)
+        if job_task is not None and job.attempts < _max_attempts(job_task):
+            delay = getattr(settings, 'BLOG_JOB_RETRY_DELAY', 10) * 2 ** (job.attempts - 1)
+            _requeue(job, run_at=timezone.now() + timedelta(seconds=delay), error=error)
+        else:
+            Job.objects.filter(pk=job.pk).update(status=Job.FAILED, last_error=error, locked_at=None)
+        return False
+    Job.objects.filter(pk=job.pk).delete()
+    return True
+
+
+def _execute_in_thread(job):
+    close_old_connections()
+    try:
+        return execute(job)
+    finally:
+        close_old_connections()
+
+
+def run_pending(limit=None, pool=None):
+    """执行所有到期的任务（执行期间新提交的也会执行），返回执行的任务数量"""
+    batch = pool._max_workers * 2 if pool is not None else 20
+    count = 0
+    while limit is None or count < limit:
+        jobs = claim(batch if limit is None else min(batch, limit - count))
+        if not jobs:
+            break
+        if pool is not None:
+            list(pool.map(_execute_in_thread, jobs))
+        else:
+            for job in jobs:
+                execute(job)
+        count += len(jobs)
+    return count
+
+
+def queue_depth():
+    """按状态和任务名统计队列中的任务数量：{(状态, 任务名): 数量}"""
+    return {
+        (row['status'], row['name']): row['count']
+        for row in Job.objects.values('status', 'name').annotate(count=Count('id')).order_by()
+    }
+
+
+class InProcessExecutor:
+    """进程内执行器：后台调度线程被唤醒或定时轮询时领取任务，交给线程池执行"""
+
+    def __init__(self, threads):
+        self.pool = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='blog-job')
+        self.event = threading.Event()
+        self.thread = threading.Thread(target=self._loop, name='blog-job-dispatcher', daemon=True)
+        self.thread.start()
+
+    def wake(self):
+        self.event.set()
+
+    def _loop(self):
+        interval = getattr(settings, 'BLOG_JOB_POLL_INTERVAL', 5)
+        while True:
+            self.event.wait(interval)
+            self.event.clear()
+            close_old_connections()
+            try:
+                run_pending(pool=self.pool)
+            except Exception:
+                logger.exception('后台任务调度失败')
+            finally:
+                close_old_connections()
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def has_worker():
+    """是否有执行者在当前请求之外处理任务（'worker' 模式，或本进程已启动进程内执行器）"""
+    mode = _mode()
+    return mode == 'worker' or (mode == 'thread' and _executor is not None)
+
+
+def _start_executor(**kwargs):
+    global _executor
+    if _executor is not None or _mode() != 'thread':
+        return
+    with _executor_lock:
+        if _executor is None:
+            _executor = InProcessExecutor(getattr(settings, 'BLOG_JOB_THREADS', 2))
+    # 处理本进程启动前（例如管理命令）入队的任务
+    _executor.wake()
+
+
+def serve_jobs():
+    """由 WSGI/ASGI 入口调用：'thread' 模式下在处理第一个请求时启动进程内执行器
+
+    在请求到来时才启动，预先加载应用再 fork 的服务器中执行器位于各个工作进程；
+    管理命令和测试不经过这些入口，不会启动执行器与命令本身同时写数据库。
+    """
+    request_started.connect(_start_executor, dispatch_uid='blog_job_executor')
+
+
+def _wake():
+    mode = _mode()
+    if mode == 'immediate':
+        run_pending()
+    elif mode == 'thread' and _executor is not None:
+        _executor.wake()
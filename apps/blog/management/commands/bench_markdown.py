@@ -0,0 +1,90 @@
+import time
+
+import markdown
+from django.core.management.base import BaseCommand
+
+from apps.blog import rendering
+from apps.blog.models import Article
+
+SAMPLE = '''# 示例文章 {n}
+
+这是一段用于基准测试的正文，包含**加粗**、*斜体*、[链接](https://example.com) 和 `行内代码`。
+
+| 列1 | 列2 |
+| --- | --- |
+| a   | b   |
+
+```python
+def fib(n):
+    a, b = 0, 1
+    for _ in range(n):
+        a, b = b, a + b
+    return a
+```
+
+    # 未标注语言的缩进代码块
+    for i in range(10):
+        print(i)
+
+```javascript
+document.querySelectorAll('pre').forEach(function (el) {{
+    el.classList.add('copyable');
+}});
+```
+
+段落 {n} 结束。[^1]
+
+[^1]: 脚注内容
+'''
+
+
+class Command(BaseCommand):
+    help = 'Markdown渲染微基准：对比每次新建 Markdown 实例与复用渲染器+代码高亮缓存的吞吐量'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from-db', action='store_true', help='使用数据库中的文章正文作为样本')
+        parser.add_argument('--samples', type=int, default=50, help='内置样本数量（未使用 --from-db 时）')
+        parser.add_argument('--rounds', type=int, default=3, help='每种方式重复渲染样本的轮数')
+
+    def handle(self, *args, **options):
+        if options['from_db']:
+            texts = list(Article.objects.exclude(content='').values_list('content', flat=True)[:500])
+        else:
+            texts = [SAMPLE.format(n=n) for n in range(options['samples'])]
+        if not texts:
+            self.stdout.write('没有可用的样本')
+            return
+        rounds = options['rounds']
+
+        def fresh_instance(text):
+            md = markdown.Markdown(
+                extensions=rendering.MARKDOWN_EXTENSIONS,
+                extension_configs=rendering.MARKDOWN_EXTENSION_CONFIGS
+            )
+            return md.convert(text)
+
+        # 旧实现：每次新建实例，且不使用代码高亮缓存
+        maxsize = rendering.highlight_cache.maxsize
+        rendering.highlight_cache.maxsize = 0
+        try:
+            before = self._measure(lambda: [fresh_instance(text) for text in texts], rounds, len(texts))
+        finally:
+            rendering.highlight_cache.maxsize = maxsize
+
+        rendering.highlight_cache.clear()
+        after = self._measure(lambda: [rendering.render_markdown(text) for text in texts], rounds, len(texts))
+        batch = self._measure(lambda: rendering.render_many(texts), rounds, len(texts))
+
+        self.stdout.write(f'样本 {len(texts)} 篇 × {rounds} 轮')
+        self.stdout.write(f'每次新建实例:       {before:8.1f} 次/秒')
+        self.stdout.write(f'复用渲染器+高亮缓存: {after:8.1f} 次/秒 ({after / before:.1f}x)')
+        self.stdout.write(f'render_many 批量:    {batch:8.1f} 次/秒 ({batch / before:.1f}x)')
+        cache = rendering.highlight_cache
+        self.stdout.write(f'高亮缓存命中 {cache.hits} 次，未命中 {cache.misses} 次')
+
+    @staticmethod
+    def _measure(run, rounds, count):
+        start = time.perf_counter()
+        for _ in range(rounds):
+            run()
+        return count * rounds / (time.perf_counter() - start)
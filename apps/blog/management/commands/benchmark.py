@@ -0,0 +1,338 @@
+import json
+import logging
+import os
+import random
+import re
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import ContextVar
+from datetime import timedelta
+from io import BytesIO
+from urllib.parse import urlencode
+from wsgiref.util import setup_testing_defaults
+
+from django.core.cache import cache
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.backends.signals import connection_created
+from django.test.utils import override_settings
+from django.urls import URLPattern, URLResolver, get_resolver
+from django.urls.resolvers import RoutePattern
+from django.utils import timezone
+
+from apps.blog.archive import rebuild_archive_index
+from apps.blog.counts import recount
+from apps.blog.jobs import job_mode
+from apps.blog.models import Article, Category, Tag
+from apps.blog.related import rebuild_related
+from apps.blog.rendering import render_contents
+from apps.blog.search import rebuild_search_index
+from apps.blog.timeline import rebuild_timeline
+
+WORDS = ('博客', '性能', '缓存', '数据库', '索引', '查询', '模板', '渲染', 'Django', 'Python',
+         'PostgreSQL', 'Redis', 'Nginx', 'Docker', 'async', 'worker', 'latency', 'profile')
+
+SNIPPETS = {
+    'python': 'def handler(request):\n    items = Item.objects.select_related("owner")[:20]\n'
+              '    return render(request, "list.html", {"items": items})',
+    'javascript': 'fetch("/api/tagcloud/")\n  .then(function (r) { return r.json(); })\n'
+                  '  .then(function (data) { draw(data); });',
+    'sql': 'SELECT id, title FROM article\nWHERE status = \'p\'\nORDER BY pub_time DESC LIMIT 5;',
+    'bash': 'python manage.py migrate\npython manage.py collectstatic --noinput\n'
+            'gunicorn jbt_blog.wsgi -w 4',
+}
+
+# 不纳入测量的路由：后台、编辑器上传和静态/媒体文件
+SKIPPED_NAMESPACES = {'admin'}
+SKIPPED_PREFIXES = ('mdeditor/',)
+# 需要检索词参数的路由
+QUERY_ROUTES = {'search', 'search_json'}
+
+# 当前请求的查询计数器；异步视图在其他线程执行查询，contextvar 会随之传递
+_query_counter = ContextVar('benchmark_query_counter', default=None)
+
+
+def _count_queries(execute, sql, params, many, context):
+    counter = _query_counter.get()
+    if counter is not None:
+        counter.append(sql)
+    return execute(sql, params, many, context)
+
+
+def _install_counter(sender, connection, **kwargs):
+    if _count_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_count_queries)
+
+
+class Command(BaseCommand):
+    help = '在临时数据库中生成测试数据，测量各页面的SQL查询数和延迟分位数，可与基线对比'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--articles', type=int, default=500, help='文章数量')
+        parser.add_argument('--tags', type=int, default=40, help='标签数量')
+        parser.add_argument('--categories', type=int, default=8, help='分类数量')
+        parser.add_argument('--years', type=int, default=3, help='文章发布时间跨度（年）')
+        parser.add_argument('--requests', type=int, default=20, help='每个URL单线程测量的请求次数')
+        parser.add_argument('--concurrency', type=int, default=8, help='并发测量的线程数，0 表示跳过')
+        parser.add_argument('--seed', type=int, default=2025, help='随机数种子')
+        parser.add_argument('--page-cache', action='store_true', help='保留匿名整页缓存（默认关闭以测量视图本身）')
+        parser.add_argument('--output', default='benchmark.json', help='结果JSON文件路径')
+        parser.add_argument('--baseline', help='基线JSON文件，查询数超过基线时命令失败')
+        parser.add_argument('--tolerance', type=int, default=0, help='允许比基线多出的查询数')
+
+    def handle(self, *args, **options):
+        old_name = connection.settings_dict['NAME']
+        test_settings = connection.settings_dict.setdefault('TEST', {})
+        tmpdir = None
+        if connection.vendor == 'sqlite' and not test_settings.get('NAME'):
+            # 使用临时文件而不是内存库，并发线程各自连接同一个数据库
+            tmpdir = tempfile.mkdtemp(prefix='blog-bench-')
+            test_settings['NAME'] = os.path.join(tmpdir, 'bench.sqlite3')
+
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        connection_created.connect(_install_counter)
+        _install_counter(None, connection)
+        # 页面报错时结果中会记录状态码，不再逐条输出异常日志
+        request_logger = logging.getLogger('django.request')
+        request_logger.disabled = True
+        try:
+            # 只测量请求本身：测试库中提交的后台任务不执行，不与压测线程同时写数据库
+            with override_settings(BLOG_PAGE_CACHE_ENABLED=options['page_cache']), job_mode('worker'):
+                corpus = self._seed(options)
+                results = self._run(options, corpus)
+        finally:
+            request_logger.disabled = False
+            connection_created.disconnect(_install_counter)
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            if tmpdir:
+                test_settings.pop('NAME', None)
+                os.rmdir(tmpdir)
+
+        with open(options['output'], 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2, sort_keys=True)
+        self.stdout.write(f'结果已写入 {options["output"]}')
+
+        if options['baseline']:
+            self._compare(results, options['baseline'], options['tolerance'])
+
+    # ---- 生成测试数据 ----
+
+    def _seed(self, options):
+        rng = random.Random(options['seed'])
+        now = timezone.now()
+        span = timedelta(days=365 * options['years'])
+
+        categories = Category.objects.bulk_create(
+            [Category(name=f'分类{i}') for i in range(options['categories'])]
+        )
+        tags = []
+        for i in range(options['tags']):
+            tag = Tag(name=f'{rng.choice(WORDS)}-{i}')
+            tag.save()
+            tags.append(tag)
+
+        drafts = []
+        for i in range(options['articles']):
+            pub_time = now - span * rng.random()
+            drafts.append(dict(
+                title=f'{rng.choice(WORDS)} {rng.choice(WORDS)} 实践 {i}',
+                content=self._markdown(rng, i),
+                status='p' if rng.random() < 0.9 else 'd',
+                views=rng.randint(0, 5000),
+                created_time=pub_time, pub_time=pub_time, last_mod_time=pub_time,
+                category=rng.choice(categories) if categories else None,
+            ))
+        rendered = render_contents([draft['content'] for draft in drafts])
+        articles = Article.objects.bulk_create([
+            Article(content_hash=digest, content_html=html, summary=summary, **draft)
+            for draft, (digest, html, summary) in zip(drafts, rendered)
+        ], batch_size=500)
+
+        Through = Article.tags.through
+        links = []
+        for article in articles:
+            for tag in rng.sample(tags, min(len(tags), rng.randint(1, 4))):
+                links.append(Through(article_id=article.id, tag_id=tag.id))
+        Through.objects.bulk_create(links, batch_size=1000)
+
+        rebuild_archive_index()
+        rebuild_timeline()
+        rebuild_search_index()
+        recount()
+        rebuild_related()
+        cache.clear()
+
+        published = Article.published.order_by('-pub_time')
+        sample = published.first()
+        self.stdout.write(f'已生成 {len(articles)} 篇文章、{len(tags)} 个标签、{len(categories)} 个分类')
+        return {
+            'article': sample.id if sample else 0,
+            'category': sample.category_id if sample and sample.category_id else 0,
+            'slug': tags[0].slug if tags else 'none',
+            'year': timezone.localtime(sample.pub_time).strftime('%Y') if sample else '2025',
+            'month': timezone.localtime(sample.pub_time).strftime('%m') if sample else '01',
+            'query': WORDS[0],
+        }
+
+    @staticmethod
+    def _markdown(rng, n):
+        parts = [f'## 第{n}篇\n']
+        for _ in range(rng.randint(3, 8)):
+            parts.append(' '.join(rng.choice(WORDS) for _ in range(rng.randint(30, 80))) + '\n')
+            if rng.random() < 0.5:
+                lang = rng.choice(list(SNIPPETS))
+                parts.append(f'```{lang}\n{SNIPPETS[lang]}\n```\n')
+            if rng.random() < 0.2:
+                parts.append('| 指标 | 数值 |\n| --- | --- |\n| p95 | 120ms |\n')
+        return '\n'.join(parts)
+
+    # ---- 测量 ----
+
+    def _targets(self, corpus):
+        """遍历 URLconf，为每个路由填入测试数据生成可访问的路径"""
+        values = {'slug': corpus['slug'], 'year': corpus['year'], 'month': corpus['month'], 'page': '1'}
+        targets = []
+
+        def walk(patterns, prefix):
+            for entry in patterns:
+                if isinstance(entry, URLResolver):
+                    if entry.namespace in SKIPPED_NAMESPACES or not isinstance(entry.pattern, RoutePattern):
+                        continue
+                    walk(entry.url_patterns, prefix + str(entry.pattern))
+                elif isinstance(entry, URLPattern) and isinstance(entry.pattern, RoutePattern):
+                    route = prefix + str(entry.pattern)
+                    if route.startswith(SKIPPED_PREFIXES):
+                        continue
+
+                    def fill(match):
+                        name = match.group(1)
+                        if name == 'id':
+                            return str(corpus['category'] if 'category' in route else corpus['article'])
+                        return values[name]
+
+                    path = '/' + re.sub(r'<(?:\w+:)?(\w+)>', fill, route)
+                    if entry.name in QUERY_ROUTES:
+                        path += '?' + urlencode({'q': corpus['query']})
+                    targets.append((route or '/', path))
+
+        walk(get_resolver().url_patterns, '')
+        return targets
+
+    @staticmethod
+    def _request(handler, path):
+        """通过 WSGI 接口在进程内发起一次请求，返回 (状态码, 查询数, 耗时秒)"""
+        path, _, query = path.partition('?')
+        # WSGI 约定 PATH_INFO 为按 latin-1 解码的原始字节
+        environ = {'PATH_INFO': path.encode('utf-8').decode('iso-8859-1'), 'QUERY_STRING': query, 'REQUEST_METHOD': 'GET', 'wsgi.input': BytesIO()}
+        setup_testing_defaults(environ)
+        status = []
+        queries = []
+
+        token = _query_counter.set(queries)
+        start = time.perf_counter()
+        try:
+            response = handler(environ, lambda s, headers, exc_info=None: status.append(s))
+            try:
+                for _ in response:
+                    pass
+            finally:
+                response.close()
+        finally:
+            _query_counter.reset(token)
+        elapsed = time.perf_counter() - start
+        return int(status[0].split()[0]), len(queries), elapsed
+
+    def _run(self, options, corpus):
+        handler = WSGIHandler()
+        targets = self._targets(corpus)
+        repeat = max(options['requests'], 1)
+        results = {}
+
+        for route, path in targets:
+            cache.clear()
+            status, cold_queries, _ = self._request(handler, path)
+            latencies, warm_queries = [], 0
+            for _ in range(repeat):
+                _, queries, elapsed = self._request(handler, path)
+                latencies.append(elapsed)
+                warm_queries = max(warm_queries, queries)
+            results[route] = {
+                'path': path,
+                'status': status,
+                'queries_cold': cold_queries,
+                'queries_warm': warm_queries,
+                'single': _percentiles(latencies),
+            }
+            self.stdout.write(f'{path:40} {status} 查询 {cold_queries}/{warm_queries} '
+                              f'p50 {results[route]["single"]["p50"]:.1f}ms')
+
+        summary = {}
+        if options['concurrency'] > 0:
+            jobs = [(route, path) for route, path in targets for _ in range(repeat)]
+            random.Random(options['seed']).shuffle(jobs)
+            timings = {route: [] for route, _ in targets}
+            lock = threading.Lock()
+
+            def work(job):
+                route, path = job
+                try:
+                    _, _, elapsed = self._request(handler, path)
+                finally:
+                    connection.close()
+                with lock:
+                    timings[route].append(elapsed)
+
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=options['concurrency']) as executor:
+                list(executor.map(work, jobs))
+            elapsed = time.perf_counter() - start
+            for route, values in timings.items():
+                results[route]['concurrent'] = _percentiles(values)
+            summary = {'threads': options['concurrency'], 'requests': len(jobs),
+                       'seconds': round(elapsed, 3), 'rps': round(len(jobs) / elapsed, 1)}
+            self.stdout.write(f'并发 {options["concurrency"]} 线程：{len(jobs)} 个请求，{summary["rps"]} 请求/秒')
+
+        return {
+            'corpus': {key: options[key] for key in ('articles', 'tags', 'categories', 'years', 'seed')},
+            'page_cache': options['page_cache'],
+            'database': connection.vendor,
+            'concurrent': summary,
+            'urls': results,
+        }
+
+    def _compare(self, results, baseline_path, tolerance):
+        with open(baseline_path, encoding='utf-8') as f:
+            baseline = json.load(f)
+
+        regressions = []
+        for route, current in sorted(results['urls'].items()):
+            previous = baseline.get('urls', {}).get(route)
+            if previous is None:
+                self.stdout.write(f'{route}: 基线中不存在，跳过')
+                continue
+            for key in ('queries_cold', 'queries_warm'):
+                if current[key] > previous[key] + tolerance:
+                    regressions.append(f'{route} {key}: {previous[key]} -> {current[key]}')
+            before, after = previous['single']['p95'], current['single']['p95']
+            if before:
+                self.stdout.write(f'{route}: p95 {before:.1f}ms -> {after:.1f}ms ({(after - before) / before:+.0%})')
+
+        if regressions:
+            raise CommandError('查询数回归：\n' + '\n'.join(regressions))
+        self.stdout.write(self.style.SUCCESS('查询数未超过基线'))
+
+
+def _percentiles(values):
+    """返回毫秒为单位的 p50/p95/p99 和平均值（最近秩法）"""
+    if not values:
+        return {'p50': 0, 'p95': 0, 'p99': 0, 'mean': 0}
+    ordered = sorted(values)
+
+    def rank(p):
+        return round(ordered[max(0, -(-len(ordered) * p // 100) - 1)] * 1000, 3)
+
+    return {'p50': rank(50), 'p95': rank(95), 'p99': rank(99),
+            'mean': round(sum(ordered) / len(ordered) * 1000, 3)}
@@ -0,0 +1,74 @@
+import io
+import os
+import tarfile
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from django.utils.text import slugify
+
+from apps.blog import frontmatter
+from apps.blog.models import Article
+
+TAR_SUFFIXES = {'.tar': 'w', '.tgz': 'w:gz', '.gz': 'w:gz', '.bz2': 'w:bz2', '.xz': 'w:xz'}
+
+
+def _filename(article):
+    slug = slugify(article.title, allow_unicode=True)[:60]
+    return f'{article.id:05d}-{slug}.md' if slug else f'{article.id:05d}.md'
+
+
+def _render(article):
+    meta = {
+        'title': article.title,
+        'category': article.category.name if article.category else None,
+        'tags': [tag.name for tag in article.tags.all()],
+        'status': article.status,
+        'pub_time': timezone.localtime(article.pub_time).isoformat() if article.pub_time else None,
+    }
+    return frontmatter.dump(meta, article.content)
+
+
+class Command(BaseCommand):
+    help = '把文章导出为带前置元数据的Markdown文件（目录或tar包），可用 import_articles 重新导入'
+
+    def add_arguments(self, parser):
+        parser.add_argument('dest', help='输出目录，或以 .tar/.tar.gz/.tgz 结尾的tar包路径')
+        parser.add_argument('--chunk-size', type=int, default=500, help='每次从数据库读取的文章数量')
+        parser.add_argument('--published-only', action='store_true', help='只导出已发表的文章')
+
+    def handle(self, *args, **options):
+        articles = Article.objects.select_related('category').prefetch_related('tags').only(
+            'id', 'title', 'content', 'status', 'pub_time', 'category__name'
+        ).order_by('id')
+        if options['published_only']:
+            articles = articles.filter(status='p')
+        rows = articles.iterator(chunk_size=options['chunk_size'])
+
+        dest = options['dest']
+        mode = TAR_SUFFIXES.get(os.path.splitext(dest)[1].lower())
+        count = self._write_tar(rows, dest, mode) if mode else self._write_dir(rows, dest)
+        self.stdout.write(self.style.SUCCESS(f'已导出 {count} 篇文章到 {dest}'))
+
+    @staticmethod
+    def _write_dir(rows, dest):
+        os.makedirs(dest, exist_ok=True)
+        count = 0
+        for article in rows:
+            with open(os.path.join(dest, _filename(article)), 'w', encoding='utf-8') as f:
+                f.write(_render(article))
+            count += 1
+        return count
+
+    @staticmethod
+    def _write_tar(rows, dest, mode):
+        count = 0
+        with tarfile.open(dest, mode) as archive:
+            for article in rows:
+                data = _render(article).encode('utf-8')
+                info = tarfile.TarInfo(_filename(article))
+                info.size = len(data)
+                info.mtime = int(time.time())
+                archive.addfile(info, io.BytesIO(data))
+                count += 1
+        return count
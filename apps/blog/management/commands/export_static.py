@@ -0,0 +1,179 @@
+import hashlib
+import json
+import os
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import unquote
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import RequestFactory
+from django.urls import resolve, reverse
+from django.utils import timezone
+
+from apps.blog.models import Article, Category, Tag
+from apps.blog.views import _get_common_context
+
+MANIFEST_NAME = '.export-manifest.json'
+
+
+def _digest(value):
+    return hashlib.sha256(json.dumps(value, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+def _output_path(url):
+    """把URL映射为导出目录中的文件路径，第N页写到 <路径>/page/N/index.html
+
+    路径按解码后的形式保存（如中文标签的别名），与 nginx 的 try_files $uri 查找的文件名一致。
+    """
+    path, _, query = url.partition('?')
+    path = unquote(path).strip('/')
+    if query.startswith('page='):
+        path = os.path.join(path, 'page', query[len('page='):])
+    if path.startswith('api/'):
+        return os.path.join(path, 'index.json')
+    return os.path.join(path, 'index.html') if path else 'index.html'
+
+
+def _render_page(url):
+    """在子进程中用现有视图渲染一个页面，返回 (url, 状态码, 内容)"""
+    request = RequestFactory().get(url)
+    request.skip_view_count = True  # 导出不计入浏览量
+    match = resolve(request.path_info)
+    request.resolver_match = match
+    response = match.func(request, *match.args, **match.kwargs)
+    if hasattr(response, 'render'):
+        response.render()
+    return url, response.status_code, response.content
+
+
+class Command(BaseCommand):
+    help = ('把首页、文章详情、分类、标签、归档页面和标签云接口导出为静态文件，供nginx直接提供服务。'
+            '每个页面记录依赖指纹，再次导出时只渲染受影响的页面。'
+            '带查询参数的请求（如无限滚动的 ?cursor=）仍需转发给Django处理。')
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', nargs='?', default=os.path.join(settings.BASE_DIR, 'export'),
+                            help='导出目录')
+        parser.add_argument('--workers', type=int, default=None, help='渲染进程数，默认为CPU核数')
+        parser.add_argument('--force', action='store_true', help='忽略清单，重新渲染全部页面')
+
+    def handle(self, *args, **options):
+        output = options['output']
+        os.makedirs(output, exist_ok=True)
+        manifest_path = os.path.join(output, MANIFEST_NAME)
+        manifest = {}
+        if os.path.exists(manifest_path) and not options['force']:
+            with open(manifest_path, encoding='utf-8') as f:
+                manifest = json.load(f)
+
+        pages = self.plan_pages()
+        stale = [url for url, fingerprint in pages.items()
+                 if manifest.get(url, {}).get('fingerprint') != fingerprint]
+        self.stdout.write(f'共 {len(pages)} 个页面，需要渲染 {len(stale)} 个')
+
+        written = 0
+        if stale:
+            # 子进程各自建立数据库连接
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=options['workers']) as executor:
+                for url, status, content in executor.map(_render_page, stale, chunksize=8):
+                    if status != 200:
+                        raise CommandError(f'渲染 {url} 失败，状态码 {status}')
+                    sha = hashlib.sha256(content).hexdigest()
+                    path = _output_path(url)
+                    target = os.path.join(output, path)
+                    if manifest.get(url, {}).get('sha256') != sha or not os.path.exists(target):
+                        os.makedirs(os.path.dirname(target), exist_ok=True)
+                        with open(target, 'wb') as f:
+                            f.write(content)
+                        written += 1
+                    manifest[url] = {'path': path, 'fingerprint': pages[url], 'sha256': sha}
+
+        # 删除已不存在的页面（如被删除或撤回的文章）
+        removed = 0
+        for url in [url for url in manifest if url not in pages]:
+            target = os.path.join(output, manifest.pop(url)['path'])
+            if os.path.exists(target):
+                os.remove(target)
+                removed += 1
+
+        with open(manifest_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=1, sort_keys=True)
+        self.stdout.write(self.style.SUCCESS(f'导出完成：写入 {written} 个文件，删除 {removed} 个文件'))
+
+    def plan_pages(self):
+        """用轻量查询列出所有页面及其依赖指纹 {url: fingerprint}
+
+        指纹只包含会影响页面内容的数据（文章修改时间、标题、上下篇、相关文章、侧边栏统计等），
+        不包含浏览量，因此浏览量变化不会触发重新导出。
+        """
+        per_page = settings.PAGE_NUM
+        articles = list(Article.published.order_by(
+            '-pub_time', '-id'
+        ).values('id', 'title', 'pub_time', 'last_mod_time', 'category_id', 'prev_post_id', 'next_post_id',
+                 'related'))
+        by_id = {article['id']: article for article in articles}
+        tag_names = dict(Tag.objects.values_list('id', 'name'))
+        tag_slugs = dict(Tag.objects.values_list('id', 'slug'))
+        category_names = dict(Category.objects.values_list('id', 'name'))
+
+        article_tags = defaultdict(list)
+        tag_articles = defaultdict(list)
+        for article_id, tag_id in Article.tags.through.objects.filter(
+                article_id__in=by_id).values_list('article_id', 'tag_id'):
+            article_tags[article_id].append(tag_id)
+            tag_articles[tag_id].append(article_id)
+
+        sidebar = _get_common_context()
+        sidebar_fp = _digest({
+            'categories': [(c.id, c.name, c.published_count) for c in sidebar['category_list']],
+            'tags': [(t.slug, t.name, t.published_count) for t in sidebar['tag_cloud']],
+            'months': [(m['year'], m['month'], m['count']) for m in sidebar['months']],
+        })
+
+        def card(article_id):
+            article = by_id[article_id]
+            return article_id, article['last_mod_time'], category_names.get(article['category_id'])
+
+        pages = {}
+
+        def add_listing(base_url, ids, extra=None):
+            ids = sorted(ids, key=lambda pk: (by_id[pk]['pub_time'], pk), reverse=True)
+            num_pages = max(1, -(-len(ids) // per_page))
+            for number in range(1, num_pages + 1):
+                url = base_url if number == 1 else f'{base_url}?page={number}'
+                chunk = ids[(number - 1) * per_page:number * per_page]
+                pages[url] = _digest([sidebar_fp, extra, len(ids), number, [card(pk) for pk in chunk]])
+
+        add_listing(reverse('home'), list(by_id))
+
+        for article in articles:
+            neighbours = [
+                (pk, by_id[pk]['title']) if pk in by_id else None
+                for pk in (article['prev_post_id'], article['next_post_id'])
+            ]
+            # 详情页显示相关文章的标题，只显示已发表的
+            related = [(pk, by_id[pk]['title']) for pk, _ in article['related'] or [] if pk in by_id]
+            tags = sorted((tag_slugs[pk], tag_names[pk]) for pk in article_tags[article['id']])
+            url = reverse('detail', kwargs={'id': article['id']})
+            pages[url] = _digest([sidebar_fp, card(article['id']), article['title'], neighbours, related, tags])
+
+        by_category = defaultdict(list)
+        by_month = defaultdict(list)
+        for article in articles:
+            if article['category_id']:
+                by_category[article['category_id']].append(article['id'])
+            local = timezone.localtime(article['pub_time'])
+            by_month[(local.year, local.month)].append(article['id'])
+
+        for category_id, name in category_names.items():
+            add_listing(reverse('category_menu', kwargs={'id': category_id}), by_category[category_id], name)
+        for tag_id, slug in tag_slugs.items():
+            add_listing(reverse('search_tag', kwargs={'slug': slug}), tag_articles[tag_id], tag_names[tag_id])
+        for (year, month), ids in by_month.items():
+            add_listing(reverse('archives', kwargs={'year': year, 'month': month}), ids)
+
+        pages[reverse('tag_cloud_json')] = sidebar_fp
+        return pages
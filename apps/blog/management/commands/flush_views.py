@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from apps.blog.counters import flush_views
+from apps.blog.models import Article
+
+
+class Command(BaseCommand):
+    help = '把缓存中缓冲的文章浏览量批量写回数据库（需要多个进程共享的缓存后端）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='每批检查的文章数量')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        ids = list(Article.objects.order_by('id').values_list('id', flat=True))
+        total = 0
+        for start in range(0, len(ids), batch_size):
+            total += flush_views(ids[start:start + batch_size])
+        self.stdout.write(self.style.SUCCESS(f'已写回 {total} 次浏览'))
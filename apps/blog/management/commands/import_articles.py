@@ -0,0 +1,184 @@
+import os
+import tarfile
+from datetime import datetime, time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from apps.blog import frontmatter
+from apps.blog.bulk import refresh_derived
+from apps.blog.images import inline_processing
+from apps.blog.jobs import job_mode
+from apps.blog.models import Article, Category, Tag, unique_tag_slug
+from apps.blog.rendering import render_contents
+from apps.blog.search import index_article
+
+MARKDOWN_SUFFIXES = ('.md', '.markdown')
+STATUS_ALIASES = {'p': 'p', 'published': 'p', 'publish': 'p', 'd': 'd', 'draft': 'd'}
+
+
+def _iter_directory(path):
+    for root, dirs, files in os.walk(path):
+        dirs.sort()
+        for name in sorted(files):
+            if name.lower().endswith(MARKDOWN_SUFFIXES):
+                full = os.path.join(root, name)
+                with open(full, encoding='utf-8') as f:
+                    yield os.path.relpath(full, path), f.read()
+
+
+def _iter_tarball(path):
+    # 顺序读取成员，压缩包不需要整体解压到内存或磁盘
+    with tarfile.open(path, 'r|*') as archive:
+        for member in archive:
+            if member.isfile() and member.name.lower().endswith(MARKDOWN_SUFFIXES):
+                yield member.name, archive.extractfile(member).read().decode('utf-8')
+
+
+def _parse_time(value):
+    if not value:
+        return None
+    parsed = parse_datetime(str(value))
+    if parsed is None:
+        date = parse_date(str(value))
+        if date is None:
+            raise ValueError(f'无法识别的发布时间：{value}')
+        parsed = datetime.combine(date, time())
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def _as_list(value):
+    if isinstance(value, list):
+        return [str(item).strip() for item in value if str(item).strip()]
+    return [item.strip() for item in str(value or '').split(',') if item.strip()]
+
+
+class Command(BaseCommand):
+    help = '从Markdown文件目录或tar包批量导入文章（前置元数据：title、tags、category、status、pub_time）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('source', help='Markdown文件目录或 .tar/.tar.gz 包')
+        parser.add_argument('--batch-size', type=int, default=200, help='每批写入的文章数量')
+        parser.add_argument('--skip-existing', action='store_true', help='跳过标题已存在的文章')
+
+    def handle(self, *args, **options):
+        source = options['source']
+        if os.path.isdir(source):
+            files = _iter_directory(source)
+        elif os.path.isfile(source) and tarfile.is_tarfile(source):
+            files = _iter_tarball(source)
+        else:
+            raise CommandError(f'{source} 不是目录或tar包')
+
+        self.batch_size = options['batch_size']
+        self.skip_existing = options['skip_existing']
+        self.categories = {}  # 分类名 -> id
+        self.tags = {}  # 标签名 -> id
+        self.touched_tags = set()
+        self.imported = self.skipped = 0
+
+        # 新建分类、标签等提交的后台任务在命令中直接执行，不依赖Web进程
+        with job_mode('immediate'):
+            batch = []
+            for name, text in files:
+                try:
+                    batch.append(self._parse(name, text))
+                except ValueError as e:
+                    self.stderr.write(f'{name}: {e}，已跳过')
+                    self.skipped += 1
+                    continue
+                if len(batch) >= self.batch_size:
+                    self._write(batch)
+                    batch = []
+            if batch:
+                self._write(batch)
+
+            if self.imported:
+                # 批量写入不触发信号，派生数据和缓存在全部导入完成后统一处理
+                refresh_derived(self.touched_tags, publish_changed=True, tags_changed=True)
+        self.stdout.write(self.style.SUCCESS(f'完成，导入 {self.imported} 篇文章，跳过 {self.skipped} 篇'))
+
+    def _parse(self, name, text):
+        meta, body = frontmatter.parse(text)
+        title = str(meta.get('title') or os.path.splitext(os.path.basename(name))[0]).strip()[:100]
+        status = STATUS_ALIASES.get(str(meta.get('status') or 'p').strip().lower())
+        if status is None:
+            raise ValueError(f'未知的状态 {meta.get("status")}')
+        pub_time = _parse_time(meta.get('pub_time'))
+        if status == 'p' and pub_time is None:
+            pub_time = timezone.now()
+        category = str(meta.get('category') or '').strip()[:64]
+        tags = list(dict.fromkeys(tag[:64] for tag in _as_list(meta.get('tags'))))
+        return {'title': title, 'content': body, 'status': status, 'pub_time': pub_time,
+                'category': category, 'tags': tags}
+
+    @transaction.atomic
+    def _write(self, batch):
+        if self.skip_existing:
+            existing = set(Article.objects.filter(
+                title__in=[item['title'] for item in batch]
+            ).values_list('title', flat=True))
+            kept = [item for item in batch if item['title'] not in existing]
+            self.skipped += len(batch) - len(kept)
+            batch = kept
+            if not batch:
+                return
+
+        self._ensure_categories({item['category'] for item in batch if item['category']})
+        self._ensure_tags({tag for item in batch for tag in item['tags']})
+
+        now = timezone.now()
+        with inline_processing():
+            rendered = render_contents([item['content'] for item in batch])
+        articles = Article.objects.bulk_create([
+            Article(
+                title=item['title'], content=item['content'], status=item['status'],
+                pub_time=item['pub_time'], created_time=item['pub_time'] or now, last_mod_time=now,
+                category_id=self.categories.get(item['category']),
+                content_hash=digest, content_html=html, summary=summary,
+            )
+            for item, (digest, html, summary) in zip(batch, rendered)
+        ])
+
+        Through = Article.tags.through
+        links = [
+            Through(article_id=article.id, tag_id=self.tags[tag])
+            for article, item in zip(articles, batch) for tag in item['tags']
+        ]
+        Through.objects.bulk_create(links, ignore_conflicts=True)
+        self.touched_tags.update(link.tag_id for link in links)
+
+        for article in articles:
+            index_article(article)
+
+        self.imported += len(articles)
+        self.stdout.write(f'已导入 {self.imported} 篇文章')
+
+    def _ensure_categories(self, names):
+        missing = names - self.categories.keys()
+        if not missing:
+            return
+        for pk, name in Category.objects.filter(name__in=missing).order_by('id').values_list('id', 'name'):
+            self.categories.setdefault(name, pk)
+        created = Category.objects.bulk_create(
+            [Category(name=name) for name in sorted(missing - self.categories.keys())]
+        )
+        self.categories.update((category.name, category.id) for category in created)
+
+    def _ensure_tags(self, names):
+        missing = names - self.tags.keys()
+        if not missing:
+            return
+        for pk, name in Tag.objects.filter(name__in=missing).order_by('id').values_list('id', 'name'):
+            self.tags.setdefault(name, pk)
+        new_tags, taken = [], set()
+        for name in sorted(missing - self.tags.keys()):
+            slug = unique_tag_slug(name, taken=taken)
+            taken.add(slug)
+            new_tags.append(Tag(name=name, slug=slug))
+        created = Tag.objects.bulk_create(new_tags)
+        self.tags.update((tag.name, tag.id) for tag in created)
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from apps.blog.jobs import queue_depth
+from apps.blog.models import Job
+
+
+class Command(BaseCommand):
+    help = '查看后台任务队列的深度，按状态和任务名统计'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--failed', action='store_true', help='列出失败任务的最近错误')
+
+    def handle(self, *args, **options):
+        depth = queue_depth()
+        if not depth:
+            self.stdout.write(self.style.SUCCESS('队列为空'))
+        for (status, name), count in sorted(depth.items()):
+            self.stdout.write(f'{status:<8} {name:<20} {count}')
+
+        if options['failed']:
+            for job in Job.objects.filter(status=Job.FAILED).order_by('-run_at')[:20]:
+                last_line = job.last_error.strip().splitlines()[-1] if job.last_error.strip() else ''
+                self.stdout.write(f'{job.key}（{job.attempts} 次）: {last_line}')
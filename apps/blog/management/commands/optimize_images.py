@@ -0,0 +1,41 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.blog import images
+
+
+class Command(BaseCommand):
+    help = '为已上传的编辑器图片生成优化版本（之后执行 render_articles --force 更新文章HTML）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4, help='处理线程数')
+
+    def handle(self, *args, **options):
+        if images.Image is None:
+            raise CommandError('需要先安装 Pillow')
+        root = os.path.join(settings.MEDIA_ROOT, settings.MDEDITOR_UPLOAD_PATH)
+        variants = os.path.abspath(os.path.join(settings.MEDIA_ROOT, images.variant_dir()))
+        paths = []
+        for folder, dirs, files in os.walk(root):
+            if os.path.abspath(folder).startswith(variants):
+                continue
+            paths += [os.path.join(folder, name) for name in files if name.lower().endswith(images.IMAGE_EXTENSIONS)]
+
+        failed = 0
+        with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+            for path, error in zip(paths, executor.map(self._process, paths)):
+                if error:
+                    failed += 1
+                    self.stderr.write(f'{path}: {error}')
+        self.stdout.write(self.style.SUCCESS(f'已处理 {len(paths) - failed} 张图片，失败 {failed} 张'))
+
+    @staticmethod
+    def _process(path):
+        try:
+            images.process_image(path)
+        except Exception as e:
+            return str(e)
+        return None
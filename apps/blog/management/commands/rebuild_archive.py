@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from apps.blog.archive import rebuild_archive_index
+
+
+class Command(BaseCommand):
+    help = '根据文章表全量重建按月归档统计表'
+
+    def handle(self, *args, **options):
+        months = rebuild_archive_index()
+        self.stdout.write(self.style.SUCCESS(f'归档统计已重建，共 {months} 个月份'))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from apps.blog.cache import bump_content_version
+from apps.blog.related import np, rebuild_related
+
+
+class Command(BaseCommand):
+    help = '全量重新计算所有已发表文章的相关文章'
+
+    def handle(self, *args, **options):
+        changed = rebuild_related()
+        if changed:
+            bump_content_version()
+        engine = 'NumPy' if np is not None else '纯Python'
+        self.stdout.write(self.style.SUCCESS(f'相关文章已重建（{engine}），更新了 {changed} 篇文章'))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from apps.blog.search import rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = '全量重建文章的全文检索索引'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=200, help='每批读取的文章数量')
+
+    def handle(self, *args, **options):
+        count = rebuild_search_index(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'检索索引已重建，共 {count} 篇文章'))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from apps.blog.timeline import rebuild_timeline
+
+
+class Command(BaseCommand):
+    help = '全量重建文章的上一篇/下一篇引用'
+
+    def handle(self, *args, **options):
+        changed = rebuild_timeline()
+        self.stdout.write(self.style.SUCCESS(f'时间轴已重建，更新了 {changed} 篇文章'))
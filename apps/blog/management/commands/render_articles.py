@@ -0,0 +1,80 @@
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from apps.blog.images import inline_processing
+from apps.blog.jobs import job_mode
+from apps.blog.models import Article
+from apps.blog.rendering import content_digest, render_contents
+
+
+def _render_rows(rows):
+    """子进程中执行的渲染任务，只处理纯文本，不访问数据库（未处理的图片直接处理，不提交后台任务）"""
+    pks, contents = zip(*rows)
+    with inline_processing():
+        return [(pk,) + rendered for pk, rendered in zip(pks, render_contents(contents))]
+
+
+class Command(BaseCommand):
+    help = '批量回填文章的预渲染HTML和摘要（并行渲染）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=200, help='每批处理的文章数量')
+        parser.add_argument('--workers', type=int, default=None, help='渲染进程数，默认为CPU核数')
+        parser.add_argument('--force', action='store_true', help='忽略内容哈希，强制重新渲染全部文章')
+
+    def handle(self, *args, **options):
+        # 命令中提交的后台任务直接执行，不启动与批量写入并发的执行器
+        with job_mode('immediate'):
+            self._render_all(options)
+
+    def _render_all(self, options):
+        batch_size = options['batch_size']
+        force = options['force']
+
+        # 子进程不复用父进程的数据库连接
+        connections.close_all()
+
+        updated = 0
+        with ProcessPoolExecutor(max_workers=options['workers']) as executor:
+            # 先启动子进程，之后父进程重新打开的数据库连接不会被它们继承
+            executor.submit(int).result()
+            # 按主键分批读取，内存中只保留一批文章的正文
+            for pending in self._pending_batches(batch_size, force):
+                # 每个子进程一次处理一小批，复用进程内的 Markdown 实例和代码高亮缓存
+                chunks = [pending[start:start + 16] for start in range(0, len(pending), 16)]
+                rendered = [row for rows in executor.map(_render_rows, chunks) for row in rows]
+                Article.objects.bulk_update(
+                    [
+                        Article(id=pk, content_hash=digest, content_html=html, summary=summary)
+                        for pk, digest, html, summary in rendered
+                    ],
+                    ['content_hash', 'content_html', 'summary'],
+                )
+                updated += len(rendered)
+                self.stdout.write(f'已渲染 {updated} 篇文章')
+
+        if not updated:
+            self.stdout.write('所有文章均已是最新渲染结果')
+            return
+        self.stdout.write(self.style.SUCCESS(f'完成，共更新 {updated} 篇文章'))
+
+    @staticmethod
+    def _pending_batches(batch_size, force):
+        """逐批返回需要重新渲染的 (id, 正文)，跳过内容哈希未变的文章"""
+        last_id = 0
+        while True:
+            rows = list(
+                Article.objects.filter(id__gt=last_id).order_by('id')
+                .values_list('id', 'content', 'content_hash')[:batch_size]
+            )
+            if not rows:
+                return
+            last_id = rows[-1][0]
+            pending = [
+                (pk, content) for pk, content, content_hash in rows
+                if force or content_hash != content_digest(content)
+            ]
+            if pending:
+                yield pending
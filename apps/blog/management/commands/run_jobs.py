@@ -0,0 +1,32 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+from apps.blog.jobs import run_pending
+
+
+class Command(BaseCommand):
+    help = '执行后台任务队列中的任务（BLOG_JOB_MODE = "worker" 时需要常驻运行）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=4, help='并发执行任务的线程数')
+        parser.add_argument('--poll-interval', type=float, default=2, help='队列为空时的轮询间隔（秒）')
+        parser.add_argument('--once', action='store_true', help='执行完当前到期的任务后退出')
+
+    def handle(self, *args, **options):
+        with ThreadPoolExecutor(max_workers=options['threads'], thread_name_prefix='blog-job') as pool:
+            total = 0
+            try:
+                while True:
+                    count = run_pending(pool=pool)
+                    if count:
+                        total += count
+                        self.stdout.write(f'已执行 {total} 个任务')
+                    if options['once']:
+                        break
+                    if not count:
+                        time.sleep(options['poll_interval'])
+            except KeyboardInterrupt:
+                pass
+        self.stdout.write(self.style.SUCCESS(f'共执行 {total} 个任务'))
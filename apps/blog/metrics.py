@@ -0,0 +1,258 @@
+"""请求级性能统计：SQL、Markdown渲染、模板渲染和侧边栏耗时
+
+RequestMetricsMiddleware 为每个请求建立统计对象，通过 contextvar 传递给各处的计时点，
+结果写入 Server-Timing 响应头，并按视图汇总为直方图，由 /metrics 以文本格式输出。
+"""
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.http import Http404, HttpResponse
+from django.template.backends.django import DjangoTemplates
+
+logger = logging.getLogger('apps.blog.slow')
+
+_current = ContextVar('blog_request_metrics', default=None)
+
+# 直方图分桶（秒 / 查询数）
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+PHASES = ('sql', 'markdown', 'template', 'sidebar')
+MAX_RECORDED_QUERIES = 500
+
+
+def metrics_enabled():
+    return getattr(settings, 'BLOG_METRICS_ENABLED', True)
+
+
+class RequestMetrics:
+    """单个请求的统计数据，异步视图的多个线程可能同时写入"""
+
+    def __init__(self):
+        self.timings = dict.fromkeys(PHASES, 0.0)
+        self.query_count = 0
+        self.queries = []
+        self._active = set()
+        self._lock = threading.Lock()
+
+    def add(self, phase, seconds):
+        with self._lock:
+            self.timings[phase] = self.timings.get(phase, 0.0) + seconds
+
+    def add_query(self, sql, seconds):
+        with self._lock:
+            self.query_count += 1
+            self.timings['sql'] += seconds
+            if len(self.queries) < MAX_RECORDED_QUERIES:
+                self.queries.append((seconds, sql))
+
+
+@contextmanager
+def timer(phase):
+    """记录一段代码的耗时；同一阶段嵌套调用（如模板中再渲染模板）只统计最外层"""
+    metrics = _current.get()
+    if metrics is None or phase in metrics._active:
+        yield
+        return
+    metrics._active.add(phase)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics._active.discard(phase)
+        metrics.add(phase, time.perf_counter() - start)
+
+
+def _sql_wrapper(execute, sql, params, many, context):
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.add_query(sql, time.perf_counter() - start)
+
+
+@receiver(connection_created)
+def install_sql_wrapper(sender, connection, **kwargs):
+    """每个新建的数据库连接都挂上SQL计时包装，未在统计中的请求直接放行"""
+    if _sql_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_sql_wrapper)
+
+
+class _Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+        self.total += 1
+        self.sum += value
+
+
+class MetricsRegistry:
+    """进程内按视图汇总的直方图"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.duration = {}
+        self.phases = {}
+        self.queries = {}
+
+    def observe(self, view, seconds, metrics):
+        with self._lock:
+            self.duration.setdefault(view, _Histogram(DURATION_BUCKETS)).observe(seconds)
+            for phase, value in metrics.timings.items():
+                self.phases.setdefault((view, phase), _Histogram(DURATION_BUCKETS)).observe(value)
+            self.queries.setdefault(view, _Histogram(QUERY_BUCKETS)).observe(metrics.query_count)
+
+    def render(self):
+        lines = []
+        with self._lock:
+            self._render_family(lines, 'blog_request_duration_seconds', '请求总耗时',
+                                {(('view', view),): h for view, h in self.duration.items()})
+            self._render_family(lines, 'blog_request_phase_seconds', '请求各阶段耗时',
+                                {(('view', view), ('phase', phase)): h for (view, phase), h in self.phases.items()})
+            self._render_family(lines, 'blog_request_queries', '每个请求的SQL查询数',
+                                {(('view', view),): h for view, h in self.queries.items()})
+        return '\n'.join(lines) + '\n'
+
+    @staticmethod
+    def _render_family(lines, name, help_text, histograms):
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} histogram')
+        for labels, histogram in sorted(histograms.items()):
+            label_text = ','.join(f'{key}="{value}"' for key, value in labels)
+            for bound, count in zip(histogram.buckets, histogram.counts):
+                lines.append(f'{name}_bucket{{{label_text},le="{bound}"}} {count}')
+            lines.append(f'{name}_bucket{{{label_text},le="+Inf"}} {histogram.total}')
+            lines.append(f'{name}_sum{{{label_text}}} {histogram.sum:.6f}')
+            lines.append(f'{name}_count{{{label_text}}} {histogram.total}')
+
+
+registry = MetricsRegistry()
+
+
+class RequestMetricsMiddleware:
+    """统计每个请求的SQL、Markdown、模板和侧边栏耗时
+
+    写入 Server-Timing 响应头，按视图汇总到直方图；
+    超过 BLOG_SLOW_REQUEST_MS 的请求记录一条慢请求日志，列出最耗时的查询。
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not metrics_enabled():
+            return self.get_response(request)
+        metrics, token, start = self._start()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self._finish(request, response, metrics, start)
+
+    async def __acall__(self, request):
+        if not metrics_enabled():
+            return await self.get_response(request)
+        metrics, token, start = self._start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self._finish(request, response, metrics, start)
+
+    @staticmethod
+    def _start():
+        metrics = RequestMetrics()
+        return metrics, _current.set(metrics), time.perf_counter()
+
+    @staticmethod
+    def _finish(request, response, metrics, start):
+        total = time.perf_counter() - start
+        timing = [f'total;dur={total * 1000:.1f}']
+        timing += [f'{phase};dur={seconds * 1000:.1f}' for phase, seconds in metrics.timings.items()]
+        timing.append(f'queries;desc="{metrics.query_count}"')
+        response['Server-Timing'] = ', '.join(timing)
+
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match is not None else 'unresolved'
+        registry.observe(view, total, metrics)
+
+        if total * 1000 >= getattr(settings, 'BLOG_SLOW_REQUEST_MS', 500):
+            top = sorted(metrics.queries, reverse=True)[:5]
+            logger.warning(
+                'slow request %s %s view=%s total=%.1fms queries=%d sql=%.1fms markdown=%.1fms template=%.1fms; '
+                'top queries: %s',
+                request.method, request.get_full_path(), view, total * 1000, metrics.query_count,
+                metrics.timings['sql'] * 1000, metrics.timings['markdown'] * 1000,
+                metrics.timings['template'] * 1000,
+                ' | '.join(f'{seconds * 1000:.1f}ms {sql[:200]}' for seconds, sql in top),
+            )
+        return response
+
+
+class _TimedTemplate:
+    def __init__(self, template):
+        self.template = template
+        self.origin = template.origin
+
+    def render(self, context=None, request=None):
+        with timer('template'):
+            return self.template.render(context, request)
+
+
+class InstrumentedDjangoTemplates(DjangoTemplates):
+    """统计模板渲染耗时的Django模板后端"""
+
+    def from_string(self, template_code):
+        return _TimedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return _TimedTemplate(super().get_template(template_name))
+
+
+def _can_view_metrics(request):
+    """/metrics 默认只对管理员和 BLOG_METRICS_ALLOWED_IPS 中的地址开放，BLOG_METRICS_PUBLIC 为真时对所有人开放"""
+    if getattr(settings, 'BLOG_METRICS_PUBLIC', False):
+        return True
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_active and user.is_staff:
+        return True
+    return request.META.get('REMOTE_ADDR') in getattr(settings, 'BLOG_METRICS_ALLOWED_IPS', ())
+
+
+def metrics_view(request):
+    """以Prometheus文本格式输出按视图汇总的直方图"""
+    if not metrics_enabled() or not _can_view_metrics(request):
+        raise Http404
+    return HttpResponse(registry.render() + _render_queue_depth(),
+                        content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+def _render_queue_depth():
+    from apps.blog.jobs import queue_depth
+
+    lines = ['# HELP blog_job_queue_depth 后台任务队列中的任务数', '# TYPE blog_job_queue_depth gauge']
+    for (status, name), count in sorted(queue_depth().items()):
+        lines.append(f'blog_job_queue_depth{{status="{status}",name="{name}"}} {count}')
+    return '\n'.join(lines) + '\n'
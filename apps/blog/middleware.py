@@ -0,0 +1,155 @@
+import hashlib
+import json
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, has_vary_header, patch_vary_headers
+from django.utils.http import http_date
+
+from apps.blog.cache import content_last_modified, get_content_version, versioned_key
+from apps.blog.counters import record_view
+from apps.blog.models import Article
+from apps.blog.views import _get_common_context
+
+# 参与缓存的视图（URL名称）
+DEFAULT_CACHED_VIEWS = ('home', 'detail', 'category_menu', 'search_tag', 'archives', 'tag_cloud_json')
+# AJAX导航和无限滚动返回的内容不同，需要作为缓存键的一部分
+VARY_HEADERS = ('x-requested-with', 'x-infinite-scroll')
+# 侧边栏内容的 (摘要, 最后变化时间)，摘要变化时才更新时间
+SIDEBAR_VERSION_KEY = 'blog:sidebar_version'
+
+
+def sidebar_version():
+    """侧边栏（分类、热门标签、归档）内容的摘要和最后变化时间，按内容版本缓存"""
+    key = versioned_key('sidebar_version')
+    value = cache.get(key)
+    if value is None:
+        sidebar = _get_common_context()
+        data = [
+            [(c.id, c.name, c.published_count) for c in sidebar['category_list']],
+            [(t.id, t.name, t.slug, t.published_count) for t in sidebar['tag_cloud']],
+            sidebar['months'],
+        ]
+        digest = hashlib.md5(json.dumps(data, default=str).encode('utf-8')).hexdigest()
+        value = cache.get(SIDEBAR_VERSION_KEY)
+        if value is None or value[0] != digest:
+            value = (digest, time.time())
+            cache.set(SIDEBAR_VERSION_KEY, value, None)
+        cache.set(key, value, getattr(settings, 'BLOG_PAGE_CACHE_TIMEOUT', 600))
+    return value
+
+
+class AnonymousPageCacheMiddleware:
+    """匿名GET请求的整页缓存
+
+    缓存键包含URL、AJAX请求头和全局内容版本号，内容变化后旧缓存自动失效。
+    响应带有 ETag 和 Last-Modified，客户端再次验证时直接返回304，不执行视图和模板渲染。
+    文章详情页的验证器由文章自身的修改时间、上下篇和相关文章以及侧边栏内容决定，其他页面使用全站内容版本。
+    设置了cookie或按Cookie变化的响应（包括随后由会话、CSRF中间件添加的）与用户相关，不缓存。
+    文章详情页命中缓存时仍然记录浏览量。
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self._store(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self._store(request, await self.get_response(request))
+
+    def _store(self, request, response):
+        entry = getattr(request, '_page_cache', None)
+        if entry is not None and response.status_code == 200 and not response.streaming \
+                and not self._user_specific(request, response):
+            key, etag, last_modified = entry
+            cache.set(key, (response.content, response['Content-Type']),
+                      getattr(settings, 'BLOG_PAGE_CACHE_TIMEOUT', 600))
+            self._set_validators(response, etag, last_modified)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if not self._cacheable(request):
+            return None
+
+        version = get_content_version()
+        vary = '|'.join(request.headers.get(name, '') for name in VARY_HEADERS)
+        digest = hashlib.md5(f'{request.get_full_path()}|{vary}'.encode('utf-8')).hexdigest()
+        key = f'blog:page:{version}:{digest}'
+        page_version, last_modified = self._page_version(request, view_kwargs, version)
+        etag = f'"{page_version}-{digest}"'
+
+        # 验证器只依赖页面内容，缓存未命中时客户端的副本仍然有效也直接返回304
+        response = get_conditional_response(request, etag=etag, last_modified=int(last_modified))
+        if response is None:
+            cached = cache.get(key)
+            if cached is None:
+                request._page_cache = (key, etag, last_modified)
+                return None
+            content, content_type = cached
+            response = HttpResponse(content, content_type=content_type)
+        self._record_view(request, view_kwargs)
+        self._set_validators(response, etag, last_modified)
+        return response
+
+    @staticmethod
+    def _page_version(request, view_kwargs, version):
+        """返回页面的 (版本, 最后修改时间戳)
+
+        详情页只在文章本身、上下篇和相关文章的链接或侧边栏变化时改变，其他文章的修改不影响；
+        其余页面使用全站内容版本和最后修改时间。
+        """
+        if request.resolver_match.url_name == 'detail':
+            key = versioned_key(f'page_validator:{view_kwargs["id"]}')
+            row = cache.get(key)
+            if row is None:
+                row = Article.objects.filter(pk=view_kwargs['id']).values_list(
+                    'last_mod_time', 'prev_post_id', 'next_post_id', 'related').first()
+                cache.set(key, row or (), getattr(settings, 'BLOG_PAGE_CACHE_TIMEOUT', 600))
+            if row:
+                sidebar_digest, sidebar_changed = sidebar_version()
+                page_version = hashlib.md5(f'{row}|{sidebar_digest}'.encode('utf-8')).hexdigest()[:16]
+                return page_version, max(row[0].timestamp(), sidebar_changed)
+        return version, content_last_modified().timestamp()
+
+    @staticmethod
+    def _user_specific(request, response):
+        """响应设置了cookie或按Cookie变化，或者外层的会话、CSRF中间件随后会设置cookie"""
+        if response.cookies or response.has_header('Set-Cookie') or has_vary_header(response, 'Cookie'):
+            return True
+        session = getattr(request, 'session', None)
+        return bool(session is not None and session.accessed or request.META.get('CSRF_COOKIE_NEEDS_UPDATE'))
+
+    @staticmethod
+    def _cacheable(request):
+        if not getattr(settings, 'BLOG_PAGE_CACHE_ENABLED', True) or request.method != 'GET':
+            return False
+        # 已登录（或带有会话）的用户不使用整页缓存
+        if settings.SESSION_COOKIE_NAME in request.COOKIES:
+            return False
+        match = request.resolver_match
+        return match is not None and match.url_name in getattr(settings, 'BLOG_PAGE_CACHE_VIEWS',
+                                                               DEFAULT_CACHED_VIEWS)
+
+    @staticmethod
+    def _record_view(request, view_kwargs):
+        """缓存命中时视图不会执行，在这里补记详情页的浏览量"""
+        if request.resolver_match.url_name == 'detail':
+            record_view(int(view_kwargs['id']))
+
+    @staticmethod
+    def _set_validators(response, etag, last_modified):
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        response['Cache-Control'] = 'public, max-age=0, must-revalidate'
+        patch_vary_headers(response, ('X-Requested-With', 'X-Infinite-Scroll'))
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0003_alter_article_category'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='article',
+            name='content_hash',
+            field=models.CharField(blank=True, default='', editable=False, max_length=64, verbose_name='正文哈希'),
+        ),
+        migrations.AddField(
+            model_name='article',
+            name='content_html',
+            field=models.TextField(blank=True, default='', editable=False, verbose_name='正文HTML'),
+        ),
+        migrations.AddField(
+            model_name='article',
+            name='summary',
+            field=models.TextField(blank=True, default='', editable=False, verbose_name='摘要'),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:00
+
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+
+def build_archive(apps, schema_editor):
+    Article = apps.get_model('blog', 'Article')
+    Archive = apps.get_model('blog', 'Archive')
+    rows = Article.objects.filter(
+        status='p', pub_time__isnull=False
+    ).annotate(month=TruncMonth('pub_time')).values('month').annotate(count=Count('id')).order_by()
+    Archive.objects.bulk_create([
+        Archive(month=timezone.localtime(row['month']).date(), count=row['count']) for row in rows
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0004_article_rendered_content'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Archive',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(unique=True, verbose_name='归档月份')),
+                ('count', models.PositiveIntegerField(default=0, verbose_name='文章数量')),
+            ],
+            options={
+                'verbose_name': '归档统计',
+                'verbose_name_plural': '归档统计',
+                'db_table': 'archive',
+                'ordering': ['-month'],
+            },
+        ),
+        migrations.RunPython(build_archive, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:03
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def build_timeline(apps, schema_editor):
+    Article = apps.get_model('blog', 'Article')
+    ordered = list(Article.objects.filter(
+        status='p', pub_time__isnull=False
+    ).order_by('-pub_time', '-id').values_list('id', flat=True))
+    for index, pk in enumerate(ordered):
+        Article.objects.filter(id=pk).update(
+            prev_post_id=ordered[index - 1] if index > 0 else None,
+            next_post_id=ordered[index + 1] if index + 1 < len(ordered) else None,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0005_archive'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='article',
+            name='next_post',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='blog.article', verbose_name='下一篇'),
+        ),
+        migrations.AddField(
+            model_name='article',
+            name='prev_post',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='blog.article', verbose_name='上一篇'),
+        ),
+        migrations.RunPython(build_timeline, migrations.RunPython.noop),
+    ]
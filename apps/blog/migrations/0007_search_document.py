@@ -0,0 +1,56 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:04
+
+import django.db.models.deletion
+from django.db import OperationalError, migrations, models
+
+
+def create_fulltext_index(apps, schema_editor):
+    """PostgreSQL 使用 tsvector + GIN 索引，SQLite 使用 FTS5 虚拟表，其他数据库回退到 LIKE 查询"""
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute(
+            "ALTER TABLE search_document ADD COLUMN search_vector tsvector "
+            "GENERATED ALWAYS AS (to_tsvector('simple', tokens)) STORED"
+        )
+        schema_editor.execute(
+            "CREATE INDEX search_document_vector_gin ON search_document USING gin (search_vector)"
+        )
+    elif vendor == 'sqlite':
+        try:
+            schema_editor.execute("CREATE VIRTUAL TABLE search_document_fts USING fts5(tokens)")
+        except OperationalError:
+            pass
+
+
+def drop_fulltext_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute("DROP INDEX IF EXISTS search_document_vector_gin")
+        schema_editor.execute("ALTER TABLE search_document DROP COLUMN IF EXISTS search_vector")
+    elif vendor == 'sqlite':
+        schema_editor.execute("DROP TABLE IF EXISTS search_document_fts")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0006_article_timeline'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('article', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='search_document', serialize=False, to='blog.article', verbose_name='文章')),
+                ('title', models.CharField(max_length=100, verbose_name='标题')),
+                ('body', models.TextField(blank=True, default='', verbose_name='纯文本正文')),
+                ('tokens', models.TextField(blank=True, default='', verbose_name='检索词')),
+            ],
+            options={
+                'verbose_name': '检索文档',
+                'verbose_name_plural': '检索文档',
+                'db_table': 'search_document',
+            },
+        ),
+        migrations.RunPython(create_fulltext_index, drop_fulltext_index),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:05
+
+from django.db import migrations, models
+from django.utils.text import slugify
+
+
+def fill_slugs(apps, schema_editor):
+    Tag = apps.get_model('blog', 'Tag')
+    used = set()
+    for tag in Tag.objects.order_by('id'):
+        base = slugify(tag.name, allow_unicode=True)[:56] or 'tag'
+        slug, index = base, 2
+        while slug in used:
+            slug = f'{base}-{index}'
+            index += 1
+        used.add(slug)
+        tag.slug = slug
+        tag.save(update_fields=['slug'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0007_search_document'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tag',
+            name='slug',
+            field=models.SlugField(allow_unicode=True, blank=True, max_length=64, null=True, verbose_name='别名'),
+        ),
+        migrations.RunPython(fill_slugs, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='tag',
+            name='slug',
+            field=models.SlugField(allow_unicode=True, blank=True, max_length=64, unique=True, verbose_name='别名'),
+        ),
+    ]
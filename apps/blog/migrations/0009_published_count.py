@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:21
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def fill_counts(apps, schema_editor):
+    Article = apps.get_model('blog', 'Article')
+    Category = apps.get_model('blog', 'Category')
+    Tag = apps.get_model('blog', 'Tag')
+    published = Article.objects.filter(status='p', pub_time__isnull=False)
+    for category_id, count in published.filter(category__isnull=False).values_list(
+            'category_id').annotate(count=Count('id')).order_by():
+        Category.objects.filter(pk=category_id).update(published_count=count)
+    for tag_id, count in Article.tags.through.objects.filter(article__in=published).values_list(
+            'tag_id').annotate(count=Count('id')).order_by():
+        Tag.objects.filter(pk=tag_id).update(published_count=count)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0008_tag_slug'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='published_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='已发表文章数'),
+        ),
+        migrations.AddField(
+            model_name='tag',
+            name='published_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='已发表文章数'),
+        ),
+        migrations.RunPython(fill_counts, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='tag',
+            index=models.Index(fields=['-published_count', 'id'], name='tag_published_count_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0009_published_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='article',
+            name='related',
+            field=models.JSONField(blank=True, default=list, editable=False, verbose_name='相关文章'),
+        ),
+    ]
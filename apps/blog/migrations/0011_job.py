@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:30
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0010_article_related'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Job',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=64, verbose_name='任务')),
+                ('key', models.CharField(max_length=200, verbose_name='去重键')),
+                ('payload', models.JSONField(blank=True, default=dict, verbose_name='参数')),
+                ('status', models.CharField(choices=[('pending', '等待'), ('running', '执行中'), ('failed', '失败')], default='pending', max_length=8, verbose_name='状态')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='已执行次数')),
+                ('run_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='计划执行时间')),
+                ('locked_by', models.CharField(blank=True, default='', max_length=100, verbose_name='执行者')),
+                ('locked_at', models.DateTimeField(blank=True, null=True, verbose_name='开始执行时间')),
+                ('last_error', models.TextField(blank=True, default='', verbose_name='最近错误')),
+                ('created_time', models.DateTimeField(default=django.utils.timezone.now, verbose_name='创建时间')),
+            ],
+            options={
+                'verbose_name': '后台任务',
+                'verbose_name_plural': '后台任务',
+                'db_table': 'job',
+                'ordering': ['run_at', 'id'],
+                'indexes': [models.Index(fields=['status', 'run_at'], name='job_status_run_at_idx')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('status', 'pending')), fields=('key',), name='job_pending_key_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0011_job'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='article',
+            index=models.Index(fields=['status', '-pub_time', '-id'], name='article_status_pub_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='article',
+            index=models.Index(condition=models.Q(('pub_time__isnull', False), ('status', 'p')), fields=['-pub_time', '-id'], name='article_published_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='article',
+            index=models.Index(condition=models.Q(('pub_time__isnull', False), ('status', 'p')), fields=['category', '-pub_time', '-id'], name='article_category_published_idx'),
+        ),
+        # 自动生成的中间表无法在 Meta 中声明索引；标签页按 tag_id 找文章，复合索引可以只读索引完成连接
+        migrations.RunSQL(
+            'CREATE INDEX IF NOT EXISTS article_tags_tag_article_idx ON article_tags (tag_id, article_id)',
+            'DROP INDEX IF EXISTS article_tags_tag_article_idx',
+        ),
+    ]
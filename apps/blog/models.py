@@ -1,29 +1,78 @@
+from datetime import datetime
+
 from django.db import models
-from django.utils.timezone import now
+from django.db.models import Q
+from django.utils.text import slugify
+from django.utils.timezone import make_aware, now
 from mdeditor.fields import MDTextField
 
+from apps.blog.images import scheduled_processing
+from apps.blog.rendering import content_digest, render_content
+
+
+def unique_tag_slug(name, exclude_pk=None, taken=()):
+    """生成不与已有标签重复的别名，保留中文字符；taken 为尚未写入数据库但已占用的别名"""
+    base = slugify(name, allow_unicode=True)[:56] or 'tag'
+    slug, index = base, 2
+    while slug in taken or Tag.objects.filter(slug=slug).exclude(pk=exclude_pk).exists():
+        slug = f'{base}-{index}'
+        index += 1
+    return slug
+
+
+def exclude_derived_fields(instance, derived, kwargs):
+    """已存在的记录整行保存时不写回派生字段
+
+    派生字段只通过 F() 表达式或 update() 维护，从数据库读出较早的对象再整行保存会把旧值写回；
+    这里改为只保存其余已加载的字段。调用方显式传入 update_fields 时按调用方的要求保存。
+    """
+    if kwargs.get('update_fields') is not None or kwargs.get('force_insert') \
+            or instance.pk is None or instance._state.adding:
+        return
+    deferred = instance.get_deferred_fields()
+    kwargs['update_fields'] = [
+        field.name for field in instance._meta.concrete_fields
+        if not field.primary_key and field.name not in derived and field.attname not in deferred
+    ]
+
 
 # Create your models here.
 class Tag(models.Model):
     name = models.CharField(verbose_name='标签名', max_length=64)
+    slug = models.SlugField(verbose_name='别名', max_length=64, unique=True, allow_unicode=True, blank=True)
     created_time = models.DateTimeField(verbose_name='创建时间', default=now)
     last_mod_time = models.DateTimeField(verbose_name='修改时间', default=now)
+    # 由信号增量维护，可用 recount 命令修正
+    published_count = models.PositiveIntegerField(verbose_name='已发表文章数', default=0, editable=False)
 
     # 使对象在后台显示更友好
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        """未填写别名时根据标签名自动生成唯一别名；已发表文章数量不随整行保存写回"""
+        if not self.slug:
+            self.slug = unique_tag_slug(self.name, exclude_pk=self.pk)
+        exclude_derived_fields(self, {'published_count'}, kwargs)
+        super().save(*args, **kwargs)
+
     class Meta:
         ordering = ['name']
         verbose_name = '标签名称'  # 指定后台显示模型名称
         verbose_name_plural = '标签列表'  # 指定后台显示模型复数名称
         db_table = "tag"  # 数据库表名
+        indexes = [
+            # 标签云：ORDER BY published_count DESC LIMIT n
+            models.Index(fields=['-published_count', 'id'], name='tag_published_count_idx'),
+        ]
 
 
 class Category(models.Model):
     name = models.CharField(verbose_name='类别名称', max_length=64)
     created_time = models.DateTimeField(verbose_name='创建时间', default=now)
     last_mod_time = models.DateTimeField(verbose_name='修改时间', default=now)
+    # 由信号增量维护，可用 recount 命令修正
+    published_count = models.PositiveIntegerField(verbose_name='已发表文章数', default=0, editable=False)
 
     class Meta:
         ordering = ['name']
@@ -35,6 +84,41 @@ class Category(models.Model):
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        """已发表文章数量不随整行保存写回"""
+        exclude_derived_fields(self, {'published_count'}, kwargs)
+        super().save(*args, **kwargs)
+
+
+# 已发表文章的条件，与 article_published_idx 等部分索引的条件一致，查询才能使用这些索引
+PUBLISHED = Q(status='p', pub_time__isnull=False)
+# 列表不显示的大字段
+LIST_DEFERRED = ('content', 'content_html', 'related')
+
+
+class ArticleQuerySet(models.QuerySet):
+    def in_month(self, year, month):
+        """按当前时区的月份筛选，使用发布时间的范围条件（按年、月提取无法使用索引），月份无效时返回空结果"""
+        try:
+            year, month = int(year), int(month)
+            start = make_aware(datetime(year, month, 1))
+            end = make_aware(datetime(year + month // 12, month % 12 + 1, 1))
+        except (ValueError, OverflowError):
+            return self.none()
+        return self.filter(pub_time__gte=start, pub_time__lt=end)
+
+    def for_list(self, tags=False):
+        """列表展示用：一并取出分类，不取正文等大字段；需要显示标签时一次预取所有文章的标签"""
+        queryset = self.select_related('category').defer(*LIST_DEFERRED)
+        return queryset.prefetch_related('tags') if tags else queryset
+
+
+class PublishedManager(models.Manager.from_queryset(ArticleQuerySet)):
+    """Article.published：只包含已发表的文章"""
+
+    def get_queryset(self):
+        return super().get_queryset().filter(PUBLISHED)
+
 
 class Article(models.Model):
     STATUS_CHOICES = (
@@ -50,6 +134,23 @@ class Article(models.Model):
     last_mod_time = models.DateTimeField(verbose_name='修改时间', default=now)
     category = models.ForeignKey(Category, verbose_name='分类', on_delete=models.SET_NULL, blank=True, null=True)
     tags = models.ManyToManyField(Tag, verbose_name='标签集合', blank=True)
+    # 预渲染的正文HTML和摘要，仅在正文变化时重新生成
+    content_html = models.TextField(verbose_name='正文HTML', blank=True, default='', editable=False)
+    summary = models.TextField(verbose_name='摘要', blank=True, default='', editable=False)
+    content_hash = models.CharField(verbose_name='正文哈希', max_length=64, blank=True, default='', editable=False)
+    # 时间轴上的相邻文章，发表、撤回、删除或修改发布时间时由信号维护
+    prev_post = models.ForeignKey('self', verbose_name='上一篇', on_delete=models.SET_NULL, blank=True, null=True,
+                                  editable=False, related_name='+')
+    next_post = models.ForeignKey('self', verbose_name='下一篇', on_delete=models.SET_NULL, blank=True, null=True,
+                                  editable=False, related_name='+')
+    # 预先计算的相关文章 [[文章id, 得分], ...]，由信号在文章保存后增量更新
+    related = models.JSONField(verbose_name='相关文章', default=list, blank=True, editable=False)
+
+    # 由 F()/update() 维护的字段，整行保存时不写回（见 exclude_derived_fields）
+    DERIVED_FIELDS = {'views', 'prev_post', 'next_post'}
+
+    objects = ArticleQuerySet.as_manager()
+    published = PublishedManager()
 
     # 使对象在后台显示更友好
     def __str__(self):
@@ -65,29 +166,47 @@ class Article(models.Model):
         
         # 更新修改时间
         self.last_mod_time = now()
-        
+
+        # 浏览量由 flush_views 累加、上下篇由时间轴维护，整行保存时不写回
+        exclude_derived_fields(self, self.DERIVED_FIELDS, kwargs)
+
+        # 正文有变化时重新渲染；有后台执行者时提交渲染任务，完成前保留旧的渲染结果，否则在保存时直接渲染，
+        # 并为其中尚未处理的图片提交处理任务
+        from apps.blog.jobs import enqueue, has_worker
+        update_fields = kwargs.get('update_fields')
+        content_changed = (update_fields is None or 'content' in update_fields) \
+            and self.content_hash != content_digest(self.content)
+        deferred = content_changed and has_worker()
+        if content_changed and not deferred:
+            with scheduled_processing():
+                self.render_content(force=True)
+            if update_fields is not None:
+                kwargs['update_fields'] = set(update_fields) | {'content_html', 'summary', 'content_hash'}
+
         super().save(*args, **kwargs)
 
-    # 更新浏览量
+        if deferred:
+            enqueue('render_article', key=self.pk, article_id=self.pk)
+
+    def render_content(self, force=False):
+        """根据正文哈希判断是否需要重新渲染，返回是否发生了渲染"""
+        if not force and self.content_hash and self.content_hash == content_digest(self.content):
+            return False
+        self.content_hash, self.content_html, self.summary = render_content(self.content)
+        return True
+
+    # 更新浏览量：先写入缓冲区，由 flush_views 批量写回数据库
     def viewed(self):
-        self.views += 1
-        self.save(update_fields=['views'])
+        from apps.blog.counters import record_view
+        self.views += record_view(self.id)
 
     # 下一篇
     def next_article(self):  # 发布时间比当前文章早的文章，按发布时间降序取第一篇（时间轴上的下一篇）
-        return Article.objects.filter(
-            pub_time__lt=self.pub_time, 
-            status='p', 
-            pub_time__isnull=False
-        ).order_by('-pub_time').first()
+        return Article.published.filter(pub_time__lt=self.pub_time).order_by('-pub_time').first()
 
     # 前一篇  
     def prev_article(self):  # 发布时间比当前文章晚的文章，按发布时间升序取第一篇（时间轴上的上一篇）
-        return Article.objects.filter(
-            pub_time__gt=self.pub_time, 
-            status='p', 
-            pub_time__isnull=False
-        ).order_by('pub_time').first()
+        return Article.published.filter(pub_time__gt=self.pub_time).order_by('pub_time').first()
 
     class Meta:
         ordering = ['-pub_time']  # 按文章创建日期降序
@@ -95,10 +214,78 @@ class Article(models.Model):
         verbose_name_plural = '文章列表'  # 指定后台显示模型复数名称
         db_table = 'article'  # 数据库表名
         get_latest_by = 'created_time'
+        indexes = [
+            # 后台按状态筛选以及按状态和发布时间排序
+            models.Index(fields=['status', '-pub_time', '-id'], name='article_status_pub_time_idx'),
+            # 公开列表（首页、归档）和分类列表只扫描已发表文章，按 LIST_ORDERING 顺序读取
+            models.Index(fields=['-pub_time', '-id'], condition=PUBLISHED, name='article_published_idx'),
+            models.Index(fields=['category', '-pub_time', '-id'], condition=PUBLISHED,
+                         name='article_category_published_idx'),
+        ]
+
+
+class Archive(models.Model):
+    """按月归档的文章数量统计，由信号增量维护"""
+    month = models.DateField(verbose_name='归档月份', unique=True)
+    count = models.PositiveIntegerField(verbose_name='文章数量', default=0)
+
+    def __str__(self):
+        return self.month.strftime('%Y-%m')
+
+    class Meta:
+        ordering = ['-month']
+        verbose_name = '归档统计'
+        verbose_name_plural = '归档统计'
+        db_table = 'archive'
 
 
+class SearchDocument(models.Model):
+    """文章的全文检索文档，tokens 为切分后以空格分隔的检索词，由信号在文章保存时更新"""
+    article = models.OneToOneField(Article, verbose_name='文章', on_delete=models.CASCADE, primary_key=True,
+                                   related_name='search_document')
+    title = models.CharField(verbose_name='标题', max_length=100)
+    body = models.TextField(verbose_name='纯文本正文', blank=True, default='')
+    tokens = models.TextField(verbose_name='检索词', blank=True, default='')
 
+    def __str__(self):
+        return self.title
 
+    class Meta:
+        verbose_name = '检索文档'
+        verbose_name_plural = '检索文档'
+        db_table = 'search_document'
 
 
+class Job(models.Model):
+    """后台任务队列，同一个 key 最多只有一个等待执行的任务，重复提交时合并参数"""
+    PENDING, RUNNING, FAILED = 'pending', 'running', 'failed'
+    STATUS_CHOICES = (
+        (PENDING, '等待'),
+        (RUNNING, '执行中'),
+        (FAILED, '失败'),
+    )
+    name = models.CharField(verbose_name='任务', max_length=64)
+    key = models.CharField(verbose_name='去重键', max_length=200)
+    payload = models.JSONField(verbose_name='参数', default=dict, blank=True)
+    status = models.CharField(verbose_name='状态', max_length=8, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveIntegerField(verbose_name='已执行次数', default=0)
+    run_at = models.DateTimeField(verbose_name='计划执行时间', default=now)
+    locked_by = models.CharField(verbose_name='执行者', max_length=100, blank=True, default='')
+    locked_at = models.DateTimeField(verbose_name='开始执行时间', blank=True, null=True)
+    last_error = models.TextField(verbose_name='最近错误', blank=True, default='')
+    created_time = models.DateTimeField(verbose_name='创建时间', default=now)
 
+    def __str__(self):
+        return self.key
+
+    class Meta:
+        ordering = ['run_at', 'id']
+        verbose_name = '后台任务'
+        verbose_name_plural = '后台任务'
+        db_table = 'job'
+        constraints = [
+            models.UniqueConstraint(fields=['key'], condition=models.Q(status='pending'), name='job_pending_key_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['status', 'run_at'], name='job_status_run_at_idx'),
+        ]
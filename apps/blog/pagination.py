@@ -0,0 +1,133 @@
+import base64
+import bisect
+import json
+from datetime import datetime, timedelta, timezone
+
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+
+# 列表统一按 (发布时间, id) 降序排列，保证游标和页码两种分页结果一致
+LIST_ORDERING = ('-pub_time', '-id')
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def time_key(pub_time):
+    """把发布时间转换为精确的整数微秒，用于排序和游标比较"""
+    return (pub_time - EPOCH) // timedelta(microseconds=1)
+
+
+def encode_cursor(article):
+    """把文章的 (发布时间, id) 编码为不透明的游标字符串"""
+    return _encode(article.pub_time, article.id)
+
+
+def encode_posting(posting):
+    """把 (发布时间微秒数, 文章id) 编码为游标，与 encode_cursor 的结果相同"""
+    key, article_id = posting
+    return _encode(EPOCH + timedelta(microseconds=key), article_id)
+
+
+def _encode(pub_time, article_id):
+    raw = json.dumps([pub_time.isoformat(), article_id])
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """解析游标，格式错误时抛出ValueError"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        pub_time, article_id = json.loads(raw)
+        pub_time = parse_datetime(pub_time)
+        article_id = int(article_id)
+    except (TypeError, ValueError, json.JSONDecodeError, UnicodeDecodeError):
+        raise ValueError('invalid cursor')
+    if pub_time is None:
+        raise ValueError('invalid cursor')
+    return pub_time, article_id
+
+
+class CursorPage:
+    """基于游标的分页结果，接口与Django的Page对象保持兼容，可直接用于列表模板
+
+    next_cursor 为空时表示没有下一页；不指定时取本页最后一篇文章生成。
+    """
+
+    def __init__(self, object_list, has_next, next_cursor=None):
+        self.object_list = object_list
+        self._has_next = has_next
+        if next_cursor is None:
+            next_cursor = encode_cursor(object_list[-1]) if has_next else ''
+        self.next_cursor = next_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self._has_next
+
+
+def cursor_page(queryset, cursor, per_page):
+    """取游标之后的一页数据，只用索引范围条件，不做COUNT和OFFSET"""
+    queryset = queryset.order_by(*LIST_ORDERING)
+    if cursor:
+        pub_time, article_id = decode_cursor(cursor)
+        queryset = queryset.filter(Q(pub_time__lt=pub_time) | Q(pub_time=pub_time, id__lt=article_id))
+    items = list(queryset[:per_page + 1])
+    return CursorPage(items[:per_page], len(items) > per_page)
+
+
+def cursor_slice(postings, cursor, per_page):
+    """在按 (发布时间, id) 降序排列的 [(发布时间微秒数, id)] 列表上按游标取一页，返回 (文章id列表, 下一页游标)
+
+    下一页游标由本页最后一条记录生成，不依赖这些文章是否仍然存在；没有下一页时为空字符串。
+    """
+    start = 0
+    if cursor:
+        pub_time, article_id = decode_cursor(cursor)
+        target = (-time_key(pub_time), -article_id)
+        start = bisect.bisect_right(postings, target, key=lambda item: (-item[0], -item[1]))
+    chunk = postings[start:start + per_page]
+    next_cursor = encode_posting(chunk[-1]) if chunk and start + per_page < len(postings) else ''
+    return [article_id for _, article_id in chunk], next_cursor
+
+
+class EstimatedCountPaginator(Paginator):
+    """大表上用 PostgreSQL 的行数估计代替精确的 COUNT(*)，用于后台列表
+
+    表的估计行数（pg_class.reltuples）不少于 BLOG_ADMIN_EXACT_COUNT_LIMIT 时，未过滤的列表直接使用该估计值，
+    带过滤或搜索条件的列表使用 EXPLAIN 给出的估计行数；小表和其他数据库仍然精确计数。
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        connection = connections[queryset.db]
+        if connection.vendor != 'postgresql':
+            return super().count
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(%s)',
+                [connection.ops.quote_name(queryset.model._meta.db_table)],
+            )
+            row = cursor.fetchone()
+            if row is None or row[0] < getattr(settings, 'BLOG_ADMIN_EXACT_COUNT_LIMIT', 10000):
+                return super().count
+            if not queryset.query.where:
+                return row[0]
+            sql, params = queryset.order_by().query.sql_with_params()
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]['Plan']['Plan Rows'])
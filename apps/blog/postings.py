@@ -0,0 +1,24 @@
+from django.core.cache import cache
+
+from apps.blog.models import Article
+from apps.blog.pagination import time_key
+
+# 每个标签下已发表文章的有序列表 [(发布时间微秒数, 文章id)]，按发布时间降序
+POSTING_KEY = 'blog:tag_posts:{}'
+POSTING_TIMEOUT = 60 * 60 * 24
+
+
+def get_tag_posts(tag_id):
+    """获取标签下已发表文章的有序列表，缓存未命中时通过中间表一次查询生成"""
+    key = POSTING_KEY.format(tag_id)
+    postings = cache.get(key)
+    if postings is None:
+        rows = Article.published.filter(tags__id=tag_id).order_by('-pub_time', '-id').values_list('pub_time', 'id')
+        postings = [(time_key(pub_time), article_id) for pub_time, article_id in rows]
+        cache.set(key, postings, POSTING_TIMEOUT)
+    return postings
+
+
+def invalidate_tag_posts(tag_ids):
+    """标签与文章的关联或文章的发表状态变化后，删除对应标签的缓存列表"""
+    cache.delete_many([POSTING_KEY.format(tag_id) for tag_id in tag_ids])
@@ -0,0 +1,215 @@
+"""相关文章
+
+用检索文档中已切分好的检索词（中文双字切分）计算 TF-IDF 向量的余弦相似度，与标签的 Jaccard 相似度加权混合，
+每篇已发表文章预先保存得分最高的若干篇（Article.related），详情页只需一次按主键的查询取出标题。
+每篇文章的词频由 index_article 写入缓存（search.term_counts），计算时不再读取和切分检索文档。
+向量以稀疏形式保存，并建立 词 -> [(文章, 权重)] 的倒排表，一篇文章与全部文章的相似度只需累加它包含的词的倒排项；
+全量重建在安装了 NumPy 时用数组做这种累加，否则逐篇用纯Python计算。
+文章保存后只增量更新它自己的一行和其他文章中涉及它的一列。
+"""
+import math
+from collections import Counter, defaultdict
+
+from django.conf import settings
+
+from apps.blog.models import Article
+from apps.blog.search import term_counts
+
+try:
+    import numpy as np
+except ImportError:  # NumPy 为可选依赖，未安装时使用纯Python实现
+    np = None
+
+
+def _top_count():
+    return getattr(settings, 'BLOG_RELATED_COUNT', 5)
+
+
+def _tag_weight():
+    return getattr(settings, 'BLOG_RELATED_TAG_WEIGHT', 0.3)
+
+
+def _max_features():
+    return getattr(settings, 'BLOG_RELATED_MAX_FEATURES', 8192)
+
+
+class Corpus:
+    """全部已发表文章的稀疏向量、标签集合、倒排表和当前保存的相关文章"""
+
+    def __init__(self, rows, counts, tag_rows):
+        self.ids = [row[0] for row in rows]
+        self.position = {pk: i for i, pk in enumerate(self.ids)}
+        self.related = [row[1] or [] for row in rows]
+        self.tags = [set() for _ in self.ids]
+        for article_id, tag_id in tag_rows:
+            if article_id in self.position:
+                self.tags[self.position[article_id]].add(tag_id)
+        self.vectors = self._vectorize([counts.get(pk) or {} for pk in self.ids])
+        # 倒排表：词 -> [(位置, 权重)]，标签 -> [位置]
+        self.postings = defaultdict(list)
+        for j, vector in enumerate(self.vectors):
+            for term, w in vector.items():
+                self.postings[term].append((j, w))
+        self.tag_postings = defaultdict(list)
+        for j, tags in enumerate(self.tags):
+            for tag in tags:
+                self.tag_postings[tag].append(j)
+
+    def _vectorize(self, counts):
+        """计算 L2 归一化的 TF-IDF 稀疏向量（词 -> 权重）
+
+        只出现在一篇文章中的词对任何两篇文章的相似度都没有贡献，不进入词表；
+        词表按文档频率截取前 BLOG_RELATED_MAX_FEATURES 个。
+        """
+        df = Counter(term for count in counts for term in count)
+        vocabulary = [term for term, n in df.most_common() if n > 1][:_max_features()]
+        total = len(counts)
+        idf = {term: math.log((1 + total) / (1 + df[term])) + 1 for term in vocabulary}
+
+        vectors = []
+        for count in counts:
+            vector = {term: (1 + math.log(n)) * idf[term] for term, n in count.items() if term in idf}
+            norm = math.sqrt(sum(w * w for w in vector.values())) or 1.0
+            vectors.append({term: w / norm for term, w in vector.items()})
+        return vectors
+
+    def scores(self, i):
+        """第 i 篇文章与全部文章的混合相似度，只访问与它有共同词或标签的文章"""
+        weight, count = _tag_weight(), len(self.ids)
+        cosine = [0.0] * count
+        for term, w in self.vectors[i].items():
+            for j, other in self.postings[term]:
+                cosine[j] += w * other
+        shared = [0] * count
+        for tag in self.tags[i]:
+            for j in self.tag_postings[tag]:
+                shared[j] += 1
+        size = len(self.tags[i])
+        result = [(1 - weight) * c for c in cosine]
+        for j, n in enumerate(shared):
+            if n:
+                result[j] += weight * n / (size + len(self.tags[j]) - n)
+        return result
+
+    def top(self, i, scores):
+        """从 (位置, 得分) 中取得分最高的若干篇，排除自身和得分为0的文章；得分相同时较新的文章在前"""
+        ranked = sorted(
+            ((score, self.ids[j]) for j, score in scores if j != i and score > 0),
+            key=lambda item: (-item[0], -item[1]),
+        )[:_top_count()]
+        return [[pk, round(score, 4)] for score, pk in ranked]
+
+
+def load_corpus():
+    rows = list(Article.published.order_by('id').values_list('id', 'related'))
+    tag_rows = Article.tags.through.objects.filter(
+        article__status='p', article__pub_time__isnull=False
+    ).values_list('article_id', 'tag_id')
+    return Corpus(rows, term_counts([row[0] for row in rows]), tag_rows)
+
+
+def _array_top(corpus):
+    """NumPy 实现：倒排表转换为数组后逐篇累加得分，内存与倒排项数量成正比"""
+    count, k, weight = len(corpus.ids), _top_count(), _tag_weight()
+    postings = {
+        term: (np.array([j for j, _ in items], dtype=np.int64), np.array([w for _, w in items]))
+        for term, items in corpus.postings.items()
+    }
+    tag_postings = {tag: np.array(items, dtype=np.int64) for tag, items in corpus.tag_postings.items()}
+    tag_sizes = np.array([len(tags) for tags in corpus.tags], dtype=np.float64)
+
+    for i in range(count):
+        cosine = np.zeros(count)
+        for term, w in corpus.vectors[i].items():
+            positions, weights = postings[term]
+            cosine[positions] += w * weights  # 同一个词的倒排项中位置不重复
+        shared = np.zeros(count)
+        for tag in corpus.tags[i]:
+            shared[tag_postings[tag]] += 1
+        union = tag_sizes[i] + tag_sizes - shared
+        jaccard = np.divide(shared, union, out=np.zeros(count), where=union > 0)
+        row = (1 - weight) * cosine + weight * jaccard
+        row[i] = 0  # 排除自身
+        candidates = np.flatnonzero(row > 0)
+        if len(candidates) > k:
+            # 多取一些候选，避免第k名并列时 argpartition 任意取舍
+            keep = min(len(candidates), 2 * k)
+            candidates = candidates[np.argpartition(-row[candidates], keep - 1)[:keep]]
+        yield corpus.top(i, ((j, float(row[j])) for j in candidates))
+
+
+def rebuild_related():
+    """全量重新计算所有已发表文章的相关文章，返回有变化的文章数量"""
+    corpus = load_corpus()
+    if np is not None and corpus.ids:
+        tops = list(_array_top(corpus))
+    else:
+        tops = [corpus.top(i, enumerate(corpus.scores(i))) for i in range(len(corpus.ids))]
+    changed = {pk: top for pk, top, old in zip(corpus.ids, tops, corpus.related) if top != old}
+    changed.update(_clear_unpublished())
+    _save(changed)
+    return len(changed)
+
+
+def _clear_unpublished():
+    """撤回或草稿状态的文章不保留相关文章"""
+    stale = Article.objects.exclude(status='p', pub_time__isnull=False).exclude(related=[])
+    return {pk: [] for pk in stale.values_list('id', flat=True)}
+
+
+def _save(changed):
+    if not changed:
+        return
+    Article.objects.bulk_update(
+        [Article(id=pk, related=top) for pk, top in changed.items()], ['related'], batch_size=500
+    )
+
+
+def update_related(*article_ids):
+    """增量更新：重新计算这些文章的一行，并把它们插入或移出其他文章的相关列表
+
+    其他文章之间的得分不重新计算（文档频率的变化只在全量重建时体现，可定时执行 rebuild_related）。
+    每次仍需读出全部已发表文章的id、相关文章、标签和缓存的词频，并重新计算文档频率和向量，
+    开销与全部文章的词数成正比；批量修改的多篇文章共用一次读出的数据，得分只对与这些文章有共同词或标签的文章计算。
+    返回有变化的文章数量。
+    """
+    corpus = load_corpus()
+    changed = {}
+    for article_id in article_ids:
+        _update_one(corpus, article_id, changed)
+    _save(changed)
+    return len(changed)
+
+
+def _update_one(corpus, article_id, changed):
+    """更新一篇文章涉及的行和列，结果写入 changed 并同步到 corpus.related，后续文章在此基础上更新"""
+    i = corpus.position.get(article_id)
+    scores = corpus.scores(i) if i is not None else [0.0] * len(corpus.ids)
+    k = _top_count()
+    if i is not None:
+        top = corpus.top(i, enumerate(scores))
+        if top != corpus.related[i]:
+            changed[article_id] = corpus.related[i] = top
+    else:
+        changed.update({pk: [] for pk in Article.objects.filter(pk=article_id).exclude(
+            related=[]).values_list('id', flat=True)})
+
+    for j, (pk, old) in enumerate(zip(corpus.ids, corpus.related)):
+        if j == i:
+            continue
+        score = round(scores[j], 4)
+        previous = next((item[1] for item in old if item[0] == article_id), None)
+        others = [item for item in old if item[0] != article_id]
+        if previous is not None and score < previous:
+            # 得分下降或已撤回，空出的位置可能属于其他文章，重新计算这一行
+            top = corpus.top(j, enumerate(corpus.scores(j)))
+        elif score > 0 and (len(others) < k or score > others[-1][1]):
+            top = sorted(others + [[article_id, score]], key=lambda item: (-item[1], -item[0]))[:k]
+        else:
+            continue
+        if top != old:
+            changed[pk] = corpus.related[j] = top
+
+
+def related_ids(article):
+    return [item[0] for item in article.related or []]
@@ -0,0 +1,173 @@
+import hashlib
+import threading
+import types
+from collections import OrderedDict
+
+import markdown
+from django.conf import settings
+from django.utils.html import strip_tags
+from markdown.extensions import codehilite, fenced_code
+
+from apps.blog.images import rewrite_images
+from apps.blog.metrics import timer
+
+# 摘要长度，与列表页卡片展示保持一致
+SUMMARY_LENGTH = 400
+
+# Markdown扩展配置
+MARKDOWN_EXTENSIONS = [
+    'markdown.extensions.extra',      # 支持表格、脚注等
+    'apps.blog.rendering:BlogCodeHiliteExtension',  # 代码高亮（带缓存）
+    'markdown.extensions.toc',        # 目录
+    'markdown.extensions.nl2br',      # 换行转<br>
+]
+
+MARKDOWN_EXTENSION_CONFIGS = {
+    'apps.blog.rendering:BlogCodeHiliteExtension': {
+        'css_class': 'highlight',
+        'use_pygments': True,
+    }
+}
+
+
+def content_digest(text):
+    """计算正文内容的哈希值，用于判断是否需要重新渲染"""
+    return hashlib.sha256((text or '').encode('utf-8')).hexdigest()
+
+
+class _LRUCache:
+    """线程安全的有界LRU缓存"""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, key, compute):
+        if self.maxsize <= 0:
+            return compute()
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+        value = compute()
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = 0
+
+
+# 代码高亮结果按 (语言, 选项, 代码哈希) 缓存，同一段代码在多篇文章、多次修订中反复出现
+highlight_cache = _LRUCache(getattr(settings, 'BLOG_HIGHLIGHT_CACHE_SIZE', 1024))
+
+
+def _options_key(options):
+    return tuple(sorted((key, repr(value)) for key, value in options.items()))
+
+
+class CachedCodeHilite(codehilite.CodeHilite):
+    """整段缓存高亮后的HTML；未标注语言的代码块也省去 guess_lexer 逐个试探词法分析器"""
+
+    def hilite(self, shebang=True):
+        key = (self.lang, shebang, _options_key(self.options), content_digest(self.src))
+        return highlight_cache.get_or_compute(key, lambda: super(CachedCodeHilite, self).hilite(shebang))
+
+
+def _with_cached_hilite(run):
+    """复制处理器的 run 方法并让其中的 CodeHilite 指向 CachedCodeHilite，不改动 markdown 模块本身"""
+    namespace = dict(run.__globals__, CodeHilite=CachedCodeHilite)
+    return types.FunctionType(run.__code__, namespace, run.__name__, run.__defaults__, run.__closure__)
+
+
+class _HiliteTreeprocessor(codehilite.HiliteTreeprocessor):
+    run = _with_cached_hilite(codehilite.HiliteTreeprocessor.run)
+
+
+class _FencedBlockPreprocessor(fenced_code.FencedBlockPreprocessor):
+    run = _with_cached_hilite(fenced_code.FencedBlockPreprocessor.run)
+
+
+class BlogCodeHiliteExtension(codehilite.CodeHiliteExtension):
+    """带缓存的代码高亮，只用于博客自己的 Markdown 实例，需排在 extra 之后"""
+
+    def extendMarkdown(self, md):
+        super().extendMarkdown(md)
+        hiliter = _HiliteTreeprocessor(md)
+        hiliter.config = self.getConfigs()
+        md.treeprocessors.register(hiliter, 'hilite', 30)
+        if 'fenced_code_block' in md.preprocessors:
+            fenced = md.preprocessors['fenced_code_block']
+            md.preprocessors.register(_FencedBlockPreprocessor(md, fenced.config), 'fenced_code_block', 25)
+
+
+_local = threading.local()
+
+
+def _get_renderer():
+    """每个线程复用一个 Markdown 实例，避免每次渲染重新加载扩展"""
+    md = getattr(_local, 'md', None)
+    if md is None:
+        md = _local.md = markdown.Markdown(
+            extensions=MARKDOWN_EXTENSIONS,
+            extension_configs=MARKDOWN_EXTENSION_CONFIGS
+        )
+    return md
+
+
+def render_markdown(text):
+    """将Markdown文本转换为HTML"""
+    if not text:
+        return ''
+    with timer('markdown'):
+        md = _get_renderer()
+        try:
+            return rewrite_images(md.convert(text))
+        finally:
+            md.reset()
+
+
+def render_many(texts):
+    """批量渲染，相同内容只渲染一次，用于列表页和批量回填"""
+    rendered = {}
+    results = []
+    for text in texts:
+        digest = content_digest(text)
+        if digest not in rendered:
+            rendered[digest] = render_markdown(text)
+        results.append(rendered[digest])
+    return results
+
+
+def summarize(html, length=SUMMARY_LENGTH):
+    """从渲染后的HTML中提取纯文本摘要"""
+    if not html:
+        return ''
+    plain_text = strip_tags(html)
+    if len(plain_text) > length:
+        return plain_text[:length] + '...'
+    return plain_text
+
+
+def render_content(text):
+    """渲染正文，返回 (内容哈希, HTML, 摘要)，供模型保存和批量回填使用"""
+    html = render_markdown(text)
+    return content_digest(text), html, summarize(html)
+
+
+def render_contents(texts):
+    """批量版本的 render_content"""
+    return [
+        (content_digest(text), html, summarize(html))
+        for text, html in zip(texts, render_many(texts))
+    ]
@@ -0,0 +1,139 @@
+"""主库/只读副本的读写分离
+
+公开页面（首页、详情、分类和标签列表、归档、标签云API）的读查询发往 BLOG_REPLICA_DATABASES 中随机选出的一个副本，
+写入、后台、编辑器和其他请求都使用主库。请求中一旦发生写入，后续读查询也回到主库。
+为保证编辑者能读到自己刚保存的内容，写请求之后的 BLOG_REPLICA_STICKY_SECONDS 秒内：
+该浏览器（通过cookie）以及全站（内容变化时间记录在缓存中，避免用副本上的旧数据生成新版本的页面缓存）都只读主库。
+"""
+import random
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from apps.blog.cache import CHANGED_AT_KEY
+
+# 读副本的视图（URL名称）
+DEFAULT_REPLICA_VIEWS = (
+    'home', 'detail', 'category_menu', 'search_tag', 'archives', 'tag_cloud_json',
+    'async_home', 'async_detail', 'async_category_menu', 'async_search_tag', 'async_archives',
+    'async_tag_cloud_json',
+)
+STICKY_COOKIE = 'blog_primary_until'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+class RoutingState:
+    """一个请求的路由状态：选中的副本，以及是否已经写入过"""
+
+    __slots__ = ('replica', 'wrote')
+
+    def __init__(self):
+        self.replica = None
+        self.wrote = False
+
+
+_state = ContextVar('blog_db_routing', default=None)
+
+
+def replica_databases():
+    return [alias for alias in getattr(settings, 'BLOG_REPLICA_DATABASES', ()) if alias in connections]
+
+
+def _sticky_seconds():
+    return getattr(settings, 'BLOG_REPLICA_STICKY_SECONDS', 10)
+
+
+class PrimaryReplicaRouter:
+    """只有 ReplicaRoutingMiddleware 为公开页面选定了副本时才读副本，其余读写都使用主库"""
+
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if state is not None and state.replica is not None and not state.wrote:
+            return state.replica
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # 副本与主库是同一份数据，从副本读出的对象可以和主库的对象相互关联
+        databases = {DEFAULT_DB_ALIAS, *replica_databases()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # 副本的表结构由主库复制而来，不在副本上执行迁移
+        if db in replica_databases():
+            return False
+        return None
+
+
+class ReplicaRoutingMiddleware:
+    """为每个请求建立路由状态；公开页面的GET请求且不在写入后的窗口期内时选定一个副本"""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        state = RoutingState()
+        token = _state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _state.reset(token)
+        return self._finish(request, response, state)
+
+    async def __acall__(self, request):
+        state = RoutingState()
+        token = _state.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _state.reset(token)
+        return self._finish(request, response, state)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        state = _state.get()
+        if state is None or request.method not in ('GET', 'HEAD'):
+            return None
+        replicas = replica_databases()
+        match = request.resolver_match
+        if replicas and match is not None and match.url_name in getattr(
+                settings, 'BLOG_REPLICA_VIEWS', DEFAULT_REPLICA_VIEWS) and not self._sticky(request):
+            state.replica = random.choice(replicas)
+        return None
+
+    @staticmethod
+    def _sticky(request):
+        """该浏览器或全站刚发生过写入时只读主库"""
+        now = time.time()
+        try:
+            if float(request.COOKIES.get(STICKY_COOKIE, 0)) > now:
+                return True
+        except ValueError:
+            pass
+        changed_at = cache.get(CHANGED_AT_KEY)
+        return changed_at is not None and now - changed_at < _sticky_seconds()
+
+    @staticmethod
+    def _finish(request, response, state):
+        if state.wrote and request.method not in SAFE_METHODS and replica_databases():
+            window = _sticky_seconds()
+            response.set_cookie(STICKY_COOKIE, str(time.time() + window), max_age=window,
+                                httponly=True, samesite='Lax')
+        return response
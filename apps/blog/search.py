@@ -0,0 +1,185 @@
+import html
+import re
+from collections import Counter
+
+from django.core.cache import cache
+from django.db import connection
+from django.utils.html import escape, strip_tags
+
+from apps.blog.models import SearchDocument
+
+# 中日韩字符按相邻两字切分（bigram），其余按字母数字单词切分
+CJK_RANGES = '぀-ヿ㐀-䶿一-鿿豈-﫿가-힯'
+TOKEN_RE = re.compile(rf'[{CJK_RANGES}]+|[0-9a-z_]+')
+CJK_RE = re.compile(rf'[{CJK_RANGES}]')
+
+# 标题中的词重复若干次，使标题命中的文章排名更靠前
+TITLE_WEIGHT = 3
+MAX_RESULTS = 1000
+SNIPPET_LENGTH = 160
+
+FTS_TABLE = 'search_document_fts'
+PUBLISHED_SQL = " AND a.status = 'p' AND a.pub_time IS NOT NULL"
+_fts_aliases = set()  # 已确认存在FTS5表的数据库别名
+
+# 每篇文章检索词的词频 {词: 次数}，由 index_article 写入，供相关文章计算使用
+TERM_COUNTS_KEY = 'blog:term_counts:{}'
+
+
+def tokenize(text):
+    """把文本切分为检索词：中文按双字切分，英文和数字按单词切分并转小写"""
+    tokens = []
+    for run in TOKEN_RE.findall((text or '').lower()):
+        if CJK_RE.match(run):
+            if len(run) == 1:
+                tokens.append(run)
+            else:
+                tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+        else:
+            tokens.append(run)
+    return tokens
+
+
+def query_terms(query):
+    """检索语句中的去重检索词，保持原有顺序"""
+    return list(dict.fromkeys(tokenize(query)))
+
+
+def _plain_text(article):
+    body = article.content_html or article.content or ''
+    return ' '.join(html.unescape(strip_tags(body)).split())
+
+
+def _has_fts_table():
+    """SQLite编译时可能未启用FTS5，迁移时建表失败则使用通用的回退实现"""
+    if connection.alias not in _fts_aliases and FTS_TABLE in connection.introspection.table_names():
+        _fts_aliases.add(connection.alias)
+    return connection.alias in _fts_aliases
+
+
+def index_article(article):
+    """更新一篇文章的检索文档"""
+    body = _plain_text(article)
+    tokens = tokenize(article.title) * TITLE_WEIGHT + tokenize(body)
+    SearchDocument.objects.update_or_create(
+        article_id=article.pk,
+        defaults={'title': article.title, 'body': body, 'tokens': f' {" ".join(tokens)} '},
+    )
+    cache.set(TERM_COUNTS_KEY.format(article.pk), dict(Counter(tokens)), None)
+    if connection.vendor == 'sqlite' and _has_fts_table():
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [article.pk])
+            cursor.execute(f'INSERT INTO {FTS_TABLE} (rowid, tokens) VALUES (%s, %s)', [article.pk, ' '.join(tokens)])
+
+
+def remove_article(article_id):
+    """删除一篇文章的检索文档"""
+    SearchDocument.objects.filter(article_id=article_id).delete()
+    cache.delete(TERM_COUNTS_KEY.format(article_id))
+    if connection.vendor == 'sqlite' and _has_fts_table():
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [article_id])
+
+
+def term_counts(article_ids, batch_size=500):
+    """批量获取文章检索词的词频 {文章id: {词: 次数}}，缓存中没有的从检索文档读取后写入缓存"""
+    keys = {TERM_COUNTS_KEY.format(pk): pk for pk in article_ids}
+    counts = {keys[key]: value for key, value in cache.get_many(keys).items()}
+    missing = [pk for pk in keys.values() if pk not in counts]
+    loaded = {}
+    for start in range(0, len(missing), batch_size):
+        for article_id, tokens in SearchDocument.objects.filter(
+                article_id__in=missing[start:start + batch_size]).values_list('article_id', 'tokens'):
+            loaded[article_id] = dict(Counter(tokens.split()))
+    cache.set_many({TERM_COUNTS_KEY.format(pk): value for pk, value in loaded.items()}, None)
+    counts.update(loaded)
+    return counts
+
+
+def _search_postgresql(terms, published_only):
+    sql = (
+        "SELECT d.article_id, ts_rank(d.search_vector, q) AS rank "
+        "FROM search_document d JOIN article a ON a.id = d.article_id, plainto_tsquery('simple', %s) q "
+        f"WHERE d.search_vector @@ q{PUBLISHED_SQL if published_only else ''} "
+        "ORDER BY rank DESC, a.pub_time DESC LIMIT %s"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [' '.join(terms), MAX_RESULTS])
+        return [(row[0], float(row[1])) for row in cursor.fetchall()]
+
+
+def _search_sqlite(terms, published_only):
+    # bm25() 越小越相关，取负数使其与其他后端一致（越大越相关）
+    sql = (
+        f"SELECT f.rowid, -bm25({FTS_TABLE}) AS rank "
+        f"FROM {FTS_TABLE} f JOIN article a ON a.id = f.rowid "
+        f"WHERE {FTS_TABLE} MATCH %s{PUBLISHED_SQL if published_only else ''} "
+        "ORDER BY rank DESC, a.pub_time DESC LIMIT %s"
+    )
+    match = ' '.join('"{}"'.format(term.replace('"', '""')) for term in terms)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [match, MAX_RESULTS])
+        return [(row[0], float(row[1])) for row in cursor.fetchall()]
+
+
+def _search_fallback(terms, published_only):
+    documents = SearchDocument.objects.all()
+    if published_only:
+        documents = documents.filter(article__status='p', article__pub_time__isnull=False)
+    for term in terms:
+        documents = documents.filter(tokens__contains=f' {term} ')
+    ranked = []
+    for article_id, tokens in documents.values_list('article_id', 'tokens')[:MAX_RESULTS]:
+        ranked.append((article_id, float(sum(tokens.count(f' {term} ') for term in terms))))
+    ranked.sort(key=lambda item: -item[1])
+    return ranked
+
+
+def search(query, published_only=True):
+    """全文检索文章（默认只检索已发表的文章），返回按相关度排序的 [(文章id, 得分)]"""
+    terms = query_terms(query)
+    if not terms:
+        return []
+    if connection.vendor == 'postgresql':
+        return _search_postgresql(terms, published_only)
+    if connection.vendor == 'sqlite' and _has_fts_table():
+        return _search_sqlite(terms, published_only)
+    return _search_fallback(terms, published_only)
+
+
+def highlight(text, query, length=SNIPPET_LENGTH):
+    """截取命中词附近的一段文本，并用<mark>标出命中词，返回已转义的HTML"""
+    terms = sorted(set(query_terms(query)) | set(re.findall(r'\S+', query.lower())), key=len, reverse=True)
+    if not text or not terms:
+        return escape(text[:length])
+    pattern = re.compile('|'.join(re.escape(term) for term in terms), re.IGNORECASE)
+
+    match = pattern.search(text)
+    start = max(0, match.start() - length // 4) if match else 0
+    snippet = text[start:start + length]
+
+    parts = []
+    position = 0
+    for found in pattern.finditer(snippet):
+        parts.append(escape(snippet[position:found.start()]))
+        parts.append(f'<mark>{escape(found.group())}</mark>')
+        position = found.end()
+    parts.append(escape(snippet[position:]))
+
+    prefix = '...' if start > 0 else ''
+    suffix = '...' if start + length < len(text) else ''
+    return prefix + ''.join(parts) + suffix
+
+
+def rebuild_search_index(batch_size=200):
+    """全量重建检索文档，返回处理的文章数量"""
+    from apps.blog.models import Article
+
+    count = 0
+    for article in Article.objects.only('id', 'title', 'content', 'content_html').iterator(chunk_size=batch_size):
+        index_article(article)
+        count += 1
+    stale = SearchDocument.objects.exclude(article_id__in=Article.objects.values('id'))
+    for article_id in stale.values_list('article_id', flat=True):
+        remove_article(article_id)
+    return count
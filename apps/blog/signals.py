@@ -0,0 +1,163 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from apps.blog.archive import adjust_month, archive_index_enabled, month_of
+from apps.blog.cache import bump_content_version
+from apps.blog.counts import adjust_category, adjust_tags, is_published, recount_tag, update_article_counts
+from apps.blog.models import Article, Category, Tag
+from apps.blog.postings import invalidate_tag_posts
+from apps.blog.jobs import enqueue
+from apps.blog.search import remove_article
+from apps.blog.timeline import relink, relink_article
+
+# 只有这些字段变化时才会影响归档统计和时间轴
+PUBLISH_FIELDS = {'status', 'pub_time'}
+
+# 这些字段变化时需要调整分类和标签的已发表文章数量
+COUNT_FIELDS = PUBLISH_FIELDS | {'category', 'category_id'}
+
+# 只更新这些字段时不影响页面内容（如浏览量），不需要使缓存失效
+VOLATILE_FIELDS = {'views'}
+
+
+def _touches(update_fields, fields):
+    return update_fields is None or bool(fields & set(update_fields))
+
+
+@receiver(pre_save, sender=Article)
+def remember_previous_state(sender, instance, update_fields=None, raw=False, **kwargs):
+    """保存前记录文章原来的发表状态、发布时间、分类和上下篇"""
+    if raw or not _touches(update_fields, COUNT_FIELDS):
+        return
+    previous = None
+    if instance.pk:
+        previous = Article.objects.filter(pk=instance.pk).only(
+            'status', 'pub_time', 'category', 'prev_post', 'next_post'
+        ).first()
+    instance._previous_state = previous
+
+
+@receiver(post_save, sender=Article)
+def update_publish_state(sender, instance, raw=False, **kwargs):
+    """发表、撤回、修改发布时间或分类后增量更新归档统计、上下篇引用和已发表文章数量"""
+    if raw or '_previous_state' not in instance.__dict__:
+        return
+    previous = instance.__dict__.pop('_previous_state')
+    if previous is not None and (previous.status, previous.pub_time) == (instance.status, instance.pub_time):
+        update_article_counts(instance, previous)  # 只可能是分类变化
+        return
+
+    tag_ids = list(instance.tags.values_list('id', flat=True))
+    update_article_counts(instance, previous, tag_ids)
+
+    if archive_index_enabled():
+        old_month = month_of(previous) if previous is not None else None
+        new_month = month_of(instance)
+        if old_month != new_month:
+            adjust_month(old_month, -1)
+            adjust_month(new_month, 1)
+
+    relink_article(instance, previous)
+    invalidate_tag_posts(tag_ids)
+
+
+@receiver(pre_delete, sender=Article)
+def remember_tags_before_delete(sender, instance, **kwargs):
+    """删除前记录文章的标签，删除后中间表记录已不存在"""
+    instance._deleted_tag_ids = list(instance.tags.values_list('id', flat=True))
+
+
+@receiver(post_delete, sender=Article)
+def update_publish_state_on_delete(sender, instance, **kwargs):
+    """删除文章后更新对应月份的文章数量、相邻文章的上下篇、标签文章列表和已发表文章数量"""
+    if archive_index_enabled():
+        adjust_month(month_of(instance), -1)
+    relink([instance.prev_post_id, instance.next_post_id])
+    tag_ids = instance.__dict__.pop('_deleted_tag_ids', [])
+    if is_published(instance):
+        adjust_category(instance.category_id, -1)
+        adjust_tags(tag_ids, -1)
+    invalidate_tag_posts(tag_ids)
+
+
+@receiver(m2m_changed, sender=Article.tags.through)
+def update_tag_posts(sender, instance, action, reverse, pk_set=None, **kwargs):
+    """文章与标签的关联变化后更新对应标签的文章列表和已发表文章数量"""
+    if reverse:  # 从标签一侧修改关联，instance 是标签
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            recount_tag(instance.pk)
+            invalidate_tag_posts([instance.pk])
+    elif action == 'pre_clear':
+        instance._cleared_tag_ids = list(instance.tags.values_list('id', flat=True))
+    elif action == 'post_clear':
+        tag_ids = instance.__dict__.pop('_cleared_tag_ids', [])
+        if is_published(instance):
+            adjust_tags(tag_ids, -1)
+        invalidate_tag_posts(tag_ids)
+    elif action == 'pre_remove' and is_published(instance) and pk_set:
+        # 只减去确实存在的关联，remove() 传入未关联的标签时不会删除任何记录
+        instance._removed_tag_ids = list(sender.objects.filter(
+            article_id=instance.pk, tag_id__in=pk_set
+        ).values_list('tag_id', flat=True))
+    elif action == 'post_remove':
+        adjust_tags(instance.__dict__.pop('_removed_tag_ids', []), -1)
+        invalidate_tag_posts(pk_set or [])
+    elif action == 'post_add':
+        # add() 发送的 pk_set 已去掉原有的关联
+        if is_published(instance):
+            adjust_tags(pk_set or [], 1)
+        invalidate_tag_posts(pk_set or [])
+
+
+@receiver(post_save, sender=Article)
+def update_search_index(sender, instance, update_fields=None, raw=False, **kwargs):
+    """文章保存后提交更新全文检索文档的后台任务"""
+    if raw or (update_fields is not None and set(update_fields) <= VOLATILE_FIELDS):
+        return
+    enqueue('index_article', key=instance.pk, article_id=instance.pk)
+
+
+@receiver(post_save, sender=Article)
+@receiver(post_delete, sender=Article)
+def update_related_articles(sender, instance, update_fields=None, raw=False, **kwargs):
+    """文章保存或删除后提交增量更新相关文章的后台任务"""
+    if raw or (update_fields is not None and set(update_fields) <= VOLATILE_FIELDS | {'related'}):
+        return
+    enqueue('update_related', key=instance.pk, article_id=instance.pk)
+
+
+@receiver(m2m_changed, sender=Article.tags.through)
+def update_related_on_tags_change(sender, instance, action, reverse, pk_set=None, **kwargs):
+    """标签变化会影响相关文章中的标签相似度"""
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    for article_id in (pk_set or ()) if reverse else (instance.pk,):
+        enqueue('update_related', key=article_id, article_id=article_id)
+
+
+@receiver(post_delete, sender=Article)
+def remove_from_search_index(sender, instance, **kwargs):
+    """文章删除后移除全文检索文档"""
+    remove_article(instance.pk)
+
+
+@receiver(post_save, sender=Article)
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Article)
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Category)
+def invalidate_on_change(sender, update_fields=None, **kwargs):
+    """文章、标签、分类有变化时递增内容版本号，并在后台预先生成新版本的侧边栏"""
+    if update_fields is not None and set(update_fields) <= VOLATILE_FIELDS:
+        return
+    bump_content_version()
+    enqueue('rebuild_sidebar')
+
+
+@receiver(m2m_changed, sender=Article.tags.through)
+def invalidate_on_tags_change(sender, action, **kwargs):
+    """文章与标签的关联变化时递增内容版本号"""
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        bump_content_version()
+        enqueue('rebuild_sidebar')
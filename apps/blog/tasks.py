@@ -0,0 +1,84 @@
+"""后台任务定义，由 apps.blog.jobs 的执行器在请求之外执行"""
+from apps.blog.bulk import refresh_derived
+from apps.blog.cache import bump_content_version
+from apps.blog.images import cache_image_info, inline_processing, local_path
+from apps.blog.jobs import enqueue, task
+from apps.blog.models import Article
+from apps.blog.related import update_related
+from apps.blog.rendering import render_content
+from apps.blog.search import index_article, remove_article
+
+
+def _merge_refresh(old, new):
+    """多次批量修改合并为一次刷新：文章、标签、分类和月份取并集，需要刷新的范围取并集；任一次为全量刷新时全量刷新"""
+    merged = {
+        key: sorted(set(old.get(key, [])) | set(new.get(key, [])))
+        for key in ('tag_ids', 'category_ids', 'months')
+    }
+    merged['publish_changed'] = old.get('publish_changed', False) or new.get('publish_changed', False)
+    merged['tags_changed'] = old.get('tags_changed', False) or new.get('tags_changed', False)
+    if old.get('article_ids') is None or new.get('article_ids') is None:
+        merged['article_ids'] = None
+    else:
+        merged['article_ids'] = sorted(set(old['article_ids']) | set(new['article_ids']))
+    return merged
+
+
+@task('render_article')
+def render_article(article_id):
+    """重新渲染正文HTML和摘要，然后更新检索文档和相关文章"""
+    article = Article.objects.filter(pk=article_id).only('id', 'title', 'content').first()
+    if article is None:
+        return
+    with inline_processing():
+        article.content_hash, article.content_html, article.summary = render_content(article.content)
+    # 用 update() 写回，避免再次触发保存信号
+    Article.objects.filter(pk=article_id).update(
+        content_hash=article.content_hash, content_html=article.content_html, summary=article.summary
+    )
+    index_article(article)
+    enqueue('update_related', key=article_id, article_id=article_id)
+    bump_content_version()
+
+
+@task('index_article')
+def index(article_id):
+    """更新一篇文章的检索文档"""
+    article = Article.objects.filter(pk=article_id).only('id', 'title', 'content', 'content_html').first()
+    if article is None:
+        remove_article(article_id)
+    else:
+        index_article(article)
+
+
+@task('update_related')
+def related(article_id):
+    """增量更新相关文章"""
+    if update_related(article_id):
+        bump_content_version()
+
+
+@task('refresh_derived', merge=_merge_refresh)
+def refresh(tag_ids=(), publish_changed=False, tags_changed=False, article_ids=None, category_ids=(),
+            months=()):
+    """批量修改后的派生数据刷新"""
+    refresh_derived(tag_ids, publish_changed=publish_changed, tags_changed=tags_changed, article_ids=article_ids,
+                    category_ids=category_ids, months=months)
+
+
+@task('rebuild_sidebar')
+def rebuild_sidebar():
+    """按当前内容版本预先生成侧边栏缓存，避免内容变化后的第一个访问者承担生成开销"""
+    from apps.blog.views import _get_common_context
+
+    _get_common_context()
+
+
+@task('process_image')
+def image(url):
+    """生成图片的各尺寸版本和缩略图，然后重新渲染引用了这张图片的文章"""
+    path = local_path(url)
+    if path is None or cache_image_info(path) is None:
+        return
+    for pk in Article.objects.filter(content__contains=url).values_list('id', flat=True):
+        enqueue('render_article', key=pk, article_id=pk)
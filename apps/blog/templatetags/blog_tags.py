@@ -0,0 +1,30 @@
+from django import template
+from django.templatetags.static import static
+from django.utils.html import format_html_join
+from django.utils.safestring import mark_safe
+
+from apps.blog.assets import bundles_enabled, get_bundles
+from apps.blog.cards import render_cards
+
+register = template.Library()
+
+
+@register.simple_tag
+def post_cards(post_list):
+    """
+    渲染列表页的文章卡片，使用卡片片段缓存
+    """
+    return mark_safe(''.join(render_cards(post_list)))
+
+
+@register.simple_tag
+def bundle(name):
+    """
+    引用静态资源包：生产环境输出合并后的带哈希文件，开发环境逐个输出源文件
+    """
+    names = [name] if bundles_enabled() else get_bundles()[name]
+    if name.endswith('.css'):
+        html = '<link rel="stylesheet" type="text/css" href="{}"/>'
+    else:
+        html = '<script src="{}"></script>'
+    return format_html_join('\n', html, ((static(item),) for item in names))
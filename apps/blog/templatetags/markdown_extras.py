@@ -1,7 +1,8 @@
-import markdown
 from django import template
 from django.utils.safestring import mark_safe
 
+from apps.blog.rendering import render_markdown, summarize
+
 register = template.Library()
 
 @register.filter(name='markdown')
@@ -11,31 +12,7 @@ def markdown_format(text):
     """
     if not text:
         return ''
-    
-    # 配置Markdown扩展
-    extensions = [
-        'markdown.extensions.extra',      # 支持表格、脚注等
-        'markdown.extensions.codehilite', # 代码高亮
-        'markdown.extensions.toc',        # 目录
-        'markdown.extensions.nl2br',      # 换行转<br>
-    ]
-    
-    # 配置代码高亮
-    extension_configs = {
-        'markdown.extensions.codehilite': {
-            'css_class': 'highlight',
-            'use_pygments': True,
-        }
-    }
-    
-    # 转换Markdown为HTML
-    md = markdown.Markdown(
-        extensions=extensions,
-        extension_configs=extension_configs
-    )
-    
-    html = md.convert(text)
-    return mark_safe(html)
+    return mark_safe(render_markdown(text))
 
 @register.filter(name='markdown_truncate')
 def markdown_truncate(text, length=300):
@@ -44,13 +21,4 @@ def markdown_truncate(text, length=300):
     """
     if not text:
         return ''
-    
-    # 转换为HTML后再去除标签
-    html = markdown_format(text)
-    from django.utils.html import strip_tags
-    plain_text = strip_tags(html)
-    
-    # 截取指定长度
-    if len(plain_text) > length:
-        return plain_text[:length] + '...'
-    return plain_text
\ No newline at end of file
+    return summarize(render_markdown(text), length)
@@ -1,3 +1,1474 @@
-from django.test import TestCase
+import hashlib
+import os
+import shutil
+import sqlite3
+import tempfile
+from contextlib import closing
+from datetime import datetime, timedelta, timezone as dt_timezone
+from io import StringIO
+from xml.etree import ElementTree
+from unittest import mock, skipIf
 
-# Create your tests here.
+import markdown
+import pygments
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import resolve, reverse
+from django.utils import timezone
+from django.utils.cache import patch_vary_headers
+from django.utils.http import parse_http_date
+from markdown.extensions import codehilite
+
+from apps.blog import bulk, related, search
+from apps.blog.archive import get_archive_data, rebuild_archive_index
+from apps.blog.assets import minify_js
+from apps.blog.cache import CHANGED_AT_KEY
+from apps.blog.counters import apply_pending_views, flush_views, pending_views, record_view
+from apps.blog.counts import recount
+from apps.blog.images import Image, inline_processing
+from apps.blog.jobs import claim, enqueue, execute, has_worker, job_mode, run_pending, task
+from apps.blog.management.commands import export_static
+from apps.blog.middleware import AnonymousPageCacheMiddleware
+from apps.blog.models import Archive, Article, Category, Job, Tag
+from apps.blog.pagination import EstimatedCountPaginator, encode_cursor, encode_posting
+from apps.blog.postings import POSTING_KEY, get_tag_posts
+from apps.blog.rendering import content_digest, highlight_cache, render_markdown
+from apps.blog.routers import STICKY_COOKIE, PrimaryReplicaRouter, ReplicaRoutingMiddleware
+from apps.blog.search import term_counts
+from apps.blog.timeline import rebuild_timeline
+from apps.blog.views import _get_common_context
+
+_collected = []
+
+
+@task('test_collect', merge=lambda old, new: {'items': old['items'] + new['items']})
+def _collect(items):
+    _collected.append(items)
+
+
+@task('test_fail', max_attempts=2)
+def _fail():
+    raise RuntimeError('任务失败')
+
+
+def _utc(*args):
+    return datetime(*args, tzinfo=dt_timezone.utc)
+
+
+# 测试不依赖 collectstatic，浏览量只在测试中显式写回
+TEST_SETTINGS = dict(
+    STORAGES={**settings.STORAGES, 'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'}},
+    BLOG_PAGE_CACHE_ENABLED=False, BLOG_VIEWS_FLUSH_THRESHOLD=10 ** 6,
+    BLOG_VIEWS_FLUSH_INTERVAL=10 ** 6, BLOG_REPLICA_DATABASES=[],
+)
+
+
+@override_settings(**TEST_SETTINGS)
+class PublishedQueryTests(TestCase):
+    """已发表文章查询和公开页面的查询次数（不启用整页缓存，每个用例开始时清空缓存）"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='Python')
+        cls.tag = Tag.objects.create(name='Django')
+        cls.articles = []
+        for day in range(1, 8):
+            article = Article.objects.create(
+                title=f'文章{day}', content=f'# 标题{day}\n\n正文内容{day}', status='p',
+                pub_time=_utc(2025, 5, day, 12), category=cls.category,
+            )
+            article.tags.add(cls.tag)
+            cls.articles.append(article)
+        # 北京时间6月1日凌晨，按当前时区属于6月
+        cls.june = Article.objects.create(title='六月', content='正文', status='p',
+                                          pub_time=_utc(2025, 5, 31, 17), category=cls.category)
+        cls.draft = Article.objects.create(title='草稿', content='正文', status='d', category=cls.category)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_published_manager(self):
+        self.assertNotIn(self.draft, Article.published.all())
+        self.assertEqual(Article.published.count(), 8)
+        self.assertEqual(Article.objects.count(), 9)
+
+    def test_in_month_uses_local_time(self):
+        may = set(Article.published.in_month(2025, 5).values_list('id', flat=True))
+        self.assertEqual(may, {article.id for article in self.articles})
+        self.assertEqual(list(Article.published.in_month('2025', '06')), [self.june])
+        self.assertFalse(Article.published.in_month(2025, 13).exists())
+        self.assertFalse(Article.published.in_month('abc', 1).exists())
+
+    def test_for_list_defers_content(self):
+        articles = list(Article.published.in_month(2025, 5).for_list(tags=True)[:3])
+        with self.assertNumQueries(0):
+            for article in articles:
+                self.assertEqual(article.category.name, 'Python')
+                self.assertEqual([tag.name for tag in article.tags.all()], ['Django'])
+        self.assertTrue({'content', 'content_html', 'related'} <= articles[0].get_deferred_fields())
+
+    def _assert_queries(self, url, cold, warm):
+        """首次请求（所有缓存未命中）和再次请求（侧边栏、卡片等缓存命中）的查询次数"""
+        with self.assertNumQueries(cold):
+            self.assertEqual(self.client.get(url).status_code, 200)
+        with self.assertNumQueries(warm):
+            self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_home_queries(self):
+        self._assert_queries(reverse('home'), 6, 2)
+
+    def test_home_second_page_queries(self):
+        self._assert_queries(reverse('home') + '?page=2', 6, 2)
+
+    def test_detail_queries(self):
+        self._assert_queries(reverse('detail', args=[self.articles[3].id]), 6, 3)
+
+    def test_category_queries(self):
+        self._assert_queries(reverse('category_menu', args=[self.category.id]), 7, 3)
+
+    def test_tag_queries(self):
+        self._assert_queries(reverse('search_tag', args=[self.tag.slug]), 7, 2)
+
+    def test_archive_queries(self):
+        self._assert_queries(reverse('archives', args=['2025', '05']), 6, 2)
+
+    def test_tag_cloud_queries(self):
+        self._assert_queries(reverse('tag_cloud_json'), 1, 0)
+
+
+
+@override_settings(**TEST_SETTINGS, PAGE_NUM=2)
+class CursorPaginationTests(TestCase):
+    """列表页按 (发布时间, id) 的游标分页：发布时间相同的文章不重复不遗漏，非法游标返回404"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='Python')
+        cls.articles = []
+        # 前三篇发布时间相同，只能靠id区分先后
+        for day in (1, 1, 1, 2, 3):
+            cls.articles.append(Article.objects.create(title=f'文章{day}', content='正文', status='p',
+                                                       pub_time=_utc(2025, 5, day, 12), category=cls.category))
+        # 按列表顺序（发布时间、id降序）排列的文章id
+        cls.ids = [article.id for article in sorted(cls.articles, key=lambda a: (a.pub_time, a.id), reverse=True)]
+
+    def setUp(self):
+        cache.clear()
+
+    def _walk(self, url, cursor=''):
+        """从游标开始依次请求后续各页，返回每页的文章id列表"""
+        pages = []
+        while True:
+            response = self.client.get(url, {'cursor': cursor}, headers={'x-infinite-scroll': 'true'})
+            self.assertEqual(response.status_code, 200)
+            post_list = response.context['post_list']
+            pages.append([post.id for post in post_list])
+            cursor = post_list.next_cursor
+            if not cursor:
+                return pages
+
+    def test_cursor_round_trip(self):
+        pages = [self.ids[:2], self.ids[2:4], self.ids[4:]]
+        for url in (reverse('home'), reverse('category_menu', args=[self.category.id]),
+                    reverse('archives', args=['2025', '05'])):
+            self.assertEqual(self._walk(url), pages)
+
+    def test_pub_time_ties(self):
+        tied = [article for article in self.articles if article.pub_time == _utc(2025, 5, 1, 12)]
+        newest = max(tied, key=lambda article: article.id)
+        # 游标落在同一发布时间的文章中间时，只返回id更小的同时刻文章
+        self.assertEqual(self._walk(reverse('home'), encode_cursor(newest)),
+                         [sorted((a.id for a in tied if a is not newest), reverse=True)])
+
+    def test_last_page_has_no_cursor(self):
+        response = self.client.get(reverse('home'), {'cursor': encode_cursor(self.articles[0])},
+                                   headers={'x-infinite-scroll': 'true'})
+        post_list = response.context['post_list']
+        self.assertEqual(list(post_list), [])
+        self.assertFalse(post_list.has_next())
+        self.assertNotContains(response, 'data-next-cursor')
+
+    def test_insert_between_requests(self):
+        response = self.client.get(reverse('home'))
+        post_list = response.context['post_list']
+        self.assertContains(response, f'data-next-cursor="{post_list.next_cursor}"')
+        # 取得游标后发表的新文章不会让后续页面重复或遗漏
+        Article.objects.create(title='新文章', content='正文', status='p', pub_time=_utc(2025, 6, 1))
+        self.assertEqual(self._walk(reverse('home'), post_list.next_cursor), [self.ids[2:4], self.ids[4:]])
+
+    def test_ajax_page_out_of_range(self):
+        tag = Tag.objects.create(name='Django')
+        self.articles[0].tags.add(tag)
+        for url in (reverse('home'), reverse('category_menu', args=[self.category.id]),
+                    reverse('search_tag', args=[tag.slug]), reverse('archives', args=['2025', '05'])):
+            for headers in ({'x-requested-with': 'XMLHttpRequest'},
+                            {'x-requested-with': 'XMLHttpRequest', 'x-infinite-scroll': 'true'}):
+                response = self.client.get(url, {'page': 99}, headers=headers)
+                self.assertEqual((response.status_code, response.content), (200, b''), url)
+            # 非AJAX请求仍显示最后一页
+            self.assertEqual(self.client.get(url, {'page': 99}).status_code, 200)
+
+    def test_tampered_cursor_is_404(self):
+        cursor = encode_cursor(self.articles[0])
+        for bad in (cursor[:-3] + '!!!', 'bm90IGpzb24', cursor[::-1], 'WyJ4IiwgMV0'):
+            response = self.client.get(reverse('home'), {'cursor': bad}, headers={'x-infinite-scroll': 'true'})
+            self.assertEqual(response.status_code, 404, bad)
+
+
+@override_settings(**TEST_SETTINGS)
+class DerivedFieldTests(TestCase):
+    """派生字段只通过 F()/update() 维护，较早读出的对象整行保存时不能写回旧值"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='Python')
+        cls.tag = Tag.objects.create(name='Django')
+
+    def _publish(self, title, **kwargs):
+        article = Article.objects.create(title=title, content='正文', status='p', category=self.category, **kwargs)
+        article.tags.add(self.tag)
+        return article
+
+    def test_stale_tag_and_category_save_keeps_counts(self):
+        self._publish('第一篇')
+        tag = Tag.objects.get(pk=self.tag.pk)
+        category = Category.objects.get(pk=self.category.pk)
+        self._publish('第二篇')
+        tag.name = 'Django 5'
+        tag.save()
+        category.name = 'Python 3'
+        category.save()
+        self.assertEqual(Tag.objects.get(pk=tag.pk).published_count, 2)
+        self.assertEqual(Category.objects.get(pk=category.pk).published_count, 2)
+        self.assertEqual(Tag.objects.get(pk=tag.pk).name, 'Django 5')
+        self.assertEqual(recount(), 0)
+
+    def test_stale_article_save_keeps_timeline(self):
+        older = self._publish('较早', pub_time=_utc(2025, 1, 1))
+        stale = Article.objects.get(pk=older.pk)
+        newer = self._publish('较新', pub_time=_utc(2025, 2, 1))
+        self.assertEqual(Article.objects.get(pk=older.pk).prev_post_id, newer.pk)
+        # 编辑者修改正文或分类，保存的是发表新文章之前读出的对象
+        stale.content = '修改后的正文'
+        stale.category = Category.objects.create(name='Go')
+        stale.save()
+        self.assertEqual(Article.objects.get(pk=older.pk).prev_post_id, newer.pk)
+        self.assertEqual(rebuild_timeline(), 0)
+        self.assertEqual(recount(), 0)
+
+    def test_stale_article_save_keeps_flushed_views(self):
+        article = self._publish('浏览量')
+        stale = Article.objects.get(pk=article.pk)
+        for _ in range(7):
+            record_view(article.pk)
+        flush_views([article.pk])
+        stale.title = '修改标题'
+        stale.save()
+        article.refresh_from_db()
+        self.assertEqual((article.title, article.views), ('修改标题', 7))
+
+
+@override_settings(**TEST_SETTINGS)
+class ViewCounterTests(TestCase):
+    """浏览量缓冲区：记录、叠加显示和批量写回"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.article = Article.objects.create(title='文章', content='正文', status='p', views=10)
+        cls.other = Article.objects.create(title='另一篇', content='正文', status='p')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_record_and_apply_pending(self):
+        self.assertEqual([record_view(self.article.pk) for _ in range(3)], [1, 2, 3])
+        record_view(self.other.pk)
+        self.assertEqual(pending_views([self.article.pk, self.other.pk]), {self.article.pk: 3, self.other.pk: 1})
+        articles = apply_pending_views(Article.objects.filter(pk=self.article.pk))
+        self.assertEqual(articles[0].views, 13)
+        # 未写回之前数据库中的浏览量不变
+        self.assertEqual(Article.objects.get(pk=self.article.pk).views, 10)
+
+    def test_flush_moves_buffer_to_database(self):
+        for _ in range(3):
+            record_view(self.article.pk)
+        record_view(self.other.pk)
+        with self.assertNumQueries(1):
+            self.assertEqual(flush_views([self.article.pk, self.other.pk]), 4)
+        self.assertEqual(pending_views([self.article.pk, self.other.pk]), {})
+        self.assertEqual(Article.objects.get(pk=self.article.pk).views, 13)
+        self.assertEqual(Article.objects.get(pk=self.other.pk).views, 1)
+        self.assertEqual(flush_views([self.article.pk]), 0)
+
+    @override_settings(BLOG_VIEWS_FLUSH_THRESHOLD=2)
+    def test_threshold_triggers_flush(self):
+        flush_views()  # 清空其他用例留下的计数
+        record_view(self.article.pk)
+        self.assertEqual(Article.objects.get(pk=self.article.pk).views, 10)
+        record_view(self.article.pk)
+        self.assertEqual(Article.objects.get(pk=self.article.pk).views, 12)
+        self.assertEqual(pending_views([self.article.pk]), {})
+
+
+@skipIf(Image is None, '需要 Pillow')
+@override_settings(**TEST_SETTINGS)
+class ImageProcessingTests(TestCase):
+    """保存文章时为未处理的图片提交后台任务，页面请求中的渲染只输出原图、不写数据库"""
+
+    def setUp(self):
+        cache.clear()
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        override = override_settings(MEDIA_ROOT=self.media_root, MEDIA_URL='/media/')
+        override.enable()
+        self.addCleanup(override.disable)
+        os.makedirs(os.path.join(self.media_root, 'editor'))
+        Image.new('RGB', (1200, 600), (200, 30, 30)).save(os.path.join(self.media_root, 'editor', 'a.png'))
+        self.markdown = '![图片](/media/editor/a.png)'
+
+    def test_request_render_does_not_schedule(self):
+        article = Article.objects.create(title='图片', content='正文', status='p')
+        Article.objects.filter(pk=article.pk).update(content=self.markdown, content_html='')
+        html = render_markdown(self.markdown)
+        self.assertNotIn('<picture>', html)
+        self.assertIn('loading="lazy"', html)
+        self.assertContains(self.client.get(reverse('detail', args=[article.pk])), 'loading="lazy"')
+        self.assertFalse(Job.objects.filter(name='process_image').exists())
+        self.assertFalse(os.path.exists(os.path.join(self.media_root, 'editor', 'variants')))
+
+    def test_save_schedules_job(self):
+        article = Article.objects.create(title='图片', content=self.markdown, status='p')
+        self.assertNotIn('<picture>', article.content_html)
+        self.assertEqual(list(Job.objects.filter(name='process_image').values_list('key', flat=True)),
+                         [f'process_image:{hashlib.md5(b"/media/editor/a.png").hexdigest()}'])
+        run_pending()
+        self.assertIn('<picture>', render_markdown(self.markdown))
+        article.refresh_from_db()
+        self.assertIn('srcset=', article.content_html)
+        self.assertFalse(Job.objects.exists())
+
+    def test_single_quoted_attributes(self):
+        with inline_processing():
+            html = render_markdown("<img src='/media/editor/a.png' alt='说\"明\"'>")
+        self.assertIn('<picture>', html)
+        self.assertIn('alt="说&quot;明&quot;"', html)
+        self.assertIn('width="1200"', html)
+
+
+@override_settings(**TEST_SETTINGS, PAGE_NUM=2)
+class TagPostingPaginationTests(TestCase):
+    """标签页在缓存的 [(发布时间, id)] 列表上分页，列表中可能有已删除的文章"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tag = Tag.objects.create(name='Django')
+        cls.articles = []
+        for day in range(1, 5):
+            article = Article.objects.create(title=f'文章{day}', content='正文', status='p',
+                                             pub_time=_utc(2025, 5, day))
+            article.tags.add(cls.tag)
+            cls.articles.append(article)
+
+    def setUp(self):
+        cache.clear()
+        self.url = reverse('search_tag', args=[self.tag.slug])
+
+    def _stale_postings(self):
+        """在第2、3条之间插入两篇已删除的文章"""
+        postings = get_tag_posts(self.tag.id)
+        missing = [(postings[1][0] - 2, 9998), (postings[1][0] - 1, 9999)]
+        postings = sorted(postings + missing, key=lambda item: (-item[0], -item[1]))
+        cache.set(POSTING_KEY.format(self.tag.id), postings)
+        return postings
+
+    def _walk(self, cursor=''):
+        """从游标开始依次请求后续各页，返回每页的文章id列表"""
+        pages = []
+        while True:
+            response = self.client.get(self.url, {'cursor': cursor}, headers={'x-infinite-scroll': 'true'})
+            self.assertEqual(response.status_code, 200)
+            post_list = response.context['post_list']
+            pages.append([post.id for post in post_list])
+            cursor = post_list.next_cursor
+            if not cursor:
+                return pages
+
+    def test_posting_cursor_matches_article_cursor(self):
+        article = self.articles[0]
+        posting = next(item for item in get_tag_posts(self.tag.id) if item[1] == article.id)
+        self.assertEqual(encode_posting(posting), encode_cursor(article))
+
+    def test_page_of_deleted_articles(self):
+        self._stale_postings()
+        ids = [article.id for article in reversed(self.articles)]
+        # 第2页的两条都已删除：页面为空但仍给出下一页的游标，不重复也不遗漏
+        self.assertEqual(self._walk(), [ids[:2], [], ids[2:]])
+
+    def test_last_article_of_page_deleted(self):
+        postings = self._stale_postings()
+        ids = [article.id for article in reversed(self.articles)]
+        # 从第1条之后开始，本页为 [第2篇, 已删除]：下一页从已删除的记录之后开始，不会重复第2篇
+        self.assertEqual(self._walk(encode_posting(postings[0])), [[ids[1]], [ids[2]], [ids[3]]])
+
+    def test_page_numbers_use_posting_cursor(self):
+        self._stale_postings()
+        response = self.client.get(self.url, {'page': 2})
+        post_list = response.context['post_list']
+        self.assertEqual(list(post_list), [])
+        self.assertEqual(self._walk(post_list.next_cursor), [[article.id for article in reversed(self.articles)][2:]])
+
+
+@override_settings(**TEST_SETTINGS, BLOG_JOB_RETRY_DELAY=10, BLOG_JOB_TIMEOUT=600)
+class JobQueueTests(TestCase):
+    """后台任务队列：去重合并、领取、重试和失败"""
+
+    def setUp(self):
+        _collected.clear()
+
+    def test_enqueue_merges_pending_job(self):
+        enqueue('test_collect', key=1, items=[1])
+        enqueue('test_collect', key=1, items=[2])
+        enqueue('test_collect', key=2, items=[3])
+        self.assertEqual(Job.objects.count(), 2)
+        self.assertEqual(Job.objects.get(key='test_collect:1').payload, {'items': [1, 2]})
+        self.assertEqual(run_pending(), 2)
+        self.assertEqual(sorted(_collected), [[1, 2], [3]])
+        self.assertFalse(Job.objects.exists())
+
+    def test_delayed_job_not_claimed(self):
+        enqueue('test_collect', items=[1], delay=60)
+        self.assertEqual(claim(10), [])
+
+    def test_claim_marks_running(self):
+        enqueue('test_collect', items=[1])
+        jobs = claim(10)
+        self.assertEqual([(job.status, job.attempts) for job in jobs], [(Job.RUNNING, 1)])
+        self.assertTrue(jobs[0].locked_by)
+        self.assertEqual(claim(10), [])
+        # 执行期间再次提交的任务不会合并到执行中的任务
+        enqueue('test_collect', items=[2])
+        self.assertEqual(Job.objects.filter(status=Job.PENDING).count(), 1)
+
+    def test_retry_with_backoff_then_fail(self):
+        enqueue('test_fail')
+        job = claim(10)[0]
+        with self.assertLogs('apps.blog.jobs', 'ERROR'):
+            self.assertFalse(execute(job))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.PENDING, 1))
+        self.assertIn('任务失败', job.last_error)
+        self.assertAlmostEqual((job.run_at - timezone.now()).total_seconds(), 10, delta=2)
+        self.assertEqual(claim(10), [])
+
+        Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+        job = claim(10)[0]
+        with self.assertLogs('apps.blog.jobs', 'ERROR'):
+            self.assertFalse(execute(job))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.FAILED, 2))
+        self.assertEqual(claim(10), [])
+
+    def test_stale_running_job_is_reclaimed(self):
+        enqueue('test_collect', items=[1])
+        job = claim(10)[0]
+        Job.objects.filter(pk=job.pk).update(locked_at=timezone.now() - timedelta(seconds=601))
+        jobs = claim(10)
+        self.assertEqual([(j.pk, j.attempts) for j in jobs], [(job.pk, 2)])
+
+    def test_save_renders_without_worker(self):
+        self.assertFalse(has_worker())
+        article = Article.objects.create(title='文章', content='# 标题\n\n正文', status='p')
+        self.assertIn('<h1', article.content_html)
+        self.assertEqual(article.summary.split(), ['标题', '正文'])
+        self.assertFalse(Job.objects.filter(name='render_article').exists())
+
+    def test_save_with_worker_keeps_rendered_fields(self):
+        article = Article.objects.create(title='文章', content='旧的正文', status='p')
+        old_html = article.content_html
+        with job_mode('worker'):
+            self.assertTrue(has_worker())
+            article.content = '新的正文'
+            article.save()
+        # 渲染任务完成前仍显示旧的渲染结果，不回退到实时渲染
+        article.refresh_from_db()
+        self.assertEqual(article.content_html, old_html)
+        self.assertTrue(Job.objects.filter(key=f'render_article:{article.pk}').exists())
+        run_pending()
+        article.refresh_from_db()
+        self.assertIn('新的正文', article.content_html)
+
+    def test_requeue_merges_into_pending_job(self):
+        enqueue('test_collect', items=[1])
+        job = claim(10)[0]
+        enqueue('test_collect', items=[2])
+        Job.objects.filter(pk=job.pk).update(locked_at=timezone.now() - timedelta(seconds=601))
+        jobs = claim(10)
+        self.assertEqual(len(jobs), 1)
+        self.assertEqual(jobs[0].payload, {'items': [1, 2]})
+        self.assertFalse(Job.objects.filter(pk=job.pk).exists())
+
+
+@override_settings(**TEST_SETTINGS, BLOG_RELATED_COUNT=2, BLOG_RELATED_TAG_WEIGHT=0.3)
+class RelatedArticleTests(TestCase):
+    """相关文章：TF-IDF 余弦相似度与标签 Jaccard 相似度加权"""
+
+    def setUp(self):
+        cache.clear()
+        self.python, self.django = Tag.objects.create(name='Python'), Tag.objects.create(name='Django')
+        self.cache_a = self._create('缓存优化', '数据库缓存和查询优化，缓存失效策略', [self.python])
+        self.cache_b = self._create('缓存设计', '缓存失效策略与数据库查询', [self.python, self.django])
+        self.orm = self._create('模型查询', '数据库模型的查询', [self.django])
+        self.cooking = self._create('红烧肉', '做饭的步骤', [])
+        run_pending()  # 渲染、检索文档和增量更新
+
+    def _create(self, title, content, tags):
+        article = Article.objects.create(title=title, content=content, status='p')
+        article.tags.set(tags)
+        return article
+
+    def _related(self, article):
+        return related.related_ids(Article.objects.get(pk=article.pk))
+
+    def test_ranking(self):
+        self.assertEqual(self._related(self.cache_a), [self.cache_b.id, self.orm.id])
+        self.assertEqual(self._related(self.cache_b)[0], self.cache_a.id)
+        self.assertEqual(self._related(self.cooking), [])
+        self.assertNotIn(self.cooking.id, self._related(self.orm))
+
+    def test_tag_only_similarity(self):
+        corpus = related.load_corpus()
+        i, j = corpus.position[self.cache_a.id], corpus.position[self.cache_b.id]
+        scores = corpus.scores(i)
+        cosine = sum(w * corpus.vectors[j].get(term, 0.0) for term, w in corpus.vectors[i].items())
+        # Jaccard({Python}, {Python, Django}) = 1/2
+        self.assertAlmostEqual(scores[j], 0.7 * cosine + 0.3 * 0.5)
+        self.assertEqual(scores[corpus.position[self.cooking.id]], 0)
+
+    def test_incremental_matches_rebuild(self):
+        self.assertEqual(related.rebuild_related(), 0)
+
+    def test_python_and_numpy_agree(self):
+        Article.objects.update(related=[])
+        related.rebuild_related()
+        expected = dict(Article.objects.values_list('id', 'related'))
+        Article.objects.update(related=[])
+        with mock.patch.object(related, 'np', None):
+            related.rebuild_related()
+        self.assertEqual(dict(Article.objects.values_list('id', 'related')), expected)
+
+    def test_unpublish_removes_from_lists(self):
+        self.cache_b.status = 'd'
+        self.cache_b.save()
+        run_pending()
+        self.assertNotIn(self.cache_b.id, self._related(self.cache_a))
+        self.assertEqual(self._related(self.cache_b), [])
+
+    def test_term_counts_cached_by_index(self):
+        with self.assertNumQueries(0):
+            counts = term_counts([self.cache_a.id])
+        self.assertEqual(counts[self.cache_a.id]['缓存'], 3 * 1 + 2)
+        cache.clear()
+        with self.assertNumQueries(1):
+            self.assertEqual(term_counts([self.cache_a.id]), counts)
+
+
+@override_settings(**{**TEST_SETTINGS, 'BLOG_REPLICA_DATABASES': ['replica']}, BLOG_REPLICA_STICKY_SECONDS=10)
+class ReplicaRoutingTests(TestCase):
+    """读写分离：公开页面读副本，写入后本请求、该浏览器和全站在窗口期内读主库
+
+    replica 是单独的SQLite数据库，表结构从测试主库复制，同一篇文章在两个库中的标题不同，按读到的数据判断路由。
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.replica_dir = tempfile.mkdtemp(prefix='blog-replica-')
+        path = os.path.join(cls.replica_dir, 'replica.sqlite3')
+        # 副本不执行迁移（allow_migrate），直接复制测试主库的表结构
+        connections['default'].ensure_connection()
+        with closing(sqlite3.connect(path)) as target:
+            connections['default'].connection.backup(target)
+        super().setUpClass()
+        # 测试运行器只为 DATABASES 中的别名建库，副本在 TestCase 限制可用数据库之后注册并直接建立连接；
+        # 副本上的数据不随用例回滚，随临时目录一起删除
+        connections.settings['replica'] = {**connections['default'].settings_dict, 'NAME': path}
+        connections['replica'].connect()
+        # 副本上是尚未同步的旧标题；bulk_create 不触发信号
+        Article.objects.using('replica').bulk_create([Article(
+            id=cls.article.id, title='副本文章', content='正文', status='p', pub_time=cls.article.pub_time,
+            content_hash=cls.article.content_hash, content_html=cls.article.content_html,
+        )])
+
+    @classmethod
+    def tearDownClass(cls):
+        connections['replica'].close()
+        del connections['replica']
+        del connections.settings['replica']
+        shutil.rmtree(cls.replica_dir)
+        super().tearDownClass()
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.article = Article.objects.create(title='主库文章', content='正文', status='p', pub_time=_utc(2025, 5, 1))
+
+    def setUp(self):
+        self.factory = RequestFactory()
+        # 创建文章记录的内容变化时间会让全站只读主库，从干净的缓存开始
+        cache.clear()
+
+    def _run(self, request, view):
+        """按请求处理流程调用中间件：process_view 之后执行视图"""
+        request.resolver_match = resolve(request.path_info)
+
+        def get_response(request):
+            middleware.process_view(request, view, (), {})
+            return view(request)
+
+        middleware = ReplicaRoutingMiddleware(get_response)
+        return middleware(request)
+
+    def _title(self):
+        return Article.objects.get(pk=self.article.pk).title
+
+    def _read(self, request):
+        """在请求中读出文章标题，返回 (标题, 响应)"""
+        seen = []
+
+        def view(request):
+            seen.append(self._title())
+            return HttpResponse()
+
+        response = self._run(request, view)
+        return seen[0], response
+
+    def test_public_get_reads_replica(self):
+        self.assertEqual(self._read(self.factory.get(reverse('home')))[0], '副本文章')
+        self.assertEqual(self._read(self.factory.get(reverse('detail', args=[self.article.id])))[0], '副本文章')
+
+    def test_other_views_and_outside_requests_use_primary(self):
+        self.assertEqual(self._read(self.factory.get(reverse('search')))[0], '主库文章')
+        self.assertEqual(self._read(self.factory.head(reverse('home')))[0], '副本文章')
+        self.assertEqual(self._title(), '主库文章')
+
+    def test_write_sticks_to_primary(self):
+        seen = []
+
+        def view(request):
+            seen.append(self._title())
+            Article.objects.filter(pk=self.article.pk).update(title='修改后的标题')
+            seen.append(self._title())
+            return HttpResponse()
+
+        response = self._run(self.factory.get(reverse('home')), view)
+        # 写入后本请求的读取回到主库，读到刚写入的标题
+        self.assertEqual(seen, ['副本文章', '修改后的标题'])
+        # GET 请求中的写入不设置cookie
+        self.assertNotIn(STICKY_COOKIE, response.cookies)
+        # 请求结束后路由状态被清除
+        self.assertEqual(self._title(), '修改后的标题')
+
+    def test_post_write_sets_cookie(self):
+        def view(request):
+            Article.objects.filter(pk=self.article.pk).update(title='修改后的标题')
+            return HttpResponse()
+
+        response = self._run(self.factory.post(reverse('home')), view)
+        self.assertIn(STICKY_COOKIE, response.cookies)
+        self.assertEqual(response.cookies[STICKY_COOKIE]['max-age'], 10)
+
+        cache.clear()
+        request = self.factory.get(reverse('home'))
+        request.COOKIES[STICKY_COOKIE] = response.cookies[STICKY_COOKIE].value
+        self.assertEqual(self._read(request)[0], '修改后的标题')
+        request = self.factory.get(reverse('home'))
+        request.COOKIES[STICKY_COOKIE] = '0'
+        self.assertEqual(self._read(request)[0], '副本文章')
+
+    def test_recent_content_change_uses_primary(self):
+        Article.objects.get(pk=self.article.pk).save()  # 内容变化时间记录在缓存中
+        self.assertIsNotNone(cache.get(CHANGED_AT_KEY))
+        self.assertEqual(self._read(self.factory.get(reverse('home')))[0], '主库文章')
+        cache.delete(CHANGED_AT_KEY)
+        self.assertEqual(self._read(self.factory.get(reverse('home')))[0], '副本文章')
+
+    def test_pages_render_through_replica(self):
+        self.assertContains(self.client.get(reverse('detail', args=[self.article.id])), '副本文章')
+        self.assertContains(self.client.get(reverse('search'), {'q': '文章'}), '搜索')
+
+    def test_allow_relation_and_migrate(self):
+        router = PrimaryReplicaRouter()
+        primary = Article.objects.get(pk=self.article.pk)
+        replica = Article.objects.using('replica').get(pk=self.article.pk)
+        self.assertEqual((replica._state.db, replica.title), ('replica', '副本文章'))
+        self.assertIs(router.allow_relation(primary, replica), True)
+        replica._state.db = 'other'
+        self.assertIsNone(router.allow_relation(primary, replica))
+        self.assertIs(router.allow_migrate('replica', 'blog'), False)
+        self.assertIsNone(router.allow_migrate('default', 'blog'))
+
+
+@override_settings(**TEST_SETTINGS, PAGE_NUM=2)
+class SearchTests(TestCase):
+    """全文检索：中文双字切分、SQLite FTS5 和通用回退两种实现、保存和删除文章后更新索引"""
+
+    def setUp(self):
+        cache.clear()
+        self.python = self._create('Python异步编程', '使用asyncio编写异步代码，事件循环负责调度协程。')
+        self.django = self._create('Django部署', '使用Gunicorn部署Django应用，并配置异步任务队列。')
+        self.draft = self._create('异步草稿', '尚未发表的异步编程笔记。', status='d')
+        run_pending()
+
+    def _create(self, title, content, status='p'):
+        return Article.objects.create(title=title, content=content, status=status, pub_time=_utc(2025, 5, 1))
+
+    def _ids(self, query):
+        return [article_id for article_id, _ in search.search(query)]
+
+    def _fallback(self):
+        return mock.patch.object(search, '_has_fts_table', return_value=False)
+
+    def test_tokenize_chinese_bigrams(self):
+        self.assertEqual(search.tokenize('异步编程 Django2'), ['异步', '步编', '编程', 'django2'])
+        self.assertEqual(search.tokenize('云'), ['云'])
+        self.assertEqual(search.query_terms('异步 异步'), ['异步'])
+
+    def test_sqlite_uses_fts5(self):
+        self.assertTrue(search._has_fts_table())
+        with mock.patch.object(search, '_search_fallback', side_effect=AssertionError):
+            # 标题命中的文章排在前面，草稿不出现在结果中
+            self.assertEqual(self._ids('异步'), [self.python.id, self.django.id])
+
+    def test_fallback_matches_fts5(self):
+        for query in ('异步', '异步编程', 'django', '部署 队列', '不存在的词'):
+            expected = self._ids(query)
+            with self._fallback():
+                self.assertEqual(self._ids(query), expected, query)
+        with self._fallback():
+            self.assertEqual(self._ids('异步'), [self.python.id, self.django.id])
+            self.assertIn(self.draft.id, [pk for pk, _ in search.search('异步', published_only=False)])
+
+    def test_all_terms_required(self):
+        self.assertEqual(self._ids('异步 部署'), [self.django.id])
+        self.assertEqual(self._ids('  '), [])
+
+    def test_index_updated_on_save_and_delete(self):
+        self.python.content = '介绍类型标注。'
+        self.python.title = '类型标注'
+        self.python.save()
+        run_pending()
+        self.assertEqual(self._ids('协程'), [])
+        self.assertEqual(self._ids('类型'), [self.python.id])
+        self.django.delete()
+        self.assertEqual(self._ids('部署'), [])
+        with self._fallback():
+            self.assertEqual(self._ids('类型'), [self.python.id])
+            self.assertEqual(self._ids('部署'), [])
+
+    def test_search_page_highlights(self):
+        response = self.client.get(reverse('search'), {'q': '事件循环'})
+        self.assertEqual([post.id for post in response.context['post_list']], [self.python.id])
+        self.assertContains(response, '<mark>事件循环</mark>')
+        # 检索语句在摘要中转义
+        self.assertEqual(search.highlight('a<b>异步', '异步'), 'a&lt;b&gt;<mark>异步</mark>')
+
+    def test_search_json(self):
+        data = self.client.get(reverse('search_json'), {'q': '异步'}).json()
+        self.assertEqual((data['count'], data['num_pages']), (2, 1))
+        self.assertEqual([result['id'] for result in data['results']], [self.python.id, self.django.id])
+        self.assertIn('<mark>异步</mark>', data['results'][0]['snippet'])
+        self.assertEqual(self.client.get(reverse('search_json'), {'q': ''}).json()['results'], [])
+
+
+@override_settings(**{**TEST_SETTINGS, 'BLOG_PAGE_CACHE_ENABLED': True})
+class PageCacheTests(TestCase):
+    """匿名GET请求的整页缓存：ETag/Last-Modified 验证、已登录用户不缓存、内容版本变化后失效"""
+
+    def setUp(self):
+        cache.clear()
+        self.article = Article.objects.create(title='缓存文章', content='正文', status='p', pub_time=_utc(2025, 5, 1))
+        self.url = reverse('detail', args=[self.article.id])
+
+    def _get(self, url=None, **headers):
+        return self.client.get(url or self.url, headers=headers)
+
+    def test_cached_response_skips_view(self):
+        first = self._get()
+        self.assertEqual(first.status_code, 200)
+        self.assertTrue(first.has_header('ETag'))
+        self.assertTrue(first.has_header('Last-Modified'))
+        self.assertIn('X-Requested-With', first['Vary'])
+        with self.assertNumQueries(0):
+            second = self._get()
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(second['ETag'], first['ETag'])
+
+    def test_ajax_headers_are_part_of_key(self):
+        full = self._get(reverse('home'))
+        partial = self._get(reverse('home'), x_requested_with='XMLHttpRequest')
+        self.assertNotEqual(full['ETag'], partial['ETag'])
+        self.assertEqual(self._get(reverse('home'), x_requested_with='XMLHttpRequest').content, partial.content)
+
+    def test_revalidation_returns_304(self):
+        first = self._get()
+        with self.assertNumQueries(0):
+            response = self._get(if_none_match=first['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(self._get(if_modified_since=first['Last-Modified']).status_code, 304)
+        self.assertEqual(self._get(if_none_match='"stale"').status_code, 200)
+
+    def test_last_modified_follows_last_mod_time(self):
+        response = self._get()
+        self.article.refresh_from_db()
+        self.assertGreaterEqual(parse_http_date(response['Last-Modified']), int(self.article.last_mod_time.timestamp()))
+
+    def test_content_change_invalidates(self):
+        first = self._get()
+        self.article.title = '新的标题'
+        self.article.save()
+        response = self._get(if_none_match=first['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], first['ETag'])
+        self.assertContains(response, '新的标题')
+
+    def test_logged_in_users_skip_cache(self):
+        self._get()
+        user = get_user_model().objects.create_user('editor', password='password')
+        self.client.force_login(user)
+        # 带会话cookie的请求既不读取也不写入整页缓存，每次都执行视图
+        for _ in range(2):
+            response = self._get()
+            self.assertIsNotNone(response.context)
+            self.assertFalse(response.has_header('ETag'))
+
+    def _middleware_response(self, view):
+        """经过整页缓存中间件调用视图，返回 (响应, 视图是否执行)"""
+        request = RequestFactory().get(self.url)
+        request.resolver_match = resolve(self.url)
+        calls = []
+
+        def get_response(request):
+            response = middleware.process_view(request, view, (), request.resolver_match.kwargs)
+            if response is None:
+                calls.append(request)
+                response = view(request)
+            return response
+
+        middleware = AnonymousPageCacheMiddleware(get_response)
+        return middleware(request), bool(calls)
+
+    def test_responses_setting_cookies_are_not_cached(self):
+        def set_cookie(request):
+            response = HttpResponse('页面')
+            response.set_cookie('visitor', 'abc')
+            return response
+
+        def vary_cookie(request):
+            response = HttpResponse('页面')
+            patch_vary_headers(response, ['Cookie'])
+            return response
+
+        def session(request):
+            request.session = mock.Mock(accessed=True)
+            return HttpResponse('页面')
+
+        for view in (set_cookie, vary_cookie, session):
+            self.assertTrue(self._middleware_response(view)[1])
+            # 没有写入缓存，下一个匿名请求仍执行视图
+            self.assertTrue(self._middleware_response(lambda request: HttpResponse('页面'))[1], view.__name__)
+            cache.clear()
+
+    def test_detail_validators_ignore_other_articles(self):
+        other = Article.objects.create(title='其他文章', content='正文', status='p', pub_time=_utc(2024, 1, 1))
+        first = self._get()
+        other.title = '修改其他文章'
+        other.save()
+        # 其他文章的修改不影响本页的验证器，缓存失效后仍返回304
+        response = self._get(if_none_match=first['ETag'], if_modified_since=first['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], first['ETag'])
+        # 侧边栏变化（新的分类）使验证器改变
+        Category.objects.create(name='新分类')
+        self.assertEqual(self._get(if_none_match=first['ETag']).status_code, 200)
+
+    def test_views_recorded_on_cache_hits(self):
+        for _ in range(3):
+            self._get()
+        self.assertEqual(pending_views([self.article.id]), {self.article.id: 3})
+
+
+class MinifyTests(TestCase):
+    """静态资源压缩：只去掉注释本身，不能误删同一行的代码"""
+
+    def test_minify_js_keeps_code_after_comment(self):
+        source = '\n'.join([
+            '/* 初始化 */ var a = 1;',
+            '    /* 多行',
+            '       注释 */ var b = 2; /* 行尾注释保留 */',
+            '/* 一 */ /* 二 */ var c = 3;',
+            '/*/ 不是结束 */ var d = 4;',
+            '',
+            '// 单行注释',
+            '/*! 版权声明 */',
+            'var t = `',
+            '  /* 模板字符串内保持原样 */',
+            '`;',
+        ])
+        self.assertEqual(minify_js(source), '\n'.join([
+            'var a = 1;',
+            'var b = 2; /* 行尾注释保留 */',
+            'var c = 3;',
+            'var d = 4;',
+            '/*! 版权声明 */',
+            'var t = `',
+            '  /* 模板字符串内保持原样 */',
+            '`;',
+        ]))
+
+
+@override_settings(**TEST_SETTINGS)
+class ExportStaticTests(TestCase):
+    """静态导出：页面清单和输出路径"""
+
+    def test_unicode_tag_path(self):
+        tag = Tag.objects.create(name='机器学习')
+        article = Article.objects.create(title='文章', content='正文', status='p')
+        article.tags.add(tag)
+        url = reverse('search_tag', args=[tag.slug])
+        self.assertIn('%E6%9C%BA', url)
+        self.assertIn(url, export_static.Command().plan_pages())
+        # 文件名与 nginx 解码后的 $uri 一致
+        self.assertEqual(export_static._output_path(url), os.path.join('tag', '机器学习', 'index.html'))
+        self.assertEqual(export_static._output_path(url + '?page=2'),
+                         os.path.join('tag', '机器学习', 'page', '2', 'index.html'))
+        self.assertEqual(export_static._render_page(url)[1], 200)
+
+
+@override_settings(**TEST_SETTINGS, PAGE_NUM=2)
+class AsyncViewTests(TestCase):
+    """异步视图与同步视图返回相同的内容，且不为每个查询新建数据库连接"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='Python')
+        cls.tag = Tag.objects.create(name='Django')
+        cls.articles = []
+        for day in range(1, 6):
+            article = Article.objects.create(title=f'文章{day}', content=f'正文{day}', status='p',
+                                             pub_time=_utc(2025, 5, day, 12), category=cls.category)
+            article.tags.add(cls.tag)
+            cls.articles.append(article)
+        rebuild_timeline()
+
+    def setUp(self):
+        cache.clear()
+        self.connections = []
+        connection_created.connect(self._connected)
+        self.addCleanup(connection_created.disconnect, self._connected)
+
+    def _connected(self, sender, connection, **kwargs):
+        self.connections.append(connection.alias)
+
+    def _pair(self, name, *args, **params):
+        """依次请求同步和异步版本的同一页面"""
+        sync = self.client.get(reverse(name, args=args), params.get('query'), headers=params.get('headers'))
+        cache.clear()
+        asynchronous = self.client.get(reverse(f'async_{name}', args=args), params.get('query'),
+                                       headers=params.get('headers'))
+        self.assertEqual((sync.status_code, asynchronous.status_code), (200, 200), name)
+        return sync, asynchronous
+
+    def test_listing_parity(self):
+        for name, args in (('home', ()), ('category_menu', (self.category.id,)),
+                           ('search_tag', (self.tag.slug,)), ('archives', ('2025', '05'))):
+            for query in ({}, {'page': 2}):
+                sync, asynchronous = self._pair(name, *args, query=query)
+                self.assertEqual([post.id for post in sync.context['post_list']],
+                                 [post.id for post in asynchronous.context['post_list']], name)
+
+    def test_detail_parity(self):
+        article = self.articles[2]
+        sync, asynchronous = self._pair('detail', article.id)
+        for key in ('post', 'prev_post', 'next_post'):
+            self.assertEqual(sync.context[key], asynchronous.context[key], key)
+        self.assertEqual(list(sync.context['tags']), list(asynchronous.context['tags']))
+        # 两次请求之间清空了缓存，缓冲区中是异步视图记录的浏览量
+        self.assertEqual(pending_views([article.id]), {article.id: 1})
+
+    def test_ajax_and_json(self):
+        headers = {'x-requested-with': 'XMLHttpRequest'}
+        self.assertEqual(self.client.get(reverse('async_archives', args=['2025', '05']), {'page': 99},
+                                         headers=headers).content, b'')
+        sync, asynchronous = self._pair('tag_cloud_json')
+        self.assertEqual(sync.json(), asynchronous.json())
+        self.assertEqual(self.client.get(reverse('async_detail', args=[9999])).status_code, 404)
+
+    def test_reuses_connection(self):
+        self._pair('home')
+        self._pair('detail', self.articles[0].id)
+        self.assertEqual(self.connections, [])
+
+
+@override_settings(**TEST_SETTINGS, BLOG_ARCHIVE_INDEX=True)
+class BulkActionTests(TestCase):
+    """后台批量操作：只刷新涉及的文章、分类、标签和月份，结果与全量重建一致"""
+
+    def setUp(self):
+        cache.clear()
+        self.python = Category.objects.create(name='Python')
+        self.web = Category.objects.create(name='Web')
+        self.cache_tag = Tag.objects.create(name='缓存')
+        self.db_tag = Tag.objects.create(name='数据库')
+        self.articles = []
+        for day in range(1, 7):
+            article = Article.objects.create(
+                title=f'缓存优化{day}', content=f'数据库缓存和查询优化，第{day}篇', status='p' if day % 3 else 'd',
+                pub_time=_utc(2025, 4 + day % 2, day, 12), category=self.python,
+            )
+            article.tags.set([self.cache_tag] if day % 2 else [self.db_tag])
+            self.articles.append(article)
+        run_pending()
+        rebuild_archive_index()
+        self.user = get_user_model().objects.create_superuser('admin', password='password')
+        self.client.force_login(self.user)
+        self.url = reverse('admin:blog_article_changelist')
+
+    def _action(self, action, articles, **data):
+        response = self.client.post(self.url, {'action': action, '_selected_action': [a.pk for a in articles],
+                                               **data})
+        self.assertEqual(response.status_code, 302)
+        # 刷新任务不调用任何全量重建
+        with mock.patch.object(bulk, 'rebuild_timeline', side_effect=AssertionError), \
+                mock.patch.object(bulk, 'rebuild_related', side_effect=AssertionError), \
+                mock.patch.object(bulk, 'rebuild_archive_index', side_effect=AssertionError):
+            self.assertEqual(run_pending(), 1)
+        self.assertFalse(Job.objects.exists())
+
+    def _assert_consistent(self):
+        self.assertEqual(rebuild_timeline(), 0)
+        self.assertEqual(recount(), 0)
+        months = list(Archive.objects.values_list('month', 'count'))
+        rebuild_archive_index()
+        self.assertEqual(list(Archive.objects.values_list('month', 'count')), months)
+
+    def _related(self, article):
+        return related.related_ids(Article.objects.get(pk=article.pk))
+
+    def test_publish_and_unpublish(self):
+        drafts = [self.articles[2], self.articles[5]]
+        self._action('publish_selected', drafts)
+        self.assertEqual(Article.published.count(), 6)
+        self._assert_consistent()
+        self.assertIn(self.articles[5].id, self._related(self.articles[1]))
+
+        self._action('unpublish_selected', self.articles[:2])
+        self.assertEqual(Article.published.count(), 4)
+        self._assert_consistent()
+        for article in self.articles[:2]:
+            self.assertEqual(self._related(article), [])
+            for other in self.articles[2:]:
+                self.assertNotIn(article.id, self._related(other))
+
+    def test_set_category(self):
+        self._action('set_category_selected', self.articles[:3], category=self.web.pk)
+        self.assertEqual(Article.objects.filter(category=self.web).count(), 3)
+        self._assert_consistent()
+        self.web.refresh_from_db()
+        self.assertEqual(self.web.published_count, 2)
+
+    def test_add_tag(self):
+        self._action('add_tag_selected', self.articles[:2], tag=self.db_tag.pk)
+        self._assert_consistent()
+        self.db_tag.refresh_from_db()
+        self.assertEqual(self.db_tag.published_count, 3)
+        self.assertEqual({pk for _, pk in get_tag_posts(self.db_tag.id)},
+                         {self.articles[0].id, self.articles[1].id, self.articles[3].id})
+        self.assertIn(self.articles[0].id, self._related(self.articles[3]))
+
+    def test_merged_refreshes(self):
+        self.client.post(self.url, {'action': 'unpublish_selected', '_selected_action': [self.articles[0].pk]})
+        self.client.post(self.url, {'action': 'publish_selected', '_selected_action': [self.articles[2].pk]})
+        self.assertEqual(Job.objects.filter(name='refresh_derived').count(), 1)
+        run_pending()
+        self._assert_consistent()
+
+    def test_changelist(self):
+        response = self.client.get(self.url, {'q': '缓存'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['cl'].result_count, 6)
+
+
+class EstimatedCountPaginatorTests(TestCase):
+    """后台列表的估计行数：大表使用 PostgreSQL 的统计信息，小表和其他数据库精确计数"""
+
+    def setUp(self):
+        for i in range(3):
+            Article.objects.create(title=f'文章{i}', content='正文', status='p' if i else 'd')
+
+    def _postgresql(self, *rows):
+        """模拟 PostgreSQL 连接，依次返回 reltuples 和 EXPLAIN 的结果"""
+        cursor = mock.MagicMock()
+        cursor.fetchone.side_effect = rows
+        connection = mock.MagicMock(vendor='postgresql')
+        connection.cursor.return_value.__enter__.return_value = cursor
+        return mock.patch('apps.blog.pagination.connections', {'default': connection})
+
+    def test_exact_count_on_sqlite(self):
+        self.assertEqual(EstimatedCountPaginator(Article.objects.all(), 10).count, 3)
+
+    @override_settings(BLOG_ADMIN_EXACT_COUNT_LIMIT=1000)
+    def test_estimates_on_large_tables(self):
+        with self._postgresql((50000,)):
+            self.assertEqual(EstimatedCountPaginator(Article.objects.all(), 10).count, 50000)
+        with self._postgresql((50000,), ([{'Plan': {'Plan Rows': 1234}}],)):
+            self.assertEqual(EstimatedCountPaginator(Article.objects.filter(status='p'), 10).count, 1234)
+        with self._postgresql((50000,), ('[{"Plan": {"Plan Rows": 7}}]',)):
+            self.assertEqual(EstimatedCountPaginator(Article.objects.filter(status='p'), 10).count, 7)
+
+    @override_settings(BLOG_ADMIN_EXACT_COUNT_LIMIT=1000)
+    def test_small_tables_count_exactly(self):
+        with self._postgresql((10,)):
+            self.assertEqual(EstimatedCountPaginator(Article.objects.filter(status='p'), 10).count, 2)
+
+
+@override_settings(**TEST_SETTINGS, BLOG_METRICS_ALLOWED_IPS=[], BLOG_METRICS_PUBLIC=False)
+class MetricsAccessTests(TestCase):
+    """/metrics 不对匿名访客开放"""
+
+    def test_anonymous_gets_404(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 404)
+
+    def test_staff_can_view(self):
+        user = get_user_model().objects.create_user('ops', password='password', is_staff=True)
+        self.client.force_login(user)
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('blog_job_queue_depth', response.content.decode())
+
+    def test_allowed_ip_and_public_setting(self):
+        with self.settings(BLOG_METRICS_ALLOWED_IPS=['10.0.0.5']):
+            self.assertEqual(self.client.get(reverse('metrics'), REMOTE_ADDR='10.0.0.5').status_code, 200)
+            self.assertEqual(self.client.get(reverse('metrics')).status_code, 404)
+        with self.settings(BLOG_METRICS_PUBLIC=True):
+            self.assertEqual(self.client.get(reverse('metrics')).status_code, 200)
+
+
+class HighlightCacheTests(TestCase):
+    """代码高亮缓存只作用于博客自己的 Markdown 实例"""
+
+    text = '```python\nprint("hello")\n```\n\n正文\n\n    :::python\n    x = 1\n'
+
+    def setUp(self):
+        highlight_cache.clear()
+
+    def test_repeated_blocks_hit_cache(self):
+        html = render_markdown(self.text)
+        self.assertEqual(html.count('class="highlight"'), 2)
+        self.assertEqual((highlight_cache.hits, highlight_cache.misses), (0, 2))
+        self.assertEqual(render_markdown(self.text), html)
+        self.assertEqual((highlight_cache.hits, highlight_cache.misses), (2, 2))
+
+    def test_other_markdown_users_are_untouched(self):
+        self.assertIs(codehilite.highlight, pygments.highlight)
+        html = markdown.markdown(self.text, extensions=['extra', 'codehilite'])
+        self.assertIn('class="codehilite"', html)
+        self.assertEqual((highlight_cache.hits, highlight_cache.misses), (0, 0))
+
+
+@override_settings(**TEST_SETTINGS)
+class RenderedContentTests(TestCase):
+    """正文在保存时预渲染，页面直接输出保存的HTML和摘要，render_articles 回填过期的行"""
+
+    def setUp(self):
+        cache.clear()
+
+    def test_save_renders_only_when_content_changes(self):
+        article = Article.objects.create(title='文章', content='**加粗**', status='p')
+        self.assertIn('<strong>加粗</strong>', article.content_html)
+        with mock.patch('apps.blog.models.render_content') as render:
+            article.title = '新标题'
+            article.save()
+        render.assert_not_called()
+        article.content = '*斜体*'
+        article.save()
+        article.refresh_from_db()
+        self.assertIn('<em>斜体</em>', article.content_html)
+        self.assertEqual(article.content_hash, content_digest('*斜体*'))
+
+    def test_pages_use_stored_fields(self):
+        article = Article.objects.create(title='文章', content='正文', status='p')
+        Article.objects.filter(pk=article.pk).update(content_html='<p>预渲染的正文</p>', summary='预渲染的摘要')
+        self.assertContains(self.client.get(reverse('detail', args=[article.pk])), '预渲染的正文')
+        self.assertContains(self.client.get(reverse('home')), '预渲染的摘要')
+
+    def test_render_articles_backfills_stale_rows(self):
+        articles = [Article.objects.create(title=f'文章{i}', content=f'第{i}篇**正文**', status='p') for i in range(3)]
+        Article.objects.filter(pk__in=[articles[0].pk, articles[2].pk]).update(
+            content_hash='', content_html='', summary='')
+        out = StringIO()
+        call_command('render_articles', batch_size=1, workers=1, stdout=out)
+        self.assertIn('共更新 2 篇文章', out.getvalue())
+        for article in Article.objects.filter(pk__in=[a.pk for a in articles]):
+            self.assertIn('<strong>正文</strong>', article.content_html)
+            self.assertEqual(article.content_hash, content_digest(article.content))
+            self.assertEqual(article.summary, article.content.replace('**', ''))
+        out = StringIO()
+        call_command('render_articles', stdout=out)
+        self.assertIn('所有文章均已是最新渲染结果', out.getvalue())
+
+
+@override_settings(**TEST_SETTINGS)
+class ArchiveTests(TestCase):
+    """归档按月统计：分组查询和增量维护的归档表与文章实际情况一致"""
+
+    def _publish(self, title, pub_time):
+        return Article.objects.create(title=title, content='正文', status='p', pub_time=pub_time)
+
+    def _months(self):
+        return [(item['year'], item['month'], item['count']) for item in get_archive_data()]
+
+    def test_grouped_counts_skip_drafts(self):
+        self._publish('一月一', _utc(2025, 1, 10))
+        self._publish('一月二', _utc(2025, 1, 20))
+        self._publish('二月', _utc(2025, 2, 10))
+        Article.objects.create(title='草稿', content='正文', status='d')
+        with self.assertNumQueries(1):
+            self.assertEqual(self._months(), [(2025, 2, 1), (2025, 1, 2)])
+
+    @override_settings(BLOG_ARCHIVE_INDEX=True)
+    def test_index_follows_publish_changes(self):
+        first = self._publish('一月一', _utc(2025, 1, 10))
+        moved = self._publish('一月二', _utc(2025, 1, 20))
+        withdrawn = self._publish('二月', _utc(2025, 2, 10))
+        self.assertEqual(self._months(), [(2025, 2, 1), (2025, 1, 2)])
+        moved.pub_time = _utc(2025, 3, 10)
+        moved.save()
+        withdrawn.status = 'd'
+        withdrawn.save()
+        self.assertEqual(self._months(), [(2025, 3, 1), (2025, 1, 1)])
+        first.delete()
+        self.assertEqual(self._months(), [(2025, 3, 1)])
+        with self.settings(BLOG_ARCHIVE_INDEX=False):
+            self.assertEqual(self._months(), [(2025, 3, 1)])
+        self.assertEqual(rebuild_archive_index(), 1)
+        self.assertEqual(self._months(), [(2025, 3, 1)])
+
+
+@override_settings(**TEST_SETTINGS)
+class SidebarCacheTests(TestCase):
+    """侧边栏数据按内容版本缓存，文章、标签、分类变化后失效"""
+
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(name='Python')
+        self.article = Article.objects.create(
+            title='一月', content='正文', status='p', category=self.category, pub_time=_utc(2025, 1, 10))
+
+    @staticmethod
+    def _sidebar():
+        context = _get_common_context()
+        return (
+            sorted(category.name for category in context['category_list']),
+            [tag.name for tag in context['tag_cloud']],
+            [(item['month'], item['count']) for item in context['months']],
+        )
+
+    def test_warm_sidebar_costs_no_queries(self):
+        self._sidebar()
+        with self.assertNumQueries(0):
+            self.assertEqual(self._sidebar(), (['Python'], [], [(1, 1)]))
+        tags = self.client.get(reverse('tag_cloud_json')).json()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(reverse('tag_cloud_json')).json(), tags)
+
+    def test_changes_invalidate_sidebar(self):
+        self._sidebar()
+        Category.objects.create(name='Go')
+        self.article.tags.add(Tag.objects.create(name='Django'))
+        Article.objects.create(title='二月', content='正文', status='p', pub_time=_utc(2025, 2, 10))
+        self.assertEqual(self._sidebar(), (['Go', 'Python'], ['Django'], [(2, 1), (1, 1)]))
+        self.article.delete()
+        self.assertEqual(self._sidebar(), (['Go', 'Python'], [], [(2, 1)]))
+
+
+@override_settings(**TEST_SETTINGS)
+class TimelineTests(TestCase):
+    """上下篇引用在发表、修改发布时间、撤回和删除后与按发布时间排序的结果一致"""
+
+    def _publish(self, title, pub_time):
+        return Article.objects.create(title=title, content='正文', status='p', pub_time=pub_time)
+
+    def _chain(self):
+        """从最新的文章沿 next_post 走到最早的文章，同时检查 prev_post 指回上一篇"""
+        articles = Article.objects.in_bulk()
+        article, prev_id, titles = Article.published.order_by('-pub_time').first(), None, []
+        while article is not None:
+            self.assertEqual(article.prev_post_id, prev_id)
+            titles.append(article.title)
+            prev_id = article.pk
+            article = articles.get(article.next_post_id)
+        return titles
+
+    def test_links_follow_publish_changes(self):
+        january = self._publish('一月', _utc(2025, 1, 10))
+        march = self._publish('三月', _utc(2025, 3, 10))
+        february = self._publish('二月', _utc(2025, 2, 10))
+        self.assertEqual(self._chain(), ['三月', '二月', '一月'])
+        january.pub_time = _utc(2025, 4, 10)
+        january.save()
+        self.assertEqual(self._chain(), ['一月', '三月', '二月'])
+        march.status = 'd'
+        march.save()
+        self.assertEqual(self._chain(), ['一月', '二月'])
+        self.assertEqual(Article.objects.get(pk=march.pk).prev_post_id, None)
+        february.delete()
+        self.assertEqual(self._chain(), ['一月'])
+        self.assertEqual(rebuild_timeline(), 0)
+
+    def test_detail_shows_neighbours(self):
+        self._publish('一月', _utc(2025, 1, 10))
+        middle = self._publish('二月', _utc(2025, 2, 10))
+        self._publish('三月', _utc(2025, 3, 10))
+        response = self.client.get(reverse('detail', args=[middle.pk]))
+        self.assertEqual(response.context['prev_post'].title, '三月')
+        self.assertEqual(response.context['next_post'].title, '一月')
+
+
+@override_settings(**TEST_SETTINGS)
+class ImportExportTests(TestCase):
+    """批量导入导出：前置元数据、标签分类复用、派生数据，以及导出后可以原样导入"""
+
+    files = {
+        'first.md': '---\ntitle: 第一篇\ncategory: Python\ntags: ["Django", "性能"]\n'
+                    'pub_time: 2025-01-10T10:00:00+08:00\n---\n\n**正文一**\n',
+        'second.md': '---\ntitle: 第二篇\ncategory: Python\ntags: [Django]\nstatus: published\n'
+                     'pub_time: 2025-02-10\n---\n\n正文二\n',
+        'draft.md': '---\ntitle: 草稿\nstatus: draft\n---\n\n未完成\n',
+        'broken.md': '---\ntitle: 坏文件\nstatus: unknown\n---\n\n正文\n',
+    }
+
+    def setUp(self):
+        cache.clear()
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+        self.source = os.path.join(self.tmp, 'source')
+        os.makedirs(self.source)
+        for name, text in self.files.items():
+            with open(os.path.join(self.source, name), 'w', encoding='utf-8') as f:
+                f.write(text)
+        self.existing = Tag.objects.create(name='Django')
+
+    def _import(self, source):
+        out, err = StringIO(), StringIO()
+        call_command('import_articles', source, batch_size=2, stdout=out, stderr=err)
+        return out.getvalue(), err.getvalue()
+
+    @staticmethod
+    def _snapshot():
+        return {
+            article.title: (article.content, article.status, article.pub_time,
+                            article.category.name if article.category else None,
+                            sorted(tag.name for tag in article.tags.all()))
+            for article in Article.objects.select_related('category')
+        }
+
+    def test_import_directory(self):
+        _get_common_context()
+        out, err = self._import(self.source)
+        self.assertIn('导入 3 篇文章，跳过 1 篇', out)
+        self.assertIn('broken.md', err)
+        first = Article.objects.get(title='第一篇')
+        self.assertEqual(first.category.name, 'Python')
+        self.assertEqual(sorted(tag.name for tag in first.tags.all()), ['Django', '性能'])
+        self.assertIn('<strong>正文一</strong>', first.content_html)
+        self.assertEqual(Article.objects.get(title='草稿').status, 'd')
+        # 已有的标签直接复用，派生数据和侧边栏在导入完成后统一刷新
+        self.assertEqual(Tag.objects.filter(name='Django').count(), 1)
+        self.assertEqual(Tag.objects.get(pk=self.existing.pk).published_count, 2)
+        self.assertEqual(Category.objects.get(name='Python').published_count, 2)
+        self.assertEqual(recount(), 0)
+        self.assertEqual(rebuild_timeline(), 0)
+        self.assertEqual([c.name for c in _get_common_context()['category_list']], ['Python'])
+
+    def test_export_round_trip(self):
+        self._import(self.source)
+        exported = self._snapshot()
+        archive = os.path.join(self.tmp, 'articles.tar.gz')
+        out = StringIO()
+        call_command('export_articles', archive, chunk_size=1, stdout=out)
+        self.assertIn('已导出 3 篇文章', out.getvalue())
+        Article.objects.all().delete()
+        self._import(archive)
+        self.assertEqual(self._snapshot(), exported)
+
+
+@override_settings(**TEST_SETTINGS, BLOG_SITEMAP_CHUNK_SIZE=2)
+class FeedTests(TestCase):
+    """订阅和站点地图：内容范围、条件请求，以及按内容版本失效的缓存"""
+
+    def setUp(self):
+        cache.clear()
+        self.python = Category.objects.create(name='Python')
+        self.tag = Tag.objects.create(name='Django')
+        self.articles = [
+            Article.objects.create(title=f'文章{i}', content=f'正文{i}', status='p', pub_time=_utc(2025, 1, i + 1),
+                                   category=self.python if i else None)
+            for i in range(3)
+        ]
+        self.articles[2].tags.add(self.tag)
+        Article.objects.create(title='草稿', content='正文', status='d')
+
+    def _get(self, url, **headers):
+        response = self.client.get(url, **headers)
+        if response.status_code == 200:
+            response.xml = ElementTree.fromstring(b''.join(response.streaming_content))
+        return response
+
+    @staticmethod
+    def _titles(root, path):
+        return [node.text for node in root.iterfind(path)]
+
+    def test_feeds_list_published_articles_in_scope(self):
+        rss = self._get(reverse('feed')).xml
+        self.assertEqual(self._titles(rss, 'channel/item/title'), ['文章2', '文章1', '文章0'])
+        atom = self._get(reverse('feed_atom')).xml
+        self.assertEqual(self._titles(atom, '{http://www.w3.org/2005/Atom}entry/{http://www.w3.org/2005/Atom}title'),
+                         ['文章2', '文章1', '文章0'])
+        category = self._get(reverse('category_feed', args=[self.python.pk])).xml
+        self.assertEqual(self._titles(category, 'channel/item/title'), ['文章2', '文章1'])
+        tag = self._get(reverse('tag_feed', args=[self.tag.slug])).xml
+        self.assertEqual(self._titles(tag, 'channel/item/title'), ['文章2'])
+        self.assertEqual(self.client.get(reverse('category_feed', args=[999])).status_code, 404)
+
+    def test_conditional_requests_and_invalidation(self):
+        first = self._get(reverse('feed'))
+        self.assertEqual(self._get(reverse('feed'), HTTP_IF_NONE_MATCH=first['ETag']).status_code, 304)
+        self.assertEqual(
+            self._get(reverse('feed'), HTTP_IF_MODIFIED_SINCE=first['Last-Modified']).status_code, 304)
+        with self.assertNumQueries(0):
+            self.assertEqual(self._titles(self._get(reverse('feed')).xml, 'channel/item/title'),
+                             ['文章2', '文章1', '文章0'])
+        article = self.articles[0]
+        article.title = '修改后的标题'
+        article.save()
+        changed = self._get(reverse('feed'), HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed['ETag'], first['ETag'])
+        self.assertIn('修改后的标题', self._titles(changed.xml, 'channel/item/title'))
+
+    def test_sitemap_is_split_into_chunks(self):
+        ns = '{http://www.sitemaps.org/schemas/sitemap/0.9}'
+        index = self._get(reverse('sitemap')).xml
+        self.assertEqual(len(index.findall(f'{ns}sitemap')), 3)  # 分类/标签页面 + 两块文章
+        pages = [self._get(reverse('sitemap_articles', args=[page])).xml for page in (1, 2)]
+        urls = [loc.text for page in pages for loc in page.iter(f'{ns}loc')]
+        self.assertEqual(urls, ['http://testserver' + reverse('detail', args=[a.pk]) for a in self.articles])
+        self.assertEqual(self.client.get(reverse('sitemap_articles', args=[3])).status_code, 404)
+        sections = [loc.text for loc in self._get(reverse('sitemap_sections')).xml.iter(f'{ns}loc')]
+        self.assertIn('http://testserver' + reverse('search_tag', args=[self.tag.slug]), sections)
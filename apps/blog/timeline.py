@@ -0,0 +1,65 @@
+from django.db import transaction
+from django.db.models import Q
+
+from apps.blog.models import Article
+
+
+def compute_neighbours(article):
+    """计算文章在时间轴上的 (上一篇id, 下一篇id)，上一篇是发布时间更晚的文章"""
+    if article.status != 'p' or not article.pub_time:
+        return None, None
+    pub_time, pk = article.pub_time, article.pk
+    prev_id = Article.published.filter(
+        Q(pub_time__gt=pub_time) | Q(pub_time=pub_time, id__gt=pk)
+    ).order_by('pub_time', 'id').values_list('id', flat=True).first()
+    next_id = Article.published.filter(
+        Q(pub_time__lt=pub_time) | Q(pub_time=pub_time, id__lt=pk)
+    ).order_by('-pub_time', '-id').values_list('id', flat=True).first()
+    return prev_id, next_id
+
+
+def relink(article_ids):
+    """重新计算指定文章的上下篇引用，只更新发生变化的行"""
+    ids = {pk for pk in article_ids if pk}
+    articles = Article.objects.filter(id__in=ids).only('id', 'status', 'pub_time', 'prev_post', 'next_post')
+    for article in articles:
+        prev_id, next_id = compute_neighbours(article)
+        if (prev_id, next_id) != (article.prev_post_id, article.next_post_id):
+            Article.objects.filter(id=article.id).update(prev_post_id=prev_id, next_post_id=next_id)
+
+
+def relink_article(article, previous=None):
+    """文章发表、撤回或修改发布时间后，更新它本身以及新旧位置两侧的文章"""
+    affected = {article.pk, *compute_neighbours(article)}
+    if previous is not None:
+        affected.update((previous.prev_post_id, previous.next_post_id))
+    relink(affected)
+
+
+def relink_articles(article_ids):
+    """批量发表或撤回后，更新这些文章以及它们原来和新位置两侧的文章（原来的上下篇引用仍保存在行中）"""
+    affected = set(article_ids)
+    for article in Article.objects.filter(id__in=affected).only('id', 'status', 'pub_time', 'prev_post', 'next_post'):
+        affected.update((article.prev_post_id, article.next_post_id))
+        affected.update(compute_neighbours(article))
+    relink(affected)
+
+
+@transaction.atomic
+def rebuild_timeline():
+    """全量重建所有文章的上下篇引用，返回更新的行数"""
+    ordered = list(Article.published.order_by('-pub_time', '-id').values_list('id', flat=True))
+    links = {}
+    for index, pk in enumerate(ordered):
+        prev_id = ordered[index - 1] if index > 0 else None
+        next_id = ordered[index + 1] if index + 1 < len(ordered) else None
+        links[pk] = (prev_id, next_id)
+
+    changed = []
+    for article in Article.objects.only('id', 'prev_post', 'next_post').iterator():
+        prev_id, next_id = links.get(article.id, (None, None))
+        if (prev_id, next_id) != (article.prev_post_id, article.next_post_id):
+            article.prev_post_id, article.next_post_id = prev_id, next_id
+            changed.append(article)
+    Article.objects.bulk_update(changed, ['prev_post', 'next_post'], batch_size=500)
+    return len(changed)
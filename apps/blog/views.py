@@ -1,82 +1,84 @@
-from django.shortcuts import render
+from django.shortcuts import redirect, render
 from apps.blog.models import Article, Category, Tag
+from apps.blog.archive import get_archive_data
+from apps.blog.cache import get_or_build
+from apps.blog.cards import CARD_FIELDS
+from apps.blog.counters import apply_pending_views
+from apps.blog.metrics import timer
+from apps.blog.pagination import LIST_ORDERING, CursorPage, cursor_page, cursor_slice, encode_cursor, encode_posting
+from apps.blog.postings import get_tag_posts
+from apps.blog.related import related_ids
+from apps.blog.search import highlight, search as search_articles
 from django.core.paginator import Paginator, PageNotAnInteger, EmptyPage
 from django.http import Http404, JsonResponse, HttpResponse
 from django.conf import settings
-from django.db.models import Count
 from django.template.loader import render_to_string
-import json
-
-def get_archive_data():
-    """获取归档数据，包含每月文章数量"""
-    months = Article.objects.filter(status='p', pub_time__isnull=False).datetimes('pub_time', 'month', order='DESC')
-    archive_data = []
-    for month in months:
-        count = Article.objects.filter(
-            status='p',
-            pub_time__isnull=False,
-            pub_time__year=month.year,
-            pub_time__month=month.month
-        ).count()
-        # 创建一个包含日期和数量的字典
-        archive_item = {
-            'date': month,
-            'count': count,
-            'year': month.year,
-            'month': month.month
-        }
-        archive_data.append(archive_item)
-    return archive_data
+from django.urls import reverse
 
+def _popular_tags(limit):
+    """按已发表文章数量排序的热门标签，走 tag_published_count_idx 索引"""
+    return list(Tag.objects.filter(published_count__gt=0).order_by('-published_count', 'id')[:limit])
+
+
+def _build_tag_cloud():
+    tags = _popular_tags(30)  # 增加到30个标签
 
-def tag_cloud_json(request):
-    """为D3.js标签云提供JSON格式数据"""
-    tags = Tag.objects.filter(
-        article__status='p', 
-        article__pub_time__isnull=False
-    ).annotate(
-        usage_count=Count('article')
-    ).order_by('-usage_count').distinct()[:30]  # 增加到30个标签
-    
     tag_data = []
-    max_count = tags.first().usage_count if tags else 1
-    min_count = tags.last().usage_count if tags else 1
-    
+    max_count = tags[0].published_count if tags else 1
+    min_count = tags[-1].published_count if tags else 1
+
     for tag in tags:
         # 计算标签的相对大小 (1-5的范围)
         if max_count == min_count:
             size = 3
         else:
-            size = 1 + (tag.usage_count - min_count) / (max_count - min_count) * 4
-        
+            size = 1 + (tag.published_count - min_count) / (max_count - min_count) * 4
+
         tag_item = {
             'text': tag.name,
             'size': round(size, 1),
-            'count': tag.usage_count,
-            'url': f'/search_tag/{tag.name}/'  # 标签链接
+            'count': tag.published_count,
+            'url': reverse('search_tag', kwargs={'slug': tag.slug})  # 标签链接
         }
         tag_data.append(tag_item)
-    
-    return JsonResponse({'tags': tag_data})
+    return tag_data
 
 
-def _get_common_context():
-    """获取所有页面都需要的通用上下文数据"""
-    archive_data = get_archive_data()  # 先独立获取归档数据
+def tag_cloud_json(request):
+    """为D3.js标签云提供JSON格式数据"""
+    return JsonResponse({'tags': get_or_build('tag_cloud', _build_tag_cloud)})
+
+
+def _build_sidebar():
     return {
-        'category_list': Category.objects.all(),
-        'tag_cloud': Tag.objects.filter(
-            article__status='p',
-            article__pub_time__isnull=False
-        ).annotate(
-            usage_count=Count('article')
-        ).order_by('-usage_count').distinct()[:20],
-        'months': archive_data  # 再将其放入上下文字典
+        'category_list': list(Category.objects.all()),
+        'tag_cloud': _popular_tags(20),
+        'months': get_archive_data(),
     }
 
+
+def _get_common_context():
+    """获取所有页面都需要的通用上下文数据，按内容版本缓存"""
+    with timer('sidebar'):
+        return dict(get_or_build('sidebar', _build_sidebar))
+
 def _handle_pagination(request, posts):
-    """处理分页逻辑，同时支持常规请求和AJAX请求"""
-    paginator = Paginator(posts, settings.PAGE_NUM)
+    """处理分页逻辑，同时支持常规请求和AJAX请求
+
+    带 cursor 参数的请求（无限滚动）使用游标分页，其余请求仍使用页码分页。
+    """
+    # 列表只取生成卡片缓存键需要的字段，卡片内容由片段缓存提供
+    posts = posts.only(*CARD_FIELDS)
+    cursor = request.GET.get('cursor')
+    if cursor is not None:
+        try:
+            post_list = cursor_page(posts, cursor, settings.PAGE_NUM)
+        except ValueError:
+            raise Http404('Invalid cursor')
+        post_list.object_list = apply_pending_views(post_list.object_list)
+        return post_list
+
+    paginator = Paginator(posts.order_by(*LIST_ORDERING), settings.PAGE_NUM)
     page = request.GET.get('page')
     try:
         post_list = paginator.page(page)
@@ -87,19 +89,51 @@ def _handle_pagination(request, posts):
         if request.headers.get('x-requested-with') == 'XMLHttpRequest':
             return HttpResponse('')
         post_list = paginator.page(paginator.num_pages)
+    # 列表中显示接近实时的浏览量
+    post_list.object_list = apply_pending_views(post_list.object_list)
+    # 页码分页的最后一篇同样生成游标，后续的无限滚动改用游标分页
+    post_list.next_cursor = encode_cursor(post_list.object_list[-1]) if post_list.has_next() else ''
+    return post_list
+
+def _paginate_postings(request, postings):
+    """在缓存的 [(发布时间, 文章id)] 列表上分页，只按主键取当前页的文章"""
+    cursor = request.GET.get('cursor')
+    if cursor is not None:
+        try:
+            ids, next_cursor = cursor_slice(postings, cursor, settings.PAGE_NUM)
+        except ValueError:
+            raise Http404('Invalid cursor')
+        articles = Article.objects.only(*CARD_FIELDS).in_bulk(ids)
+        # 缓存的列表中可能有已删除的文章，游标按列表本身生成
+        return CursorPage(apply_pending_views(articles[pk] for pk in ids if pk in articles), bool(next_cursor),
+                          next_cursor)
+
+    paginator = Paginator(postings, settings.PAGE_NUM)
+    try:
+        post_list = paginator.page(request.GET.get('page'))
+    except PageNotAnInteger:
+        post_list = paginator.page(1)
+    except EmptyPage:
+        if request.headers.get('x-requested-with') == 'XMLHttpRequest':
+            return HttpResponse('')
+        post_list = paginator.page(paginator.num_pages)
+    chunk = post_list.object_list
+    ids = [article_id for _, article_id in chunk]
+    articles = Article.objects.only(*CARD_FIELDS).in_bulk(ids)
+    post_list.object_list = apply_pending_views(articles[pk] for pk in ids if pk in articles)
+    post_list.next_cursor = encode_posting(chunk[-1]) if post_list.has_next() else ''
     return post_list
 
+
 # Create your views here.
 def home(request):  # 主页
-    posts = Article.objects.filter(status='p', pub_time__isnull=False)
-    post_list = _handle_pagination(request, posts)
+    post_list = _handle_pagination(request, Article.published.all())
+    if isinstance(post_list, HttpResponse):
+        return post_list
 
     if request.headers.get('x-requested-with') == 'XMLHttpRequest':
-        # AJAX请求，只返回文章列表部分
+        # AJAX请求，只返回文章列表部分（包含下一页的触发器）
         html = render_to_string('post_list_partial.html', {'post_list': post_list})
-        # 附加下一页的触发器
-        if post_list.has_next():
-            html += f'<div id="infinite-scroll-trigger" data-next-page="{post_list.next_page_number}"></div>'
         return HttpResponse(html)
 
     context = _get_common_context()
@@ -109,27 +143,34 @@ def home(request):  # 主页
 
 def detail(request, id):
     try:
-        post = Article.objects.get(id=str(id))
-        post.viewed()  # 更新浏览次数
-        tags = post.tags.all()
-        next_post = post.next_article()  # 上一篇文章对象
-        prev_post = post.prev_article()  # 下一篇文章对象
+        post = Article.objects.select_related('category').get(id=id)
     except Article.DoesNotExist:
         raise Http404
-    
+    if not getattr(request, 'skip_view_count', False):  # 静态导出等内部渲染不计入浏览量
+        post.viewed()  # 更新浏览次数
+    tags = post.tags.all()
+    # 上下篇引用和相关文章都已预先计算好，一次 id IN (...) 查询取出
+    related = related_ids(post)
+    neighbour_ids = [pk for pk in (post.prev_post_id, post.next_post_id) if pk] + related
+    neighbours = Article.published.only('id', 'title').in_bulk(neighbour_ids) if neighbour_ids else {}
+    prev_post = neighbours.get(post.prev_post_id)  # 上一篇文章对象
+    next_post = neighbours.get(post.next_post_id)  # 下一篇文章对象
+    related_posts = [neighbours[pk] for pk in related if pk in neighbours]
+
     context = _get_common_context()
     context.update({
         'post': post,
         'tags': tags,
         'next_post': next_post,
         'prev_post': prev_post,
+        'related_posts': related_posts,
     })
-    
+
     return render(request, 'post.html', context)
 
 
 def search_category(request, id):
-    posts = Article.objects.filter(category_id=str(id), status='p', pub_time__isnull=False)
+    posts = Article.published.filter(category_id=id)
     
     context = _get_common_context()
     try:
@@ -139,6 +180,8 @@ def search_category(request, id):
         raise Http404("Category not found")
         
     post_list = _handle_pagination(request, posts)
+    if isinstance(post_list, HttpResponse):
+        return post_list
     context['post_list'] = post_list
 
     if request.headers.get('x-requested-with') == 'XMLHttpRequest':
@@ -151,13 +194,22 @@ def search_category(request, id):
     return render(request, 'category.html', context)
 
 
-def search_tag(request, tag):
-    posts = Article.objects.filter(tags__name__contains=tag, status='p', pub_time__isnull=False)
-    
+def search_tag(request, slug):
+    try:
+        tag = Tag.objects.get(slug=slug)
+    except Tag.DoesNotExist:
+        # 兼容旧的按标签名访问的链接
+        tag = Tag.objects.filter(name=slug).first()
+        if tag is None:
+            raise Http404("Tag not found")
+        return redirect('search_tag', slug=tag.slug, permanent=True)
+
     context = _get_common_context()
     context['tag'] = tag
-    
-    post_list = _handle_pagination(request, posts)
+
+    post_list = _paginate_postings(request, get_tag_posts(tag.id))
+    if isinstance(post_list, HttpResponse):
+        return post_list
     context['post_list'] = post_list
 
     # For AJAX page loads (main content)
@@ -174,17 +226,14 @@ def search_tag(request, tag):
 
 
 def archives(request, year, month):
-    posts = Article.objects.filter(
-        status='p',
-        pub_time__isnull=False,
-        pub_time__year=year,
-        pub_time__month=month
-    )
-    
+    posts = Article.published.in_month(year, month)
+
     context = _get_common_context()
     context['year'] = year
     context['month'] = month
     post_list = _handle_pagination(request, posts)
+    if isinstance(post_list, HttpResponse):
+        return post_list
     context['post_list'] = post_list
 
     if request.headers.get('x-requested-with') == 'XMLHttpRequest':
@@ -202,3 +251,59 @@ def sidebar_preview(request):
     # 可以在这里添加任何特定于预览页面的额外上下文
     return render(request, 'sidebar_modern_preview.html', context)
 
+
+def _search_page(request):
+    """执行检索并分页，返回 (检索语句, 当前页)，当前页中的文章按相关度排序并带有高亮摘要"""
+    query = request.GET.get('q', '').strip()
+    ranked = search_articles(query)
+    paginator = Paginator(ranked, settings.PAGE_NUM)
+    try:
+        page = paginator.page(request.GET.get('page'))
+    except PageNotAnInteger:
+        page = paginator.page(1)
+    except EmptyPage:
+        page = paginator.page(paginator.num_pages)
+
+    scores = dict(page.object_list)
+    articles = Article.objects.select_related('search_document', 'category').in_bulk(scores)
+    posts = [articles[pk] for pk in scores if pk in articles]
+    for post in posts:
+        post.search_rank = scores[post.id]
+        post.search_snippet = highlight(post.search_document.body, query)
+    page.object_list = apply_pending_views(posts)
+    page.next_cursor = ''
+    return query, page
+
+
+def search(request):
+    """全文检索结果页"""
+    query, post_list = _search_page(request)
+
+    if request.headers.get('x-infinite-scroll') == 'true':
+        return render(request, 'post_list_partial.html', {'post_list': post_list, 'query': query})
+
+    context = _get_common_context()
+    context['query'] = query
+    context['post_list'] = post_list
+    return render(request, 'search.html', context)
+
+
+def search_json(request):
+    """全文检索JSON接口"""
+    query, page = _search_page(request)
+    results = [{
+        'id': post.id,
+        'title': post.title,
+        'url': reverse('detail', kwargs={'id': post.id}),
+        'pub_time': post.pub_time.isoformat() if post.pub_time else None,
+        'rank': post.search_rank,
+        'snippet': post.search_snippet,
+    } for post in page]
+    return JsonResponse({
+        'query': query,
+        'count': page.paginator.count,
+        'page': page.number,
+        'num_pages': page.paginator.num_pages,
+        'results': results,
+    })
+
@@ -0,0 +1,22 @@
+"""
+ASGI config for jbt_blog project.
+
+It exposes the ASGI callable as a module-level variable named ``application``.
+Run it with an ASGI server, e.g. ``uvicorn jbt_blog.asgi:application``.
+
+For more information on this file, see
+https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
+"""
+
+import os
+
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "jbt_blog.settings")
+
+application = get_asgi_application()
+
+# 'thread' 模式的后台任务只在Web进程中执行
+from apps.blog.jobs import serve_jobs  # noqa: E402
+
+serve_jobs()
@@ -78,6 +78,8 @@ MDEDITOR_UPLOAD_PATH = 'editor/'  # 图片上传路径
 
 # X_FRAME_OPTIONS = 'SAMEORIGIN'  # 移除重复配置
 MIDDLEWARE = [
+    'apps.blog.assets.StaticAssetMiddleware',  # 从 STATIC_ROOT 提供带哈希和预压缩的静态文件
+    'apps.blog.metrics.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -85,13 +87,15 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'apps.blog.routers.ReplicaRoutingMiddleware',  # 须在整页缓存之前，缓存未命中时的查询才能读副本
+    'apps.blog.middleware.AnonymousPageCacheMiddleware',
 ]
 
 ROOT_URLCONF = 'jbt_blog.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'apps.blog.metrics.InstrumentedDjangoTemplates',  # 在DjangoTemplates基础上统计渲染耗时
         'DIRS': [os.path.join(BASE_DIR, 'templates')]
         ,
         'APP_DIRS': True,
@@ -107,6 +111,7 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'jbt_blog.wsgi.application'
+ASGI_APPLICATION = 'jbt_blog.asgi.application'
 
 
 # Database
@@ -123,6 +128,33 @@ DATABASES = {
     }
 }
 
+# 只读副本：POSTGRES_REPLICA_HOSTS=host1,host2:5433 时，公开页面的读查询分发到副本，写入、后台和编辑器使用主库
+# （见 apps.blog.routers；本地可在 DATABASES 中配置两个SQLite数据库并直接设置 BLOG_REPLICA_DATABASES 测试）
+BLOG_REPLICA_DATABASES = []
+for _index, _host in enumerate(filter(None, os.environ.get('POSTGRES_REPLICA_HOSTS', '').split(',')), start=1):
+    _host, _, _port = _host.strip().partition(':')
+    DATABASES[f'replica{_index}'] = {
+        **DATABASES['default'],
+        'HOST': _host,
+        'PORT': _port or DATABASES['default']['PORT'],
+        'TEST': {'MIRROR': 'default'},  # 测试时副本指向主库的测试数据库
+    }
+    BLOG_REPLICA_DATABASES.append(f'replica{_index}')
+
+DATABASE_ROUTERS = ['apps.blog.routers.PrimaryReplicaRouter']
+# 写入后该浏览器和全站只读主库的时间（秒），应大于副本的复制延迟
+BLOG_REPLICA_STICKY_SECONDS = 10
+
+
+# 缓存配置（默认本地内存；多进程部署可改用文件缓存，如
+# DJANGO_CACHE_BACKEND=django.core.cache.backends.filebased.FileBasedCache DJANGO_CACHE_LOCATION=/tmp/jbt_blog_cache）
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('DJANGO_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('DJANGO_CACHE_LOCATION', 'jbt-blog'),
+    }
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.0/ref/settings/#auth-password-validators
@@ -164,12 +196,75 @@ STATICFILES_DIRS = [
         os.path.join(BASE_DIR, 'static'),
     ]
 
+# collectstatic 时合并压缩 CSS/JS、生成带哈希的文件名和 .gz/.br 预压缩文件（见 apps/blog/assets.py）
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'apps.blog.assets.BundledManifestStorage'},
+}
+
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media/')
 
 # 分页配置
 PAGE_NUM = 5
 
+# 是否使用物化的按月归档统计表（启用前先执行 python manage.py rebuild_archive）
+BLOG_ARCHIVE_INDEX = False
+
+# 侧边栏（分类、标签云、归档）缓存时间，单位秒；内容变化时会通过版本号立即失效
+BLOG_SIDEBAR_CACHE_TIMEOUT = 300
+
+# 浏览量缓冲：累计达到次数或间隔秒数后批量写回数据库，也可定时执行 python manage.py flush_views
+BLOG_VIEWS_FLUSH_THRESHOLD = 100
+BLOG_VIEWS_FLUSH_INTERVAL = 60
+
+# 匿名访问的整页缓存，内容变化时通过版本号立即失效
+BLOG_PAGE_CACHE_ENABLED = True
+BLOG_PAGE_CACHE_TIMEOUT = 600
+
+# 列表卡片片段缓存按浏览量分段，浏览量每变化这么多才重新渲染卡片
+BLOG_CARD_VIEWS_BUCKET = 10
+
+# RSS/Atom 订阅的条目数和生成结果缓存时间（秒），站点地图每个子地图的文章数
+BLOG_FEED_ITEMS = 20
+BLOG_FEED_CACHE_TIMEOUT = 3600
+BLOG_SITEMAP_CHUNK_SIZE = 1000
+
+# 上传图片生成的宽度（像素）和 <img sizes> 属性
+BLOG_IMAGE_WIDTHS = (480, 960, 1600)
+BLOG_IMAGE_SIZES = '(max-width: 768px) 100vw, 768px'
+
+# 后台任务（重新渲染、检索索引、相关文章、侧边栏预热、图片处理等）的执行方式：
+# 'thread' 在Web进程的线程池中执行（单容器部署，管理命令中只入队）；'worker' 只入队，由 python manage.py run_jobs 执行；
+# 'immediate' 在事务提交后立即执行（开发调试）
+BLOG_JOB_MODE = 'thread'
+BLOG_JOB_THREADS = 2
+# 失败重试：最多执行次数、首次重试的等待秒数（之后每次翻倍）；执行超过 BLOG_JOB_TIMEOUT 秒视为执行者已退出
+BLOG_JOB_MAX_ATTEMPTS = 3
+BLOG_JOB_RETRY_DELAY = 10
+BLOG_JOB_TIMEOUT = 600
+# 进程内执行器检查到期任务（如等待重试的任务）的间隔秒数
+BLOG_JOB_POLL_INTERVAL = 5
+
+# 相关文章：每篇保存的数量、标签 Jaccard 相似度的权重（其余为正文 TF-IDF 余弦相似度）和词表大小上限
+BLOG_RELATED_COUNT = 5
+BLOG_RELATED_TAG_WEIGHT = 0.3
+BLOG_RELATED_MAX_FEATURES = 8192
+
+# 代码高亮结果的进程内LRU缓存条目数（0 表示不缓存）
+BLOG_HIGHLIGHT_CACHE_SIZE = 1024
+
+# 请求耗时统计：输出 Server-Timing 响应头，并在 /metrics 提供按视图汇总的直方图
+BLOG_METRICS_ENABLED = True
+# /metrics 默认只对管理员开放；抓取端的IP加入白名单，或设 BLOG_METRICS_PUBLIC = True 对所有人开放
+BLOG_METRICS_ALLOWED_IPS = ['127.0.0.1']
+BLOG_METRICS_PUBLIC = False
+# 超过该耗时（毫秒）的请求记录慢请求日志（logger: apps.blog.slow），列出最耗时的查询
+BLOG_SLOW_REQUEST_MS = 500
+
+# 后台文章列表：表的估计行数达到该值后（仅PostgreSQL）用估计值代替精确的 COUNT(*)
+BLOG_ADMIN_EXACT_COUNT_LIMIT = 10000
+
 # DJANGO-ADMIN-INTERFACE 配置
 ADMIN_INTERFACE = {
     'TITLE': '管理后台',
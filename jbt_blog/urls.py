@@ -15,11 +15,23 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path
-from apps.blog import views
+from apps.blog import async_views, feeds, views
+from apps.blog.images import OptimizedUploadView
+from apps.blog.metrics import metrics_view
 from django.conf.urls import include
 from django.conf import settings
 from django.conf.urls.static import static
 
+# 异步视图，与同步视图同时提供以便对比压测（需通过ASGI部署才能发挥并发效果）
+async_urlpatterns = [
+    path('', async_views.home, name='async_home'),
+    path('articles/<int:id>/', async_views.detail, name='async_detail'),
+    path('category/<int:id>/', async_views.search_category, name='async_category_menu'),
+    path('tag/<str:slug>/', async_views.search_tag, name='async_search_tag'),
+    path('archives/<str:year>/<str:month>', async_views.archives, name='async_archives'),
+    path('api/tagcloud/', async_views.tag_cloud_json, name='async_tag_cloud_json'),
+]
+
 urlpatterns = [
     path('manage/', admin.site.urls),
     path('', views.home, name='home'),
@@ -27,8 +39,22 @@ urlpatterns = [
     path('sidebar_preview/', views.sidebar_preview, name='sidebar_preview'),
     path('articles/<int:id>/', views.detail, name='detail'),
     path('category/<int:id>/', views.search_category, name='category_menu'),
-    path('tag/<str:tag>/', views.search_tag, name='search_tag'),
+    path('tag/<str:slug>/', views.search_tag, name='search_tag'),
     path('archives/<str:year>/<str:month>', views.archives, name='archives'),
+    path('search/', views.search, name='search'),  # 全文检索
     path('api/tagcloud/', views.tag_cloud_json, name='tag_cloud_json'),  # 标签云JSON API
+    path('api/search/', views.search_json, name='search_json'),  # 全文检索JSON API
+    path('feed/', feeds.site_feed, name='feed'),  # RSS订阅
+    path('feed/atom/', feeds.site_feed, {'fmt': 'atom'}, name='feed_atom'),
+    path('category/<int:id>/feed/', feeds.category_feed, name='category_feed'),
+    path('category/<int:id>/feed/atom/', feeds.category_feed, {'fmt': 'atom'}, name='category_feed_atom'),
+    path('tag/<str:slug>/feed/', feeds.tag_feed, name='tag_feed'),
+    path('tag/<str:slug>/feed/atom/', feeds.tag_feed, {'fmt': 'atom'}, name='tag_feed_atom'),
+    path('sitemap.xml', feeds.sitemap_index, name='sitemap'),  # 站点地图索引
+    path('sitemap-sections.xml', feeds.sitemap_sections, name='sitemap_sections'),
+    path('sitemap-<int:page>.xml', feeds.sitemap_articles, name='sitemap_articles'),
+    path('async/', include(async_urlpatterns)),
+    path('metrics', metrics_view, name='metrics'),  # 请求耗时直方图（仅管理员和 BLOG_METRICS_ALLOWED_IPS 可见）
+    path('mdeditor/uploads/', OptimizedUploadView.as_view(), name='uploads'),  # 上传后后台生成优化图片
     path('mdeditor/', include('mdeditor.urls')),  # 替换 summernote
 ] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "jbt_blog.settings")
 
 application = get_wsgi_application()
+
+# 'thread' 模式的后台任务只在Web进程中执行
+from apps.blog.jobs import serve_jobs  # noqa: E402
+
+serve_jobs()
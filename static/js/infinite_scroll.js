@@ -16,10 +16,12 @@ function initializeInfiniteScroll() {
     const observerCallback = (entries) => {
         // 确保是目标元素进入视野，并且没有在加载中
         if (entries[0].isIntersecting && !isLoading) {
+            // 优先使用游标分页，兼容旧的页码触发器
+            const nextCursor = trigger.getAttribute('data-next-cursor');
             const nextPage = trigger.getAttribute('data-next-page');
 
             // 如果没有下一页了，直接断开观察并返回
-            if (!nextPage) {
+            if (!nextCursor && !nextPage) {
                 observer.disconnect();
                 return;
             }
@@ -27,7 +29,12 @@ function initializeInfiniteScroll() {
             isLoading = true;
 
             let url = new URL(window.location.href);
-            url.searchParams.set('page', nextPage);
+            if (nextCursor) {
+                url.searchParams.delete('page');
+                url.searchParams.set('cursor', nextCursor);
+            } else {
+                url.searchParams.set('page', nextPage);
+            }
             
             fetch(url.toString(), {
                 headers: {
@@ -962,6 +962,26 @@ class EllipticalTagCloud {
     }
 }
 
+// 按需加载 D3.js，地址由容器的 data-d3-src 提供
+function loadD3(container) {
+    if (window.d3) {
+        return Promise.resolve();
+    }
+    if (!loadD3.promise) {
+        loadD3.promise = new Promise((resolve, reject) => {
+            const script = document.createElement('script');
+            script.src = container.dataset.d3Src;
+            script.onload = resolve;
+            script.onerror = () => {
+                loadD3.promise = null;
+                reject();
+            };
+            document.head.appendChild(script);
+        });
+    }
+    return loadD3.promise;
+}
+
 // 初始化函数
 function initEllipticalTagCloud() {
     // 移动端检测：如果屏幕宽度小于等于768px，则不初始化3D标签云
@@ -997,25 +1017,28 @@ function initEllipticalTagCloud() {
         return;
     }
     
-    // 响应式宽度
-    const containerWidth = container.offsetWidth;
-    const containerHeight = Math.min(180, containerWidth * 0.6);
-    
-    console.log('容器尺寸:', containerWidth, 'x', containerHeight);
-    
-    const options = {
-        width: containerWidth,
-        height: containerHeight,
-        radiusX: containerWidth * 0.4,
-        radiusY: containerHeight * 0.35,
-        radiusZ: Math.min(containerWidth, containerHeight) * 0.3,
-        showEllipse: false // 设为true可显示椭圆边界用于调试
-    };
-    
-    // 创建标签云并保存全局引用
-    console.log('创建标签云实例');
-    window.tagCloudInstance = new EllipticalTagCloud('.tag-cloud-container', tagData, options);
-    console.log('标签云创建完成，实例:', window.tagCloudInstance);
+    // D3.js 只在需要绘制标签云时才加载
+    loadD3(container).then(() => {
+        // 响应式宽度
+        const containerWidth = container.offsetWidth;
+        const containerHeight = Math.min(180, containerWidth * 0.6);
+        
+        console.log('容器尺寸:', containerWidth, 'x', containerHeight);
+        
+        const options = {
+            width: containerWidth,
+            height: containerHeight,
+            radiusX: containerWidth * 0.4,
+            radiusY: containerHeight * 0.35,
+            radiusZ: Math.min(containerWidth, containerHeight) * 0.3,
+            showEllipse: false // 设为true可显示椭圆边界用于调试
+        };
+        
+        // 创建标签云并保存全局引用
+        console.log('创建标签云实例');
+        window.tagCloudInstance = new EllipticalTagCloud('.tag-cloud-container', tagData, options);
+        console.log('标签云创建完成，实例:', window.tagCloudInstance);
+    }).catch(() => console.error('D3.js 加载失败'));
 }
 
 // DOM加载完成后初始化